@@ -1,9 +1,9 @@
 # monitoreo_atencion_ui.py
 # Interfaz completa: UI moderna + lógica de tracking y análisis.
+import os  # Rutas de grabaciones
 import cv2  # Biblioteca para procesamiento de imágenes y video
 import time  # Para manejo de tiempos y delays
-import threading  # Para ejecutar tareas en hilos separados (como captura de video)
-import numpy as np  # Para operaciones numéricas y arrays
+import threading  # Para sincronizar la UI con el hilo de procesamiento
 from PIL import Image, ImageTk  # Para conversión y manejo de imágenes en Tkinter
 import tkinter as tk  # Biblioteca principal para la interfaz gráfica
 from tkinter import messagebox  # Para mostrar mensajes emergentes
@@ -11,14 +11,31 @@ from tkinter import ttk  # Para estilos modernos en Tkinter
 
 # Importar módulos personalizados que manejan funcionalidades específicas
 from region_selector import RegionSelector  # Para seleccionar la región de interés (ROI) del rostro
-from optical_flow_tracker import OpticalFlowTracker  # Para seguimiento óptico de movimiento
-from attention_analyzer import AttentionAnalyzer  # Para analizar la atención basada en movimientos
+from detector_rostro import DetectorRostro  # Detección automática del rostro (cascadas de OpenCV)
+from analysis_engine import AnalysisEngine  # Pipeline de tracking y análisis de atención (sin UI)
+from frame_capture import CameraCapture  # Captura de frames sobre ring buffer con secuencia y timestamp
+from frame_processor import FrameProcessor, FpsMeter  # Hilo de análisis desacoplado de Tk
+from frame_planes import FramePlanes  # Caché de conversiones de color por frame
+from planificador import PlanificadorAdaptativo  # Frecuencia de análisis según movimiento y carga
+from metricas import Metricas, ExportadorMetricas  # Latencia por etapa (histogramas) y exportación periódica
 from reporte import Reporte  # Para generar reportes al final del examen
+from diario_sesion import DiarioSesion, recuperar_pendientes  # Diario incremental por sesión (recuperable)
+from almacen_sesiones import AlmacenSesiones  # Almacén columnar para consultas entre sesiones
+from grabacion import GrabadorSesion  # Grabación de frames con timestamps para reproducir exámenes
 from window_monitor import WindowMonitor  # Para monitorear si la ventana está enfocada
+from pipeline_procesos import CapturaEnProceso, MotorRemoto  # Captura y análisis en procesos propios (opcional)
+from reloj import RELOJ  # Reloj del examen (inyectable para pruebas de larga duración)
 
 
 class Pantalla_UI:
-    def __init__(self, root):
+    # carpeta_grabaciones: si se indica, cada examen se graba en <carpeta>/<id de sesión>/ (modo "raw" o "comprimido")
+    # arranque: arranque.MedidorArranque opcional donde se marcan las fases de apertura de la cámara
+    # fps_pantalla: frecuencia de refresco del panel de video (independiente de la del análisis)
+    # roi_automatica: detectar el rostro en lugar de seleccionarlo a mano y re-adquirirlo si se pierde
+    # reloj: reloj del examen para captura, análisis, temporizador y reporte (por defecto reloj.RELOJ)
+    # multiproceso: captura y análisis en procesos propios, con los frames en memoria compartida (pipeline_procesos)
+    def __init__(self, root, carpeta_grabaciones=None, modo_grabacion="raw", arranque=None, fps_pantalla=30.0,
+                 roi_automatica=False, reloj=None, multiproceso=False):
         # Asignar la ventana raíz de Tkinter
         self.root = root
         # Configurar título de la ventana
@@ -55,28 +72,61 @@ class Pantalla_UI:
         style.configure("TEntry", font=("Helvetica", 11), relief="sunken", borderwidth=2)
 
         # Variables de estado para controlar la aplicación
-        self.cap = None  # Objeto de captura de video
+        self.cap = None  # Objeto de captura de video (None en modo multiproceso: la cámara está en otro proceso)
+        self.fps_camara = 30.0  # fps informado por la cámara (para la grabación)
+        self.multiproceso = multiproceso
+        self.capture = None  # Hilo de captura sobre ring buffer
+        self.frame_reader = None  # Lector del ring buffer usado por la UI
+        self.processor = None  # Hilo de procesamiento (CamShift, flujo óptico, análisis)
         self.running = False  # Indica si la captura de video está activa
         self.exam_active = False  # Indica si un examen está en curso
         self.exam_end_ts = None  # Timestamp de fin del examen
-        self.frame_bgr = None  # Último frame capturado en formato BGR
+        self.frame_bgr = None  # Último frame entregado por el ring buffer (vista sin copia, BGR)
+        self.frame_ts = None  # Timestamp de captura de frame_bgr
+        self.frame_seq = 0  # Número de secuencia de captura de frame_bgr
+        self.carpeta_grabaciones = carpeta_grabaciones  # Carpeta de grabaciones (None = no grabar)
+        self.modo_grabacion = modo_grabacion
+        self.grabador = None  # Grabación del examen en curso
+        self.grabador_lector = None  # Lector del ring buffer reservado para la grabación
+        self.roi_seleccion = None  # (frame, seq, ts, roi) sobre el que se seleccionó la ROI
+        self.arranque = arranque  # Medidor de fases de arranque (o None)
+        self._apertura = None  # Resultado de la apertura de la cámara en segundo plano
+        self._cerrando = False  # La UI se está cerrando (descartar una apertura que llegue tarde)
+        self._recuperados = None  # Reportes reconstruidos de sesiones interrumpidas (None = aún en curso)
         self.window_focused = True  # Indica si la ventana está enfocada
+        self.metricas = Metricas()  # Latencias por etapa: captura, análisis y pantalla
+        self.metricas_ruta = "metricas_rendimiento.json"  # Volcado periódico (.prom para formato Prometheus)
+        self.exportador = None  # Hilo que vuelca las métricas a disco
+        self.diario = None  # Diario de la sesión en curso (sesiones/<id>.jsonl)
+        self.carpeta_sesiones = "sesiones"  # Diarios y reportes, uno por sesión
+        self.carpeta_almacen = "almacen"  # Almacén columnar con un registro por sesión
+        self.exam_minutes = None  # Duración planificada del examen en curso
 
         # Instanciar módulos personalizados
-        self.roi = None  # Región de interés (rostro)
-        self.tracker = OpticalFlowTracker()  # Rastreador óptico
-        self.analyzer = AttentionAnalyzer()  # Analizador de atención
-        self.winmonitor = WindowMonitor()  # Monitor de foco de ventana
-
-        # Variables adicionales para detectar si se mira al frente
-        self.neutral_center = None  # Centro neutral del rostro
-        self.front_hysteresis_ms = 250  # Tiempo de histéresis para confirmar mirada al frente
-        self._front_inside_since = None  # Timestamp desde que se detectó dentro del área neutral
-
-        # Variables necesarias para CamShift / tracking
-        self.roi_hist = None # Histograma de la ROI para CamShift
-        self.track_window = None # Ventana de seguimiento para CamShift
-        self.term_crit = None # Criterios de terminación para CamShift
+        self.reloj = reloj or RELOJ  # Reloj compartido: los timestamps de captura y del temporizador son comparables
+        self.winmonitor = WindowMonitor(self.reloj)  # Monitor de foco de ventana (registra cada transición)
+        # Motor de tracking (CamShift + flujo óptico) y análisis de atención; el tiempo fuera de foco sale
+        # de las transiciones del monitor, no del estado muestreado en cada frame analizado
+        # En modo multiproceso el motor corre en el proceso de análisis y aquí queda su réplica (MotorRemoto)
+        if multiproceso:
+            self.engine = MotorRemoto(metricas=self.metricas, reloj=self.reloj, monitor=self.winmonitor)
+        else:
+            self.engine = AnalysisEngine(metricas=self.metricas, reloj=self.reloj, monitor=self.winmonitor)
+        self.tracker = self.engine.tracker  # Rastreador óptico (None en modo multiproceso)
+        self.engine_lock = threading.Lock()  # Sincroniza el acceso al motor entre la UI y el hilo de procesamiento
+        self.display_fps = FpsMeter()  # fps de pantalla (independiente del fps de análisis)
+        self.fps_pantalla = fps_pantalla  # fps objetivo del refresco de pantalla
+        self._photo = None  # PhotoImage persistente del panel de video (se actualiza con paste)
+        self._photo_size = None  # Tamaño (ancho, alto) de self._photo
+        self.display_planes = FramePlanes(cv2.INTER_LINEAR)  # Buffers de conversión para la pantalla (propios del hilo de Tk)
+        self._camshift_fallos_vistos = 0  # Fallos de CamShift ya notificados en la barra de estado
+        self._readquisiciones_vistas = 0  # Re-adquisiciones del rostro ya notificadas en la barra de estado
+        self.error_detector = None  # Motivo por el que no se pudo activar la detección automática
+        if roi_automatica:
+            try:
+                self.engine.detector = DetectorRostro()
+            except IOError as e:
+                self.error_detector = str(e)
 
         # Crear marco para el título principal de la aplicación
         title_frame = ttk.Frame(root, style="TFrame")
@@ -127,9 +177,22 @@ class Pantalla_UI:
                                       text="Estado: Sistema listo. Selecciona el rostro y comienza el examen.",
                                       style="Status.TLabel")
         self.status_label.pack(side=tk.LEFT)
+        # Indicador de rendimiento: fps de análisis y de pantalla por separado
+        self.fps_label = ttk.Label(status_frame, text="Análisis: -- fps | Pantalla: -- fps", style="Status.TLabel")
+        self.fps_label.pack(side=tk.LEFT, padx=(20, 0))
+        # Progreso visible mientras la cámara se abre en segundo plano
+        self.progress = ttk.Progressbar(status_frame, mode="indeterminate", length=120)
         ttk.Label(status_frame, text="Asegúrate de mantener la ventana enfocada.", style="Status.TLabel").pack(
             side=tk.RIGHT)
 
+        # Reportes parciales de sesiones que terminaron de forma inesperada: se reconstruyen en un hilo de
+        # fondo (con muchos diarios pendientes tarda) y el resultado se muestra en el estado al terminar
+        threading.Thread(target=self._recuperar_sesiones, daemon=True).start()
+        self.root.after(100, self._esperar_recuperacion)
+        if self.error_detector:
+            self.status_label.configure(text=f"Estado: Detección automática no disponible ({self.error_detector}); "
+                                             "selecciona el rostro a mano.")
+
         # Iniciar captura de cámara y bucle de actualización de video
         self.start_camera()
         self.refresh_video()
@@ -142,145 +205,238 @@ class Pantalla_UI:
         # Iniciar hilo para actualizar el temporizador
         self.root.after(200, self.update_timer)
 
+    # Analizador de atención del motor (en modo multiproceso, la réplica actualizada por el proceso de análisis)
+    @property
+    def analyzer(self):
+        return self.engine.analyzer
+
+    # Hilo de fondo: reconstruye los reportes de las sesiones interrumpidas (diario_sesion.recuperar_pendientes).
+    # Arranca antes que la cámara: los diarios de los exámenes nuevos no existen aún cuando lista la carpeta
+    def _recuperar_sesiones(self):
+        try:
+            recuperados = recuperar_pendientes(self.carpeta_sesiones)
+        except Exception as e:
+            print("No se pudieron recuperar las sesiones interrumpidas:", e)
+            recuperados = []
+        self._marcar_arranque("sesiones_recuperadas")
+        self._recuperados = recuperados
+
+    # En el hilo de Tk: espera el fin de la recuperación y muestra cuántos reportes se reconstruyeron
+    def _esperar_recuperacion(self):
+        if self._recuperados is None:
+            self.root.after(100, self._esperar_recuperacion)
+            return
+        if self._recuperados and not self._cerrando:
+            self.status_label.configure(
+                text=f"Estado: Se recuperaron {len(self._recuperados)} reporte(s) de sesiones interrumpidas.")
+
     # Sección de manejo de la cámara 
+    # Algunos drivers tardan varios segundos en abrir la cámara: se abre en un hilo de fondo
+    # y la UI sigue respondiendo, con una barra de progreso en la barra de estado
     def start_camera(self):
-        # Abrir la cámara (índice 0)
-        self.cap = cv2.VideoCapture(0)
+        self.status_label.configure(text="Estado: Abriendo cámara...")
+        self.progress.pack(side=tk.LEFT, padx=(20, 0))
+        self.progress.start(15)
+        self._apertura = None
+        threading.Thread(target=self._abrir_camara, daemon=True).start()
+        self.root.after(50, self._esperar_camara)
+
+    # Hilo de fondo: abre la cámara (índice 0) y lee el primer frame (CameraCapture.start).
+    # Deja en self._apertura (cap, capture, error)
+    def _abrir_camara(self):
+        # Con grabación hace falta una ranura más en el ring buffer (un lector adicional)
+        capacidad = 5 if self.carpeta_grabaciones else 4
+        if self.multiproceso:
+            # Proceso de captura: el ring buffer lo crea este proceso en memoria compartida
+            capture = CapturaEnProceso(0, capacidad, self.reloj, metricas=self.metricas)
+            self._marcar_arranque("camara_abierta")
+            if not capture.start():
+                self._apertura = (None, None, capture.error)
+                return
+            self._marcar_arranque("primer_frame")
+            self._apertura = (None, capture, None)
+            return
+        cap = cv2.VideoCapture(0)
+        self._marcar_arranque("camara_abierta")
         # Verificar si la cámara se abrió correctamente
-        if not self.cap.isOpened():
-            messagebox.showerror("Error", "No se pudo abrir la cámara (índice 0).")
+        if not cap.isOpened():
+            self._apertura = (cap, None, "No se pudo abrir la cámara (índice 0).")
             return
+        # Hilo de captura continua: escribe cada frame en una ranura del ring buffer
+        capture = CameraCapture(cap, capacidad=capacidad, metricas=self.metricas, reloj=self.reloj)
+        if not capture.start():
+            self._apertura = (cap, None, "La cámara no entregó ningún frame.")
+            return
+        self._marcar_arranque("primer_frame")
+        self._apertura = (cap, capture, None)
+
+    def _marcar_arranque(self, fase):
+        if self.arranque is not None:
+            self.arranque.marcar(fase)
+
+    # En el hilo de Tk: espera el resultado de la apertura y conecta lectores e hilo de procesamiento
+    def _esperar_camara(self):
+        if self._apertura is None:
+            self.root.after(50, self._esperar_camara)
+            return
+        cap, capture, error = self._apertura
+        if self._cerrando: # La ventana se cerró mientras se abría la cámara
+            if capture:
+                capture.stop()
+            if cap:
+                cap.release()
+            return
+        self.progress.stop()
+        self.progress.pack_forget()
+        self.cap, self.capture = cap, capture
+        if error:
+            self._marcar_arranque("error_camara")
+            self.status_label.configure(text="Estado: Cámara no disponible.")
+            messagebox.showerror("Error", error)
+            return
+        self.fps_camara = (capture.fps if self.multiproceso else cap.get(cv2.CAP_PROP_FPS)) or 30.0
+        self.frame_reader = self.capture.ring.crear_lector() # Lector de la UI (cuenta descartes y duplicados)
+        if self.carpeta_grabaciones:
+            self.grabador_lector = self.capture.ring.crear_lector()
+        # Modo reducido: con cámaras de alta resolución, analizar a ~640 px de ancho y solo alrededor del rostro
+        ancho = self.capture.ring.frames.shape[2]
+        self.engine.escala = min(1.0, 640.0 / ancho)
+        self.engine.margen_busqueda = 1.0
+        # Hilo de procesamiento con su propio lector: el análisis no corre en el event loop de Tk
+        # El planificador omite el análisis de frames sin movimiento o que no caben en el presupuesto de CPU
+        if self.multiproceso: # El proceso de análisis crea su propio lector del ring buffer compartido
+            self.processor = self.engine.crear_procesador(self.capture.ring)
+        else:
+            self.processor = FrameProcessor(self.engine, self.capture.ring.crear_lector(), self.winmonitor,
+                                            self.engine_lock, PlanificadorAdaptativo())
+        self.processor.start()
+        self.exportador = ExportadorMetricas(self.metricas, self.metricas_ruta)
+        self.exportador.start()
         self.running = True # Marcar que la cámara está activa
-        t = threading.Thread(target=self.update_frame, daemon=True) # Hilo para realizar captura continua de frames
-        t.start() # Iniciar el hilo de captura
         self.status_label.configure(text="Estado: Cámara iniciada.") # Actualizar estado
 
     # Detener la cámara y liberar recursos
     def stop_camera(self):
         self.running = False # Marcar que la cámara ya no está activa
+        if self.processor: # Detener primero el análisis (consume del ring buffer)
+            self.processor.stop()
+            self.processor = None
+        if self.capture: # Esperar a que el hilo de captura termine la lectura en curso
+            self.capture.stop()
+            self.capture = None
+        if self.exportador: # Último volcado de métricas
+            self.exportador.stop()
+            self.exportador = None
         if self.cap: # Si la cámara estaba abierta
             self.cap.release() # Liberar el recurso de la cámara
             self.cap = None # Limpiar la referencia a la cámara
         self.status_label.configure(text="Estado: Cámara detenida.") # Actualizar estado
 
-    # Hilo para capturar frames continuamente desde la cámara
+    # Toma del ring buffer el frame más reciente que la UI aún no ha procesado.
+    # Devuelve False si no hay frame nuevo (así un mismo frame nunca se analiza dos veces)
     def update_frame(self):
-        while self.running and self.cap: # Mientras la cámara esté activa
-            ret, frame = self.cap.read() # Leer un frame
-            if not ret: # Si no se pudo leer el frame,
-                continue # intentar de nuevo
-            self.frame_bgr = frame # Guardar el frame capturado
-            time.sleep(0.01) # Pequeña pausa para evitar sobrecarga
-
-    # Mostrar el frame actual en el panel de video
+        if self.frame_reader is None:
+            return False
+        ref = self.frame_reader.siguiente(timeout=0)
+        if ref is None:
+            return False
+        self.frame_bgr = ref.frame # Vista válida hasta la siguiente lectura
+        self.frame_ts = ref.timestamp
+        self.frame_seq = ref.seq
+        return True
+
+    # Contadores de captura: frames entregados, descartados y duplicados, y lecturas fallidas
+    def capture_stats(self):
+        if self.frame_reader is None:
+            return {}
+        stats = self.frame_reader.estadisticas()
+        stats["errores_lectura"] = self.capture.errores_lectura if self.capture else 0
+        return stats
+
+    # Mostrar el frame actual en el panel de video con los overlays del último resultado de análisis.
+    # Aquí no se hace ningún trabajo de visión: solo composición y dibujo
     def show_frame(self, frame_bgr):
-        # Convertir de BGR a RGB y mostrar
-        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        h, w = frame_rgb.shape[:2] # Obtener las dimensiones del frame
-        max_w = 1100 # Ancho máximo permitido para la ventana de video
-        scale = min(1.0, max_w / float(w)) # Calcular escala para ajustar al ancho máximo
-        if scale < 1.0: # Si es necesario escalar
-            # Redimensionar el frame manteniendo la relación de aspecto
-            frame_rgb = cv2.resize(frame_rgb, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA) 
-
-        # CAMSHIFT TRACKING
-        # Solo si el examen está activo y la ROI y ventana de seguimiento están definidas
-        if self.exam_active and self.roi_hist is not None and self.track_window is not None:
-            hsv = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2HSV) # Convertir frame a HSV para CamShift
-            backproj = cv2.calcBackProject([hsv], [0], self.roi_hist, [0, 180], 1) # Calcular proyección inversa
-             # Aplicar CamShift para actualizar la posición de la ROI
-            try:
-                track_box, self.track_window = cv2.CamShift(backproj, self.track_window, self.term_crit) # Actualizar ventana de seguimiento
-                cv2.ellipse(frame_rgb, track_box, (0, 255, 0), 2)
-                x, y, w_t, h_t = self.track_window # Desempaquetar la ventana de seguimiento
-                # Actualizar la ROI basada en la ventana de seguimiento
-                x, y, w_t, h_t = int(x), int(y), int(w_t), int(h_t) # Asegurar que sean enteros
-                self.roi = (x, y, w_t, h_t) # Actualizar la ROI global
-                # Actualizar el tracker óptico con la nueva ROI
-                if self.tracker.initialized: 
-                    self.tracker.update_roi(self.roi) # Actualizar la ROI utilizada por el tracker óptico
-            except Exception:
-                # Si CamShift falla, resetear estado de tracking
-                self.track_window = None # Resetear ventana de seguimiento
-                self.roi_hist = None # Resetear histograma de la ROI
-                self.roi = None # Resetear la ROI
+        metricas = self.metricas
+        t = time.perf_counter()
+        planes = self.display_planes.set_frame(frame_bgr)
+        h, w = frame_bgr.shape[:2] # Obtener las dimensiones del frame
+        scale = self._escala_pantalla(w, h)
+        size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        # Reducir una sola vez al tamaño del panel y convertir de BGR a RGB (buffers reutilizados entre frames)
+        frame_rgb = planes.resized("rgb", size)
+        t_overlay = time.perf_counter()
+        metricas.observar("pantalla_conversion", t_overlay - t)
+
+        # Último resultado publicado por el hilo de procesamiento
+        latest = self.processor.latest() if self.processor else None
+        if latest is not None:
+            _, _, primitivas = latest
+            self._draw_overlays(frame_rgb, primitivas, scale)
+            if self.processor.camshift_fallos != self._camshift_fallos_vistos:
+                self._camshift_fallos_vistos = self.processor.camshift_fallos
                 self.status_label.configure(text="Estado: Tracking perdido (CamShift falló).") # Actualizar estado
-
-        # OPTICAL FLOW TRACKING
-        # Solo si el examen está activo
-        if self.exam_active:
-            if self.roi is None: # Si no hay ROI definida
-                # ROI perdido: marcar como falta de atención por pérdida de rostro
-                self.analyzer.update(None, None, roi_present=False, window_focused=self.window_focused)
-                txt = self._estado_desde_posicion(self.roi, frame_rgb.shape) # Estado basado en posición (sin ROI)
-            elif self.tracker.initialized: # Si el tracker óptico está inicializado
-                # Calcular flujo óptico
-                gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY) # Convertir frame a escala de grises
-                dxdy = self.tracker.track(gray) # Obtener desplazamientos (dx, dy)
-                # Obtener puntos actuales del tracker para análisis adicional
-                points = getattr(self.tracker, "good_new", None)
-                if dxdy: # Si se pudo calcular movimiento
-                    dx, dy = dxdy # Se asigna el valor de dxdy a las variables de horizontal y vertical
-                    # 1) Actualizar giro natural
-                    self.analyzer.update(dx, dy, roi_present=True, window_focused=self.window_focused)
-                    # 2) Detectar si está de frente con tu función especial
-                    if points is not None and len(points) > 0:
-                        try: # En este caso realizar
-                            # Se llama a la función para verificar si esta mirando hacia el frente
-                            if self.analyzer.is_facing_forward(points, self.roi): 
-                                txt = "Mirando de frente" # Si es asi, se actualiza el estado
-                                self.analyzer.last_direction = None # Y la dirección anterior se resetea
-                            else: # Sino
-                                # Se llama a la funcion de posisción para identificar hacia donde se realizo el giro
-                                txt = self._estado_desde_posicion(self.roi, frame_rgb.shape, dx, dy)
-                        except Exception:
-                            # Si is_facing_forward falla por cualquier motivo, fallback
-                            txt = self._estado_desde_posicion(self.roi, frame_rgb.shape, dx, dy)
-                    else:
-                        # Si no hay puntos expuestos por el tracker, calcular estado solo con ROI y desplazamientos
-                        txt = self._estado_desde_posicion(self.roi, frame_rgb.shape, dx, dy)
-                else:
-                    # No se pudo calcular movimiento (puntos perdidos), asumir atención (sin movimiento)
-                    self.analyzer.update(0, 0, roi_present=True, window_focused=self.window_focused)
-                    txt = self._estado_desde_posicion(self.roi, frame_rgb.shape, 0, 0)
-            else:
-                # Si el tracker óptico no está inicializado, deducir estado con la info disponible
-                txt = self._estado_desde_posicion(self.roi, frame_rgb.shape)
-        else:
-            # Si el examen NO está activo, igualmente mostrar estado (p. ej., “Sin examen / ROI no definida”)
-            txt = self._estado_desde_posicion(self.roi, frame_rgb.shape)
-
-        # Elegir color para el texto del estado: verde si de frente, naranja para otros estados
-        color = (0, 255, 0) if txt == "Mirando de frente" else (255, 165, 0)
-        cv2.putText(frame_rgb, txt, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, color, 3)
-
-        # Dibujar ROI si está seleccionado
-        if self.roi:
-            x, y, w_r, h_r = self.roi
-            cv2.rectangle(frame_rgb, (x, y), (x + w_r, y + h_r), (0, 191, 255), 3)
-
-        # Convertir el array RGB a imagen PIL y luego a PhotoImage para Tkinter
-        im = Image.fromarray(frame_rgb)
-        imgtk = ImageTk.PhotoImage(image=im)
-        # Mantener referencia y actualizar el widget del panel de video en la UI
-        self.video_panel.imgtk = imgtk
-        self.video_panel.configure(image=imgtk)
+            readquisiciones = self.engine.readquisiciones # Vuelve a 0 al iniciar cada examen
+            if readquisiciones != self._readquisiciones_vistas:
+                if readquisiciones > self._readquisiciones_vistas:
+                    self.status_label.configure(text="Estado: Rostro re-adquirido automáticamente.")
+                self._readquisiciones_vistas = readquisiciones
+        t_tk = time.perf_counter()
+        metricas.observar("pantalla_overlay", t_tk - t_overlay)
+
+        # Actualizar en el lugar el PhotoImage persistente; solo se crea uno nuevo si cambia el tamaño del panel
+        if self._photo is None or self._photo_size != size:
+            self._photo = ImageTk.PhotoImage("RGB", size)
+            self._photo_size = size
+            self.video_panel.configure(image=self._photo)
+        self._photo.paste(Image.fromarray(frame_rgb))
+        metricas.observar("pantalla_tk", time.perf_counter() - t_tk)
+        self.display_fps.tick()
+
+    # Escala para que el frame (w x h) quepa en el panel de video manteniendo la relación de aspecto.
+    # Antes de que Tk asigne tamaño al panel se usa el límite de 1100 px de ancho
+    def _escala_pantalla(self, w, h):
+        borde = 2 * (int(self.video_panel.cget("bd")) + int(self.video_panel.cget("highlightthickness")))
+        pw = self.video_panel.winfo_width() - borde
+        ph = self.video_panel.winfo_height() - borde
+        if pw <= 1 or ph <= 1:
+            return min(1.0, 1100 / float(w))
+        return min(pw / float(w), ph / float(h))
+
+    # Dibuja las primitivas de overlay (en coordenadas del frame completo) sobre el frame de pantalla escalado
+    def _draw_overlays(self, frame_rgb, primitivas, scale):
+        for tipo, datos, color in primitivas:
+            if tipo == "ellipse":
+                (cx, cy), (ew, eh), ang = datos
+                cv2.ellipse(frame_rgb, ((cx * scale, cy * scale), (ew * scale, eh * scale), ang), color, 2)
+            elif tipo == "rect":
+                x, y, w_r, h_r = (int(v * scale) for v in datos)
+                cv2.rectangle(frame_rgb, (x, y), (x + w_r, y + h_r), color, 3)
+            elif tipo == "text":
+                cv2.putText(frame_rgb, datos, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, color, 3)
 
     def refresh_video(self):
-        # Bucle para refrescar video 
-        if self.frame_bgr is not None:
+        # Bucle para refrescar video al fps de pantalla configurado
+        inicio = time.perf_counter()
+        if self.update_frame():
             try:
                 # Intenta mostrar el ultimo frame disponible
                 self.show_frame(self.frame_bgr)
+                if self.arranque is not None and "primer_frame_mostrado" not in self.arranque:
+                    self.arranque.marcar("primer_frame_mostrado")
             except Exception as e:
                 # Capturar errores visuales para no romper la UI
                 print("Error al mostrar frame:", e)
-        self.root.after(20, self.refresh_video) # Reprogramar la actualización para dentro de 20 ms
+        # Reprogramar descontando lo que tardó este refresco, para sostener fps_pantalla
+        periodo_ms = 1000.0 / self.fps_pantalla
+        restante = periodo_ms - (time.perf_counter() - inicio) * 1000.0
+        self.root.after(max(1, int(restante)), self.refresh_video)
 
     
     # Permite al usuario seleccionar manualmente la ROI (región de interés) en el frame actual,
     # genera el histograma de la ROI (HSV con máscara) y configura CamShift para el seguimiento.
-    # También calibra el centro neutral y el criterio de parada de CamShift
+    # También calibra el centro neutral y el criterio de parada de CamShift.
+    # En modo automático (--roi-automatica) primero se intenta detectar el rostro; la selección
+    # manual queda como respaldo si no se encuentra ninguno
 
     def seleccionar_roi(self):
         # Si no hay imagen disponible desde la cámara, avisar y salir
@@ -288,24 +444,36 @@ class Pantalla_UI:
             messagebox.showwarning("ROI", "No hay imagen de cámara.")
             return
 
+        if self.engine.detector is not None:
+            roi = self.adquirir_roi_automatica()
+            if roi is not None:
+                self.status_label.configure(text=f"Estado: Rostro detectado {roi}")
+                return
+            self.status_label.configure(text="Estado: No se detectó ningún rostro; selecciónalo a mano.")
+
         selector = RegionSelector() # Crear un selector y fijar la ventana de selección
         clone = self.frame_bgr.copy() # Copiar el frame actual
+        clone_seq, clone_ts = self.frame_seq, self.frame_ts
+        temp = clone.copy() # Imagen temporal para dibujar el rectángulo sin afectar "clone" (se reutiliza)
         cv2.namedWindow("Seleccionar ROI") # Crear ventana para la interacción
         cv2.setMouseCallback("Seleccionar ROI", selector.select_roi) # Registrar callback del mouse
 
         while True: # Bucle de interacción con el usuario: arrastrar y soltar para definir ROI
-            temp = clone.copy() # Imagen temporal para dibujar rectangulo sin afectar "clone"
-            # Si el usuario está arrastrando o ya cerró la selección, dibujar el rectángulo verde
-            if selector.dragging or selector.roi_ready:
-                cv2.rectangle(temp,
-                              (selector.ix, selector.iy),
-                              (selector.fx, selector.fy),
-                              (0, 255, 0), 2)
-
-            cv2.imshow("Seleccionar ROI", temp) # Mostrar la imagen temporal
-
-            key = cv2.waitKey(1) & 0xFF # Leer teclado (1 ms). Se enmascara a 8 bits.
-            if key == 27:  # ESC para cancelar la selección (cierra ventana y retorna)
+            # Solo se redibuja cuando el mouse cambió la selección (no en cada vuelta del bucle)
+            if selector.cambio:
+                selector.cambio = False
+                temp[...] = clone
+                # Si el usuario está arrastrando o ya cerró la selección, dibujar el rectángulo verde
+                if selector.dragging or selector.roi_ready:
+                    cv2.rectangle(temp,
+                                  (selector.ix, selector.iy),
+                                  (selector.fx, selector.fy),
+                                  (0, 255, 0), 2)
+                cv2.imshow("Seleccionar ROI", temp) # Mostrar la imagen temporal
+
+            key = cv2.waitKey(15) & 0xFF # Esperar eventos (15 ms) sin ocupar el CPU. Se enmascara a 8 bits.
+            # ESC o cerrar la ventana cancelan la selección
+            if key == 27 or cv2.getWindowProperty("Seleccionar ROI", cv2.WND_PROP_VISIBLE) < 1:
                 cv2.destroyWindow("Seleccionar ROI")
                 return
             if selector.roi_ready: # Si el usuario soltó el mouse y la ROI está lista, salir del bucle
@@ -313,104 +481,25 @@ class Pantalla_UI:
 
         cv2.destroyWindow("Seleccionar ROI") # Cerrar ventana de selección una vez terminada
 
-        self.roi = selector.get_roi() # Obtener la ROI (x, y, w, h) normalizada desde el selector
-
-        # Preparar CamShif
-        x, y, w, h = self.roi
-        # Limpiar bordes: asegurarse de que la ROI esté dentro de la imagen y tenga tamaño mínimo
-        H, W = clone.shape[:2] # Alto y ancho del frame
-        x = max(0, min(x, W - 1)) # Limitar x a [0, W-1] 
-        y = max(0, min(y, H - 1)) # Limitar y a [0, H-1]
-        w = max(10, min(w, W - x)) # Limitar ancho para que no salga del borde; mínimo 10 px
-        h = max(10, min(h, H - y)) # Limitar alto para que no salga del borde; mínimo 10 px
-
-        # Guardar ROI principal ya limpia/normalizada
-        self.roi = (x, y, w, h)
-
-        # Recortar la región en BGR y convertir a HSV para construir histograma
-        roi_bgr = clone[y:y + h, x:x + w]
-        hsv_roi = cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2HSV)
-        # Construir máscara para filtrar tonos/valores no deseados (según rangos recomendados)
-        mask = cv2.inRange(hsv_roi, np.array((0., 20., 30.)), # límite inferior (H, S, V)
-                                    np.array((180., 255., 255.))) # límite superior (H, S, V)
-
-        roi_hist = cv2.calcHist([hsv_roi], [0], mask, [180], [0, 180]) # Histogramar el canal H (0..180) con la máscara para CamShift
-        cv2.normalize(roi_hist, roi_hist, 0, 255, cv2.NORM_MINMAX) # Normalizar histograma a rango [0, 255] para estabilidad numérica
-
-        # Guardar histograma y ventana inicial para CamShif
-        self.roi_hist = roi_hist
-        self.track_window = (x, y, w, h)
-
-        # Calibrar centro neutral (de frente)
-        nx = x + w / 2.0
-        ny = y + h / 2.0
-        self.neutral_center = (nx, ny)
-
-        # Criterio de parada: hasta 10 iteraciones o epsilon=1
-        self.term_crit = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 1)
+        # Normalizar la ROI, construir el histograma para CamShift y calibrar el centro neutral
+        with self.engine_lock:
+            roi = self.engine.set_roi(clone, selector.get_roi())
+        self.roi_seleccion = (clone, clone_seq, clone_ts, roi) # Para grabar el frame de la selección
         # Notificar por UI y actualizar etiqueta de estado
-        messagebox.showinfo("ROI", f"ROI registrada: {self.roi}")
-        self.status_label.configure(text=f"Estado: ROI registrada {self.roi}")
-
-    # Determina un estado textual en función de la posición del ROI y (opcionalmente) desplazamientos.
-    def _estado_desde_posicion(self, roi, frame_shape, dx=None, dy=None):
-        # Retorna una cadena de estado ("Mirando de frente", "Mirando hacia la derecha", etc.)
-        if roi is None: # Sino
-            return "Rostro Perdido"
-
-        # Calcular centro del ROI y compararlo con el centro del frame
-        x, y, w, h = roi
-        cx = x + w / 2.0
-        cy = y + h / 2.0
-
-        # Centro del frame para referencia posiciona
-        H, W = frame_shape[:2]
-        center_x = W / 2.0
-        center_y = H / 2.0
-        # Umbrales posicionales relativos al tamaño del frame (5%)
-        umbral_x_pos = W * 0.05
-        umbral_y_pos = H * 0.05
-
-        # Umbrales relativos al tamaño del rostro (evitar sensibilidd excesiva)
-        umbral_x = max(8.0, w * 0.12)
-        umbral_y = max(8.0, h * 0.15)
-
-        # Si tenemos centro neutral, usamos esa referencia (histeresis temporal para "frente")
-        if self.neutral_center is not None:
-            nx, ny = self.neutral_center
-            # Dentro de la ventana neutral si desviaciones en x/y son menores a umbral relativo al rostro
-            dentro_neutral = (abs(cx - nx) < umbral_x) and (abs(cy - ny) < umbral_y)
-            if dentro_neutral:
-                now = time.time()
-                if self._front_inside_since is None:
-                    # Marcar que entro a la zona neutral
-                    self._front_inside_since = now
-                elif (now - self._front_inside_since) * 1000.0 >= self.front_hysteresis_ms:
-                    # Si se mantiene en zona neutral más tiempo que la histeresis, considerar "frente"
-                    self.analyzer.last_direction = None
-                    return "Mirando de frente"
-            else:
-                # Salió de la zona neutral, reiniciar temporizador de histeresis
-                self._front_inside_since = None
-
-        # Si la posición del ROI está centrada respecto al frame considerar "mirando al frnete"
-        if abs(cx - center_x) < umbral_x_pos and abs(cy - center_y) < umbral_y_pos:
-            self.analyzer.last_direction = None
-            return "Mirando de frente"
-
-        # Si existe una dirección almacenada por el analizador, usarla para estados descriptivos
-        direction = getattr(self.analyzer, "last_direction", None)
-        if direction == "right":
-            return "Mirando hacia la derecha"
-        elif direction == "left":
-            return "Mirando hacia la izquierda"
-        elif direction == "up":
-            return "Mirando hacia arriba"
-        elif direction == "down":
-            return "Mirando hacia abajo"
-
-        # Si no hay información, por defecto asumir frente
-        return "Mirando de frente"
+        messagebox.showinfo("ROI", f"ROI registrada: {roi}")
+        self.status_label.configure(text=f"Estado: ROI registrada {roi}")
+
+    # Detecta el rostro en el frame actual y lo registra como ROI (sin intervención del operador).
+    # Devuelve la ROI o None si no se detectó ningún rostro
+    def adquirir_roi_automatica(self):
+        if self.frame_bgr is None or self.engine.detector is None:
+            return None
+        frame = self.frame_bgr.copy() # El ring buffer puede reutilizar la ranura
+        with self.engine_lock:
+            roi = self.engine.adquirir_roi(frame)
+        if roi is not None:
+            self.roi_seleccion = (frame, self.frame_seq, self.frame_ts, roi)
+        return roi
 
     # Examen: Inicia o detiene el examen de atención 
     def toggle_exam(self):
@@ -425,32 +514,36 @@ class Pantalla_UI:
                 messagebox.showwarning("Duración inválida", "Ingresa un número de minutos mayor a 0.")
                 return
 
-            # Validar si existe ROI previamente seleccionada
-            if self.roi is None:
+            # Validar si existe ROI previamente seleccionada (en modo automático, intentar detectarla)
+            if self.engine.roi is None:
+                self.adquirir_roi_automatica()
+            if self.engine.roi is None:
                 messagebox.showwarning("ROI", "Debes seleccionar el ROI del rostro primero.")
                 return
 
-            # Reiniciar datos del analyzer para un nuevo examen (limpia acumulados/estado)
-            try:
-                self.analyzer.reset()
-            except Exception:
-                # Si el analizador no implementa reset, continuar sin romper
-                pass
-
             # Inicializar tracker óptico con el frame actual
             if self.frame_bgr is None:
                 messagebox.showwarning("Tracker", "No hay frame disponible para inicializar el tracker.")
                 return
 
-            frame_gray = cv2.cvtColor(self.frame_bgr, cv2.COLOR_BGR2GRAY) # Convertir a escala de grises
-            ok = self.tracker.initialize(frame_gray, self.roi) # Intentar inicializar puntos dentro de la ROI
+            # Reinicia el analizador e intenta inicializar puntos dentro de la ROI. El examen empieza en el
+            # timestamp de captura de ese frame: la línea de tiempo, el diario y la duración del reporte
+            # parten del mismo instante (la réplica del modo multiproceso puede no tenerlo aún)
+            inicio = self.frame_ts
+            with self.engine_lock:
+                ok = self.engine.start(self.frame_bgr, now=inicio)
             if not ok:
                 # Si no se detectaron puntos dentro de la ROI, no iniciar examen
                 messagebox.showwarning("Tracker", "No se pudieron detectar puntos en el ROI seleccionado.")
                 return
 
-            # Marcar examen como activo
+            # Marcar examen como activo; las métricas del reporte cubren solo este examen
             self.exam_active = True
+            self.metricas.reiniciar()
+            # Diario incremental de la sesión: permite reconstruir el reporte si el proceso muere
+            self.diario = DiarioSesion(self.carpeta_sesiones)
+            self.diario.iniciar(inicio, duracion=minutes * 60.0)
+            self.iniciar_grabacion()
             # Cambiar apariencia/texto del botón de inicio (intenta usar estilo ttk; si falla, usa texto simple)
             try:
                 self.btn_start.configure(text="⏸️ Detener Examen", style="Stop.TButton")
@@ -458,8 +551,9 @@ class Pantalla_UI:
                 self.btn_start.configure(text="Detener examen")
 
             # Guardar marcas de tiempo de inicio y fin del examen
-            self.exam_start_ts = time.time()
+            self.exam_start_ts = inicio
             self.exam_end_ts = self.exam_start_ts + minutes * 60.0 # Minutos a segundos
+            self.exam_minutes = minutes
             self.status_label.configure(text="Estado: Examen iniciado.") # Actualizar etiqueta de estado en la UI
         else:
             # Si el examen ya está activo, detenerlo manualmente
@@ -467,9 +561,18 @@ class Pantalla_UI:
 
     # Actualiza el temporizador visible del examen de atención
     def update_timer(self):
+        # Rendimiento: fps de análisis (hilo de procesamiento) y de pantalla (Tk) por separado
+        analisis_fps = self.processor.fps.fps if self.processor else 0.0
+        omitidos = self.processor.planificador.fraccion_omitida * 100.0 if self.processor else 0.0
+        self.fps_label.configure(text=f"Análisis: {analisis_fps:.1f} fps ({omitidos:.0f}% omitidos) | "
+                                      f"Pantalla: {self.display_fps.fps:.1f} fps")
         if self.exam_active:
+            # Pasar al diario los intervalos nuevos (solo encola; la escritura la hace su propio hilo)
+            if self.diario:
+                with self.engine_lock:
+                    self.diario.sincronizar(self.analyzer)
             # Tiempo restante en segundos (no negativo)
-            remaining = max(0.0, self.exam_end_ts - time.time())
+            remaining = max(0.0, self.exam_end_ts - self.reloj.ahora())
             # Minutos y segundos enteros
             m = int(remaining // 60)
             s = int(remaining % 60)
@@ -492,38 +595,93 @@ class Pantalla_UI:
         except Exception:
             self.btn_start.configure(text="Iniciar examen")
         # Calcular duración real del examen (protegiendo si faltara exam_start_ts)
-        elapsed = time.time() - getattr(self, "exam_start_ts", time.time())
+        ahora = self.reloj.ahora()
+        elapsed = ahora - getattr(self, "exam_start_ts", ahora)
         kind = "detenido" if manual else "finalizado" # Texto de tipo de finalización
         # Construir reporte de atención (si el módulo Reporte está disponible/funciona)
-        try:
-            reporte = Reporte.construir_reporte(elapsed, self.analyzer)
-        except Exception:
-            # Fallback si no se puede generar reporte detallado
-            reporte = f"Examen {kind}. Duración: {elapsed:.1f} s. (No se pudo generar reporte detallado)"
+        with self.engine_lock: # El hilo de procesamiento no debe modificar el analizador mientras se lee
+            # Reset seguimiento CamShift/tracker si hace falta (no liberamos la cámara porque la UI sigue
+            # abierta). Antes del reporte: en modo multiproceso trae las métricas del proceso de análisis
+            try:
+                self.engine.stop()
+            except RuntimeError as e:
+                # El proceso de análisis no respondió (o terminó): el reporte, el diario y el almacén usan
+                # la última réplica recibida del analizador, sin las métricas del análisis
+                print("No se pudo detener el análisis:", e)
+            try:
+                reporte = Reporte.construir_reporte(elapsed, self.analyzer, self.metricas)
+            except Exception:
+                # Fallback si no se puede generar reporte detallado
+                reporte = f"Examen {kind}. Duración: {elapsed:.1f} s. (No se pudo generar reporte detallado)"
+            # Registro estructurado de la sesión (mismo id que el diario) para consultas agregadas
+            try:
+                registro = Reporte.construir_registro(
+                    elapsed, self.analyzer, self.diario.sesion_id if self.diario else time.strftime("%Y%m%d-%H%M%S"),
+                    duracion=self.exam_minutes * 60.0 if self.exam_minutes else None,
+                    inicio=getattr(self, "exam_start_ts", None))
+            except Exception:
+                registro = None
+            self.detener_grabacion()
+            # Cerrar el diario de la sesión y guardar su reporte (sesiones/<id>.txt)
+            ruta_reporte = None
+            if self.diario:
+                try:
+                    ruta_reporte = self.diario.finalizar(self.analyzer, elapsed, reporte)
+                except Exception as e:
+                    # Si falla el guardado (permisos, ruta, etc.), registrar en consola
+                    print("No se pudo guardar reporte:", e)
+                self.diario = None
+
+        if registro is not None:
+            try:
+                almacen = AlmacenSesiones(self.carpeta_almacen)
+                almacen.agregar(registro)
+                almacen.guardar_lote()
+            except Exception as e:
+                print("No se pudo guardar la sesión en el almacén:", e)
 
         # Mostrar reporte en un dialogo informativo
         messagebox.showinfo("Examen " + kind, reporte)
-        # Guardar reporte en formato UTF-8
-        try:
-            with open("reporte_atencion.txt", "w", encoding="utf-8") as f:
-                f.write(reporte)
-        except Exception as e:
-            # Si falla el guardado (permisos, ruta, etc.), registrar en consola
-            print("No se pudo guardar reporte:", e)
+        guardado = f"Reporte guardado en {ruta_reporte}." if ruta_reporte else "No se pudo guardar el reporte."
+        self.status_label.configure(text=f"Estado: Examen {kind}. {guardado}") # Actualizar estado visible en la UI
 
-        self.status_label.configure(text=f"Estado: Examen {kind}. Reporte guardado.") # Actualizar estado visible en la UI
-        # Reset seguimiento CamShift/tracker si hace falta
-        # (no liberamos la cámara porque la UI sigue abierta)
-        self.track_window = None
-        self.roi_hist = None
-        self.roi = None
+    # Graba el examen que empieza: el frame de la selección de ROI, el frame de inicio y, desde un hilo
+    # propio, todos los frames siguientes. Con estos eventos la grabación se puede reproducir igual
+    def iniciar_grabacion(self):
+        if not self.carpeta_grabaciones or self.grabador_lector is None or self.roi_seleccion is None:
+            return
+        try:
+            self.grabador = GrabadorSesion(os.path.join(self.carpeta_grabaciones, self.diario.sesion_id),
+                                           self.capture.ring.frames.shape[1:], modo=self.modo_grabacion,
+                                           fps=self.fps_camara)
+        except (OSError, ValueError) as e:
+            print("No se pudo iniciar la grabación:", e)
+            self.grabador = None
+            return
+        frame, seq, ts, roi = self.roi_seleccion
+        self.grabador.escribir_frame(frame, seq, ts)
+        # 'automatica': la reproducción debe re-adquirir el rostro igual que en vivo
+        self.grabador.evento("roi", ts, seq=seq, roi=list(roi), automatica=self.engine.detector is not None)
+        self.grabador.evento("foco", self.frame_ts, enfocada=self.winmonitor.focused)
+        self.grabador.escribir_frame(self.frame_bgr, self.frame_seq, self.frame_ts)
+        self.grabador.evento("inicio", self.frame_ts, seq=self.frame_seq)
+        self.grabador.start(self.grabador_lector)
+
+    def detener_grabacion(self):
+        if self.grabador:
+            self.grabador.evento("fin", self.reloj.ahora())
+            self.grabador.stop()
+            self.grabador = None
 
     #  Maneja el evento de ganancia de foco de la ventana (focus in).
     def on_focus_in(self, event):
         self.window_focused = True
+        ts = self.reloj.ahora() # El mismo instante en la grabación y en el monitor
+        if self.grabador:
+            self.grabador.evento("foco", ts, enfocada=True)
         try:
             # Si hay un monitor de ventana (propio), actualiza su estado
-            self.winmonitor.set_focus(True)
+            self.winmonitor.set_focus(True, ts)
         except Exception:
             # Ignorar si no existe o falla
             pass
@@ -532,14 +690,18 @@ class Pantalla_UI:
     # Maneja el evento de pérdida de foco de la ventana (focus out).
     def on_focus_out(self, event):
         self.window_focused = False
+        ts = self.reloj.ahora()
+        if self.grabador:
+            self.grabador.evento("foco", ts, enfocada=False)
         try:
-            self.winmonitor.set_focus(False)
+            self.winmonitor.set_focus(False, ts)
         except Exception:
             pass
         self.status_label.configure(text="Estado: Ventana fuera de foco.")
 
     # Cierra ordenadamente la aplicación/UI
     def cierre(self):
+        self._cerrando = True
         self.stop_camera() # Detener captura de cámara antes de destruir la UI
         try:
             self.root.destroy()
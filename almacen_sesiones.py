@@ -0,0 +1,206 @@
+# Almacén columnar local de sesiones, para consultas agregadas sobre miles de reportes sin parsear texto.
+# - Cada lote de sesiones se guarda en un archivo .npz comprimido con una columna (array numpy) por campo.
+# - indice.jsonl lista los lotes (una línea por lote, solo se agrega: varios procesos pueden escribir a la vez).
+# - Al consultar se cargan y concatenan todas las columnas una vez (con caché); filtros y agregaciones
+#   son operaciones vectorizadas sobre esas columnas (milisegundos para decenas de miles de sesiones).
+# - compactar() une todos los lotes en uno solo para que la carga siga siendo rápida con el tiempo.
+#
+# Uso:
+#   python almacen_sesiones.py almacen/ --filtro "lost_roi_pct>20" --filtro "sala==A-101"
+#   python almacen_sesiones.py almacen/ --agrupar sala --valor focus_change
+#   python almacen_sesiones.py almacen/ --compactar
+
+import argparse
+import json
+import operator
+import os
+import sys
+import time
+
+import numpy as np
+
+from attention_timeline import CAUSAS
+
+
+# Columnas del almacén y su tipo. Los porcentajes por causa (<causa>_pct) se derivan al cargar
+COLUMNAS = {
+    "sesion_id": np.str_,
+    "sala": np.str_,
+    "equipo": np.str_,
+    "inicio": np.float64, # Fecha de inicio (epoch, s)
+    "duracion": np.float64, # Duración planificada (s); NaN si no se conoce
+    "elapsed": np.float64, # Duración real (s)
+    "total_no": np.float64, # Tiempo total sin atención (s)
+    "porcentaje_no": np.float64,
+    "left": np.float64,
+    "right": np.float64,
+    "up": np.float64,
+    "down": np.float64,
+    "lost_roi": np.float64,
+    "focus_change": np.float64,
+    "episodios": np.int32,
+    "sospechoso": np.bool_,
+}
+
+
+class AlmacenSesiones:
+    def __init__(self, carpeta="almacen"):
+        os.makedirs(carpeta, exist_ok=True)
+        self.carpeta = carpeta
+        self.ruta_indice = os.path.join(carpeta, "indice.jsonl")
+        self._pendientes = [] # Registros aún no guardados en un lote
+        self._cache = None # (tamaño del índice, columnas cargadas)
+
+    # Agrega un registro de sesión (dict con las claves de COLUMNAS; ver Reporte.construir_registro)
+    def agregar(self, registro):
+        faltan = set(COLUMNAS) - set(registro)
+        if faltan:
+            raise ValueError(f"Faltan campos en el registro: {sorted(faltan)}")
+        self._pendientes.append(registro)
+
+    # Escribe los registros pendientes como un lote comprimido y lo agrega al índice.
+    # Devuelve la ruta del lote (o None si no había registros)
+    def guardar_lote(self):
+        if not self._pendientes:
+            return None
+        columnas = {c: np.array([r[c] for r in self._pendientes], dtype=t) for c, t in COLUMNAS.items()}
+        nombre = f"lote-{time.time_ns()}-{os.getpid()}.npz"
+        self._escribir_lote(nombre, columnas)
+        self._pendientes = []
+        return os.path.join(self.carpeta, nombre)
+
+    def _escribir_lote(self, nombre, columnas):
+        ruta = os.path.join(self.carpeta, nombre)
+        temporal = ruta + ".tmp"
+        with open(temporal, "wb") as f:
+            np.savez_compressed(f, **columnas)
+        os.replace(temporal, ruta)
+        entrada = {"lote": nombre, "filas": int(len(columnas["sesion_id"])),
+                   "inicio_min": float(columnas["inicio"].min()), "inicio_max": float(columnas["inicio"].max())}
+        # Una sola escritura corta en modo append: las líneas de distintos procesos no se mezclan
+        with open(self.ruta_indice, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entrada) + "\n")
+
+    def _leer_indice(self):
+        if not os.path.exists(self.ruta_indice):
+            return []
+        with open(self.ruta_indice, encoding="utf-8") as f:
+            return [json.loads(linea) for linea in f if linea.strip()]
+
+    # Todas las columnas concatenadas (dict nombre -> array). Se recargan solo si el índice cambió
+    def columnas(self):
+        tam = os.path.getsize(self.ruta_indice) if os.path.exists(self.ruta_indice) else 0
+        if self._cache is not None and self._cache[0] == tam:
+            return self._cache[1]
+        lotes = []
+        for entrada in self._leer_indice():
+            with np.load(os.path.join(self.carpeta, entrada["lote"]), allow_pickle=False) as datos:
+                lotes.append({c: datos[c] for c in COLUMNAS})
+        if lotes:
+            cols = {c: np.concatenate([l[c] for l in lotes]) for c in COLUMNAS}
+        else:
+            cols = {c: np.empty(0, dtype=t) for c, t in COLUMNAS.items()}
+        # Porcentaje del examen por causa (columnas derivadas para filtrar sin recalcular)
+        elapsed = cols["elapsed"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for causa in CAUSAS:
+                cols[causa + "_pct"] = np.where(elapsed > 0, cols[causa] / elapsed * 100.0, 0.0)
+        self._cache = (tam, cols)
+        return cols
+
+    # Máscara booleana de las sesiones que cumplen todos los filtros [(columna, operador, valor)].
+    # Operadores: ==, !=, <, <=, >, >=
+    def filtrar(self, filtros):
+        cols = self.columnas()
+        mascara = np.ones(len(cols["sesion_id"]), dtype=bool)
+        for columna, op, valor in filtros:
+            mascara &= _OPERADORES[op](cols[columna], valor)
+        return mascara
+
+    # Sesiones (dict de columnas) que cumplen los filtros
+    def consultar(self, filtros=()):
+        m = self.filtrar(filtros)
+        return {c: v[m] for c, v in self.columnas().items()}
+
+    # Agrega 'valor' por cada clave distinta de la columna 'clave' sobre las sesiones filtradas.
+    # Devuelve {clave: (n, media, máximo)}
+    def agrupar(self, clave, valor, filtros=()):
+        cols = self.consultar(filtros)
+        if len(cols[clave]) == 0:
+            return {}
+        claves, grupo = np.unique(cols[clave], return_inverse=True)
+        v = cols[valor].astype(np.float64)
+        n = np.bincount(grupo, minlength=len(claves))
+        suma = np.bincount(grupo, weights=v, minlength=len(claves))
+        maximo = np.full(len(claves), -np.inf)
+        np.maximum.at(maximo, grupo, v)
+        return {k.item(): (int(n[i]), float(suma[i] / n[i]), float(maximo[i])) for i, k in enumerate(claves)}
+
+    # Une todos los lotes en uno solo y reescribe el índice. No usar mientras otro proceso escribe
+    def compactar(self):
+        indice = self._leer_indice()
+        if len(indice) <= 1:
+            return
+        cols = self.columnas()
+        os.replace(self.ruta_indice, self.ruta_indice + ".anterior")
+        self._escribir_lote(f"lote-{time.time_ns()}-{os.getpid()}.npz", {c: cols[c] for c in COLUMNAS})
+        for entrada in indice:
+            os.remove(os.path.join(self.carpeta, entrada["lote"]))
+        os.remove(self.ruta_indice + ".anterior")
+        self._cache = None
+
+
+_OPERADORES = {"==": operator.eq, "!=": operator.ne, "<=": operator.le, ">=": operator.ge,
+               "<": operator.lt, ">": operator.gt}
+
+
+# Convierte "columna<op>valor" en (columna, op, valor); el valor se convierte a número si la columna lo es
+def _parse_filtro(texto):
+    for op in ("==", "!=", "<=", ">=", "<", ">"): # Los de dos caracteres primero
+        if op in texto:
+            columna, valor = (p.strip() for p in texto.split(op, 1))
+            tipo = COLUMNAS.get(columna, np.float64) # Las columnas derivadas <causa>_pct son numéricas
+            if tipo is np.bool_:
+                valor = valor.lower() in ("1", "true", "si", "sí")
+            elif tipo is not np.str_:
+                valor = float(valor)
+            return columna, op, valor
+    raise argparse.ArgumentTypeError(f"Filtro inválido: {texto} (ejemplo: lost_roi_pct>20)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consultas sobre el almacén columnar de sesiones")
+    parser.add_argument("carpeta", help="Carpeta del almacén")
+    parser.add_argument("--filtro", type=_parse_filtro, action="append", default=[],
+                        help="Condición columna<op>valor (se pueden repetir; se combinan con AND)")
+    parser.add_argument("--agrupar", default=None, help="Columna por la que agrupar (p. ej., sala)")
+    parser.add_argument("--valor", default="porcentaje_no", help="Columna a promediar al agrupar")
+    parser.add_argument("--compactar", action="store_true", help="Unir todos los lotes en uno")
+    args = parser.parse_args(argv)
+
+    almacen = AlmacenSesiones(args.carpeta)
+    if args.compactar:
+        almacen.compactar()
+    inicio = time.perf_counter()
+    try:
+        if args.agrupar:
+            grupos = almacen.agrupar(args.agrupar, args.valor, args.filtro)
+            print(f"{args.agrupar:<20}{'n':>8}{'media':>12}{'máx':>12}")
+            for clave, (n, media, maximo) in grupos.items():
+                print(f"{clave:<20}{n:>8}{media:>12.2f}{maximo:>12.2f}")
+        else:
+            sesiones = almacen.consultar(args.filtro)
+            for i in range(len(sesiones["sesion_id"])):
+                print(f"{sesiones['sesion_id'][i]}\t{sesiones['sala'][i]}\t"
+                      f"{sesiones['porcentaje_no'][i]:.1f}% sin atención\t"
+                      f"{'Sospechoso' if sesiones['sospechoso'][i] else 'Normal'}")
+            print(f"{len(sesiones['sesion_id'])} sesiones")
+    except KeyError as e:
+        print(f"Columna desconocida: {e}", file=sys.stderr)
+        return 1
+    print(f"({(time.perf_counter() - inicio) * 1000.0:.1f} ms)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
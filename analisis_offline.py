@@ -0,0 +1,202 @@
+# Análisis offline de exámenes grabados, sin interfaz gráfica.
+# Procesa todos los frames de un video tan rápido como lo permita el CPU,
+# usando los timestamps del video en lugar del reloj de pared, y genera el mismo
+# reporte que la UI (Reporte.construir_reporte).
+# También reproduce grabaciones de la UI (main.py --grabar): con una carpeta de grabación
+# la ROI, el inicio, el fin y el foco de la ventana se toman de los eventos grabados.
+#
+# Uso:
+#   python analisis_offline.py video.mp4 --roi 200,120,180,220 --duracion 60 [--salida reporte.txt]
+#   python analisis_offline.py video.mp4 --roi-automatica [--duracion 60]
+#   python analisis_offline.py sala.mp4 --roi 80,120,160,200 --roi 420,110,170,210 (un reporte por rostro)
+#   python analisis_offline.py grabaciones/20261017-101500/ [--salida reporte.txt]
+#                              [--escala 0.5] [--margen 1.0] [--metricas metricas.json|metricas.prom]
+#                              [--almacen almacen/ --sesion-id alumno01 --sala A-101]
+
+import argparse
+import sys
+
+import os
+
+import cv2
+
+from almacen_sesiones import AlmacenSesiones
+from analysis_engine import AnalysisEngine
+from detector_rostro import DetectorRostro
+from motor_multirostro import MotorMultiRostro
+from grabacion import ReproductorSesion
+from reloj import RELOJ
+from reporte import Reporte
+
+
+# Devuelve el timestamp (segundos) del frame recién leído.
+# Se usa CAP_PROP_POS_MSEC; si el backend no lo reporta (o no es creciente) se usa índice / fps
+def _timestamp_frame(cap, indice, fps, anterior):
+    ts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+    if anterior is not None and ts <= anterior:
+        ts = indice / fps if fps > 0 else anterior
+    return ts
+
+
+# Itera (frame, ts) sobre un video (o una cámara si ruta es un int, con el reloj de pared)
+def leer_frames(ruta):
+    cap = cv2.VideoCapture(ruta)
+    if not cap.isOpened():
+        raise IOError(f"No se pudo abrir el video: {ruta}")
+    en_vivo = isinstance(ruta, int) # Una cámara en vivo no tiene timestamps de contenedor fiables
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    try:
+        indice, ts = 0, None
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                if indice == 0:
+                    raise IOError(f"El video no contiene frames: {ruta}")
+                break
+            ts = RELOJ.ahora() if en_vivo else _timestamp_frame(cap, indice, fps, ts)
+            indice += 1
+            yield frame, ts
+    finally:
+        cap.release()
+
+
+# Analiza un video grabado a partir de una ROI inicial (x, y, w, h).
+# Con roi=None el rostro se detecta en el primer frame (el engine necesita un detector).
+# ruta también puede ser un índice de cámara (int); en ese caso se usa el reloj de pared.
+# duracion: segundos de examen a analizar (None = hasta el final del video).
+# Devuelve (elapsed, engine) con el tiempo analizado y el motor con el analizador ya acumulado
+def analizar_video(ruta, roi, duracion=None, engine=None):
+    engine = engine or AnalysisEngine()
+    frames = leer_frames(ruta)
+    frame, inicio = next(frames)
+    ultimo = inicio
+
+    # Preparar CamShift e inicializar el tracker con el primer frame (equivalente a "Iniciar Examen")
+    if roi is None:
+        if engine.adquirir_roi(frame) is None:
+            raise ValueError("No se detectó ningún rostro en el primer frame.")
+    else:
+        engine.set_roi(frame, roi)
+    if not engine.start(frame, now=inicio):
+        raise ValueError("No se pudieron detectar puntos en el ROI seleccionado.")
+
+    for frame, ts in frames:
+        # Fin del examen cuando se alcanza la duración indicada
+        if duracion is not None and ts - inicio > duracion:
+            break
+        engine.process_frame(frame, now=ts)
+        ultimo = ts
+    frames.close()
+
+    engine.stop()
+    return ultimo - inicio, engine
+
+
+# Analiza varios candidatos en el mismo video (una cámara por sala) con MotorMultiRostro.
+# rois: lista de ROIs iniciales; el rostro k (desde 1) corresponde a rois[k - 1].
+# Devuelve (elapsed, motor); el analizador de cada candidato es motor.rostros[k].analyzer
+def analizar_video_sala(ruta, rois, duracion=None, motor=None):
+    motor = motor or MotorMultiRostro()
+    frames = leer_frames(ruta)
+    frame, inicio = next(frames)
+    ultimo = inicio
+    for roi in rois:
+        motor.agregar_rostro(frame, roi)
+    sin_puntos = motor.start(frame, now=inicio)
+    if sin_puntos:
+        raise ValueError(f"No se pudieron detectar puntos en las ROIs de los rostros {sin_puntos}.")
+    for frame, ts in frames:
+        if duracion is not None and ts - inicio > duracion:
+            break
+        motor.process_frame(frame, now=ts)
+        ultimo = ts
+    frames.close()
+    motor.stop()
+    return ultimo - inicio, motor
+
+
+# Convierte "x,y,w,h" en una tupla de enteros
+def _parse_roi(texto):
+    partes = texto.split(",")
+    if len(partes) != 4:
+        raise argparse.ArgumentTypeError("La ROI debe tener el formato x,y,w,h")
+    return tuple(int(p) for p in partes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis offline de un examen grabado")
+    parser.add_argument("video", help="Ruta del video grabado o carpeta de una grabación de la UI")
+    parser.add_argument("--roi", type=_parse_roi, action="append", default=None,
+                        help="ROI inicial del rostro: x,y,w,h (obligatoria para videos sin --roi-automatica). "
+                             "Repetida, analiza varios candidatos del mismo video en un solo proceso")
+    parser.add_argument("--roi-automatica", action="store_true",
+                        help="Detectar el rostro (si no hay --roi) y re-adquirirlo cuando el seguimiento se pierde")
+    parser.add_argument("--duracion", type=float, default=None,
+                        help="Duración del examen en segundos (por defecto, todo el video)")
+    parser.add_argument("--salida", default=None, help="Archivo donde guardar el reporte (por defecto, stdout)")
+    parser.add_argument("--escala", type=float, default=1.0,
+                        help="Factor de reducción para CamShift y flujo óptico (por defecto 1.0)")
+    parser.add_argument("--margen", type=float, default=None,
+                        help="Procesar solo un recorte alrededor de la ROI con este margen (fracción de la ROI)")
+    parser.add_argument("--metricas", default=None,
+                        help="Guardar la latencia por etapa (JSON, o Prometheus si termina en .prom) "
+                             "y agregar su resumen al reporte")
+    parser.add_argument("--almacen", default=None, help="Guardar la sesión en este almacén columnar")
+    parser.add_argument("--sesion-id", default=None, help="Id de la sesión en el almacén (por defecto, el nombre del video)")
+    parser.add_argument("--sala", default="", help="Sala del examen (para consultas agregadas)")
+    args = parser.parse_args(argv)
+
+    try:
+        engine = AnalysisEngine(escala=args.escala, margen_busqueda=args.margen)
+        if os.path.isdir(args.video):
+            reproductor = ReproductorSesion(args.video)
+            # Una sesión grabada en modo automático se reproduce con el mismo detector
+            ev_roi = reproductor.evento("roi")
+            if args.roi_automatica or (ev_roi is not None and ev_roi.get("automatica")):
+                engine.detector = DetectorRostro()
+            elapsed, engine = reproductor.reproducir(engine)
+        elif args.roi is None and not args.roi_automatica:
+            raise ValueError("Para analizar un video hay que indicar --roi x,y,w,h o --roi-automatica")
+        elif args.roi is not None and len(args.roi) > 1:
+            # Varios candidatos en el mismo video: un solo proceso y un flujo óptico por frame
+            motor = MotorMultiRostro(escala=args.escala,
+                                     margen_busqueda=args.margen if args.margen is not None else 1.0)
+            elapsed, engine = analizar_video_sala(args.video, args.roi, args.duracion, motor)
+        else:
+            if args.roi_automatica:
+                engine.detector = DetectorRostro()
+            elapsed, engine = analizar_video(args.video, args.roi[0] if args.roi else None, args.duracion, engine)
+    except (IOError, ValueError) as e:
+        print("Error:", e, file=sys.stderr)
+        return 1
+
+    # (sufijo del id de sesión, analizador) por candidato
+    if isinstance(engine, MotorMultiRostro):
+        candidatos = [(f"-{i}", rostro.analyzer) for i, rostro in engine.rostros.items()]
+    else:
+        candidatos = [("", engine.analyzer)]
+    metricas = engine.metricas if args.metricas else None
+    reportes = []
+    for sufijo, analyzer in candidatos:
+        encabezado = f"== Rostro {sufijo[1:]} ==\n" if sufijo else ""
+        reportes.append(encabezado + Reporte.construir_reporte(elapsed, analyzer, metricas))
+    reporte = "\n\n".join(reportes)
+    if metricas is not None:
+        metricas.exportar(args.metricas)
+    if args.almacen:
+        sesion_id = args.sesion_id or os.path.splitext(os.path.basename(os.path.normpath(args.video)))[0]
+        almacen = AlmacenSesiones(args.almacen)
+        for sufijo, analyzer in candidatos:
+            almacen.agregar(Reporte.construir_registro(elapsed, analyzer, sesion_id + sufijo, sala=args.sala,
+                                                       duracion=args.duracion))
+        almacen.guardar_lote()
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(reporte)
+    else:
+        print(reporte)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,452 @@
+# Motor de análisis sin interfaz gráfica.
+# Contiene todo el pipeline de detección (CamShift, flujo óptico, análisis de atención y estado textual)
+# que antes vivía dentro de Pantalla_UI.show_frame, para poder usarlo tanto desde la UI
+# como desde el análisis offline de videos grabados (analisis_offline.py).
+# El tiempo se recibe como parámetro (now) para poder usar timestamps de frame en lugar del reloj de pared;
+# sin now se usa el reloj inyectado (reloj.py), que en las pruebas puede ser un RelojSimulado.
+
+import time
+
+import cv2
+import numpy as np
+
+from optical_flow_tracker import OpticalFlowTracker
+from attention_analyzer import AttentionAnalyzer
+from frame_planes import FramePlanes
+from detector_rostro import iou
+from metricas import Metricas
+from reloj import RELOJ
+
+
+# Resultado del procesamiento de un frame: lo necesario para dibujar y mostrar el estado
+class FrameResult:
+    __slots__ = ("roi", "dx", "dy", "texto", "track_box", "tracking_perdido", "readquirido")
+
+    def __init__(self, roi=None, dx=None, dy=None, texto="", track_box=None, tracking_perdido=False,
+                 readquirido=False):
+        self.roi = roi # ROI (x, y, w, h) en coordenadas del frame completo, o None
+        self.dx = dx # Desplazamiento promedio horizontal del frame (o None)
+        self.dy = dy # Desplazamiento promedio vertical del frame (o None)
+        self.texto = texto # Estado textual ("Mirando de frente", "Rostro Perdido", ...)
+        self.track_box = track_box # Elipse rotada devuelta por CamShift (o None)
+        self.tracking_perdido = tracking_perdido # True si CamShift falló en este frame
+        self.readquirido = readquirido # True si el detector volvió a sembrar la ROI en este frame
+
+
+# Limpia una ROI (x, y, w, h): la recorta a los bordes de una imagen con forma 'shape' y le da un tamaño mínimo
+def normalizar_roi(roi, shape):
+    x, y, w, h = (int(v) for v in roi)
+    H, W = shape[:2] # Alto y ancho del frame
+    x = max(0, min(x, W - 1)) # Limitar x a [0, W-1]
+    y = max(0, min(y, H - 1)) # Limitar y a [0, H-1]
+    w = max(10, min(w, W - x)) # Limitar ancho para que no salga del borde; mínimo 10 px
+    h = max(10, min(h, H - y)) # Limitar alto para que no salga del borde; mínimo 10 px
+    return (x, y, w, h)
+
+
+# Máscara de los píxeles que pueden ser del rostro: descarta tonos/valores no deseados (poca saturación
+# o muy oscuros, según rangos recomendados). La usan el histograma de CamShift y la siembra de puntos
+def mascara_rostro(hsv):
+    return cv2.inRange(hsv, np.array((0., 20., 30.)), # límite inferior (H, S, V)
+                            np.array((180., 255., 255.))) # límite superior (H, S, V)
+
+
+# Zona donde se siembran los puntos del flujo óptico: la máscara del rostro erosionada, para no
+# sembrar en el borde rostro/fondo (esos puntos se quedan pegados al fondo cuando la cabeza gira)
+_NUCLEO_SIEMBRA = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (9, 9))
+
+
+def mascara_siembra(hsv):
+    return cv2.erode(mascara_rostro(hsv), _NUCLEO_SIEMBRA)
+
+
+# Histograma del canal H de la ROI (en coordenadas de 'hsv'), con máscara, para la proyección inversa de CamShift
+def histograma_roi(hsv, roi):
+    x, y, w, h = roi
+    # Recortar la región del HSV del frame para construir histograma
+    hsv_roi = hsv[y:y + h, x:x + w]
+    # Construir máscara para filtrar tonos/valores no deseados
+    mask = mascara_rostro(hsv_roi)
+
+    roi_hist = cv2.calcHist([hsv_roi], [0], mask, [180], [0, 180]) # Histogramar el canal H (0..180) con la máscara para CamShift
+    cv2.normalize(roi_hist, roi_hist, 0, 255, cv2.NORM_MINMAX) # Normalizar histograma a rango [0, 255] para estabilidad numérica
+    return roi_hist
+
+
+# Estado textual de la mirada de un candidato ("Mirando de frente", "Mirando hacia la derecha", ...).
+# Lo comparten AnalysisEngine (un candidato) y motor_multirostro.Rostro (varios por cámara); la subclase
+# debe definir reloj, analyzer, neutral_center, front_hysteresis_ms y _front_inside_since
+class EstadoMirada:
+    # Determina un estado textual en función de la posición del ROI y (opcionalmente) desplazamientos.
+    def _estado_desde_posicion(self, roi, frame_shape, dx=None, dy=None, now=None):
+        # Retorna una cadena de estado ("Mirando de frente", "Mirando hacia la derecha", etc.)
+        if roi is None:
+            return "Rostro Perdido"
+
+        # Calcular centro del ROI y compararlo con el centro del frame
+        x, y, w, h = roi
+        cx = x + w / 2.0
+        cy = y + h / 2.0
+
+        # Centro del frame para referencia posicional
+        H, W = frame_shape[:2]
+        center_x = W / 2.0
+        center_y = H / 2.0
+        # Umbrales posicionales relativos al tamaño del frame (5%)
+        umbral_x_pos = W * 0.05
+        umbral_y_pos = H * 0.05
+
+        # Umbrales relativos al tamaño del rostro (evitar sensibilidad excesiva)
+        umbral_x = max(8.0, w * 0.12)
+        umbral_y = max(8.0, h * 0.15)
+
+        # Si tenemos centro neutral, usamos esa referencia (histeresis temporal para "frente")
+        if self.neutral_center is not None:
+            nx, ny = self.neutral_center
+            # Dentro de la ventana neutral si desviaciones en x/y son menores a umbral relativo al rostro
+            dentro_neutral = (abs(cx - nx) < umbral_x) and (abs(cy - ny) < umbral_y)
+            if dentro_neutral:
+                if now is None:
+                    now = self.reloj.ahora()
+                if self._front_inside_since is None:
+                    # Marcar que entro a la zona neutral
+                    self._front_inside_since = now
+                elif (now - self._front_inside_since) * 1000.0 >= self.front_hysteresis_ms:
+                    # Si se mantiene en zona neutral más tiempo que la histeresis, considerar "frente"
+                    self.analyzer.last_direction = None
+                    return "Mirando de frente"
+            else:
+                # Salió de la zona neutral, reiniciar temporizador de histeresis
+                self._front_inside_since = None
+
+        # Si la posición del ROI está centrada respecto al frame considerar "mirando al frente"
+        if abs(cx - center_x) < umbral_x_pos and abs(cy - center_y) < umbral_y_pos:
+            self.analyzer.last_direction = None
+            return "Mirando de frente"
+
+        # Si existe una dirección almacenada por el analizador, usarla para estados descriptivos
+        direction = getattr(self.analyzer, "last_direction", None)
+        if direction == "right":
+            return "Mirando hacia la derecha"
+        elif direction == "left":
+            return "Mirando hacia la izquierda"
+        elif direction == "up":
+            return "Mirando hacia arriba"
+        elif direction == "down":
+            return "Mirando hacia abajo"
+
+        # Si no hay información, por defecto asumir frente
+        return "Mirando de frente"
+
+
+# Motor que agrupa el estado de seguimiento y análisis de un candidato.
+# Modo de procesamiento reducido (configurar antes de set_roi):
+# - escala: CamShift y flujo óptico trabajan sobre el frame reducido por este factor (1.0 = resolución completa)
+# - margen_busqueda: si no es None, solo se procesa un recorte alrededor de la ROI, ampliado en esta
+#   fracción de su tamaño por cada lado; así el costo depende del tamaño del rostro y no de la cámara.
+# self.roi, los overlays y dx/dy siempre se expresan en coordenadas (píxeles) del frame completo;
+# track_window y la ROI del tracker están en coordenadas del frame reducido.
+# Las latencias de cada etapa (conversion, deteccion, camshift, flujo_optico, analisis) se registran en self.metricas
+# Adquisición automática (detector = detector_rostro.DetectorRostro): adquirir_roi() siembra la ROI sin
+# selección manual y, durante el examen, el detector se ejecuta solo cada intervalo_deteccion frames
+# analizados (para corregir una ROI que derivó) o, con el rostro perdido, cada reintento_deteccion frames
+class AnalysisEngine(EstadoMirada):
+    def __init__(self, escala=1.0, margen_busqueda=None, metricas=None, detector=None, intervalo_deteccion=30,
+                 reintento_deteccion=3, reloj=None, monitor=None):
+        self.reloj = reloj or RELOJ  # Reloj para las llamadas sin marca de tiempo (también lo usa el analizador)
+        self.escala = escala  # Factor de reducción para CamShift y flujo óptico
+        self.margen_busqueda = margen_busqueda  # Relleno de la ventana de búsqueda (fracción de la ROI) o None
+        self.roi = None  # Región de interés (rostro)
+        self.tracker = OpticalFlowTracker(margen_poda=0.2)  # Rastreador óptico (descarta puntos que salen de la ROI de CamShift)
+        self.analyzer = AttentionAnalyzer(self.reloj, monitor)  # Analizador de atención (monitor: WindowMonitor o None)
+        self.exam_active = False  # Indica si un examen está en curso
+        self.frames_procesados = 0  # Frames procesados desde el inicio del examen
+        self.frames_omitidos = 0  # Frames omitidos (skip_frame) desde el último frame procesado
+        self._ultimo_resultado = FrameResult(texto="Rostro Perdido")  # Estado que se repite en los frames omitidos
+        self.planes = FramePlanes()  # Conversiones de color del frame actual (calculadas una sola vez)
+        self.metricas = metricas or Metricas()  # Histogramas de latencia por etapa
+        self.detector = detector  # Detector de rostros para la adquisición automática (None = solo ROI manual)
+        self.intervalo_deteccion = intervalo_deteccion  # Frames entre verificaciones con el rostro seguido
+        self.reintento_deteccion = reintento_deteccion  # Frames entre intentos de re-adquisición con el rostro perdido
+        self.readquisiciones = 0  # Veces que el detector volvió a sembrar la ROI durante el examen
+        self._frames_sin_deteccion = 0  # Frames analizados desde la última detección
+
+        # Variables adicionales para detectar si se mira al frente
+        self.neutral_center = None  # Centro neutral del rostro
+        self.front_hysteresis_ms = 250  # Tiempo de histéresis para confirmar mirada al frente
+        self._front_inside_since = None  # Timestamp desde que se detectó dentro del área neutral
+
+        # Variables necesarias para CamShift / tracking
+        self.roi_hist = None # Histograma de la ROI para CamShift
+        self.track_window = None # Ventana de seguimiento para CamShift
+        self.term_crit = None # Criterios de terminación para CamShift
+
+    # Registra la ROI seleccionada sobre el frame dado: la normaliza a los bordes de la imagen,
+    # genera el histograma HSV con máscara para CamShift y calibra el centro neutral.
+    # Devuelve la ROI normalizada (x, y, w, h)
+    def set_roi(self, frame_bgr, roi):
+        # Guardar ROI principal ya limpia/normalizada
+        self.roi = normalizar_roi(roi, frame_bgr.shape)
+        x, y, w, h = self.roi
+        self._sembrar_camshift(self.planes.set_frame(frame_bgr))
+
+        # Calibrar centro neutral (de frente)
+        self.neutral_center = (x + w / 2.0, y + h / 2.0)
+
+        # Criterio de parada: hasta 10 iteraciones o epsilon=1
+        self.term_crit = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 1)
+        return self.roi
+
+    # Construye el histograma de CamShift y la ventana de seguimiento a partir de self.roi
+    def _sembrar_camshift(self, planes):
+        # Guardar histograma y ventana inicial para CamShift (en coordenadas de procesamiento)
+        self.roi_hist = histograma_roi(planes.hsv, self.roi)
+        self.track_window = self._to_proc(self.roi)
+
+    # Adquisición automática: detecta el rostro en el frame y lo registra como ROI (igual que set_roi).
+    # Devuelve la ROI normalizada, o None si no hay detector o no se encontró ningún rostro
+    def adquirir_roi(self, frame_bgr):
+        if self.detector is None:
+            return None
+        caja = self.detector.detectar(self.planes.set_frame(frame_bgr).scaled("gray", self.escala))
+        if caja is None:
+            return None
+        return self.set_roi(frame_bgr, self._to_frame(caja))
+
+    # Ejecuta el detector durante el examen. Con el rostro perdido, o si la ROI seguida ya no coincide
+    # con el rostro detectado (CamShift derivó hacia el cuello o las manos), vuelve a sembrar CamShift
+    # y el flujo óptico sobre la detección. El centro neutral y el analizador no cambian.
+    # Devuelve True si se re-adquirió la ROI
+    def _verificar_rostro(self, planes):
+        self._frames_sin_deteccion = 0
+        t = time.perf_counter()
+        gray = planes.scaled("gray", self.escala)
+        caja = self.detector.detectar(gray)
+        readquirido = False
+        # Sin detección (p. ej., un giro de perfil) se conserva el seguimiento actual
+        if caja is not None and (self.track_window is None or iou(caja, self.track_window) < 0.3):
+            self.roi = normalizar_roi(self._to_frame(caja), planes.bgr.shape)
+            self._sembrar_camshift(planes)
+            roi_p = self.track_window
+            x0, y0, x1, y1 = self._search_region(roi_p, gray.shape)
+            self.tracker.initialize(gray[y0:y1, x0:x1], roi_p, offset=(x0, y0),
+                                    mascara=mascara_siembra(planes.scaled("hsv", self.escala)[y0:y1, x0:x1]))
+            self.readquisiciones += 1
+            readquirido = True
+        self.metricas.observar("deteccion", time.perf_counter() - t)
+        return readquirido
+
+    # Inicia el examen: reinicia el analizador e inicializa el tracker óptico con el frame actual.
+    # Devuelve False si no se detectaron puntos dentro de la ROI
+    def start(self, frame_bgr, now=None):
+        if self.roi is None:
+            return False
+        gray = self.planes.set_frame(frame_bgr).scaled("gray", self.escala) # Escala de grises (reducida si aplica)
+        roi_p = self._to_proc(self.roi)
+        x0, y0, x1, y1 = self._search_region(roi_p, gray.shape)
+        # Intentar inicializar puntos dentro de la ROI
+        # Puntos solo sobre el rostro: las esquinas del fondo dentro del rectángulo no se mueven con él
+        mascara = mascara_siembra(self.planes.scaled("hsv", self.escala)[y0:y1, x0:x1])
+        if not self.tracker.initialize(gray[y0:y1, x0:x1], roi_p, offset=(x0, y0), mascara=mascara):
+            return False
+        # Reiniciar datos del analyzer para un nuevo examen (limpia acumulados/estado)
+        self.analyzer.reset(now)
+        self.frames_procesados = 0
+        self.frames_omitidos = 0
+        self.readquisiciones = 0
+        self._frames_sin_deteccion = 0
+        self.exam_active = True
+        return True
+
+    # Convierte una ROI del frame completo a coordenadas de procesamiento
+    def _to_proc(self, roi):
+        if self.escala >= 1.0:
+            return tuple(int(v) for v in roi)
+        return tuple(int(round(v * self.escala)) for v in roi)
+
+    # Convierte una ROI de coordenadas de procesamiento al frame completo
+    def _to_frame(self, roi):
+        if self.escala >= 1.0:
+            return tuple(int(v) for v in roi)
+        return tuple(int(round(v / self.escala)) for v in roi)
+
+    # Región (x0, y0, x1, y1) de la imagen de procesamiento que se analiza alrededor de la ROI
+    def _search_region(self, roi, shape):
+        H, W = shape[:2]
+        if self.margen_busqueda is None or roi is None:
+            return 0, 0, W, H
+        x, y, w, h = roi
+        px = int(w * self.margen_busqueda) + 1
+        py = int(h * self.margen_busqueda) + 1
+        return max(0, x - px), max(0, y - py), min(W, x + w + px), min(H, y + h + py)
+
+    # Región para el flujo óptico. LK necesita que el recorte previo y el actual tengan el mismo tamaño,
+    # así que se conserva el tamaño del recorte anterior (y su posición mientras la ROI siga dentro con holgura);
+    # solo si la ROI ya no cabe se usa una región nueva y el tracker vuelve a detectar puntos
+    def _lk_region(self, roi, shape):
+        H, W = shape[:2]
+        prev = self.tracker.prev_gray
+        if self.margen_busqueda is None or prev is None:
+            return self._search_region(roi, shape)
+        ph, pw = prev.shape[:2]
+        pox, poy = self.tracker.prev_offset
+        x, y, w, h = roi
+        bx = int(w * self.margen_busqueda / 2)
+        by = int(h * self.margen_busqueda / 2)
+        if w + 2 * bx > pw or h + 2 * by > ph or pw > W or ph > H:
+            return self._search_region(roi, shape)
+        # La ROI sigue dentro del recorte anterior con holgura: misma región
+        if x - bx >= pox and y - by >= poy and x + w + bx <= pox + pw and y + h + by <= poy + ph:
+            return pox, poy, pox + pw, poy + ph
+        # Re-centrar un recorte del mismo tamaño sobre la ROI, sin salir de la imagen
+        x0 = min(max(0, x + w // 2 - pw // 2), W - pw)
+        y0 = min(max(0, y + h // 2 - ph // 2), H - ph)
+        return x0, y0, x0 + pw, y0 + ph
+
+    # Detiene el examen y limpia el estado de seguimiento CamShift
+    def stop(self):
+        self.exam_active = False
+        self.track_window = None
+        self.roi_hist = None
+        self.roi = None
+
+    # Frame que no se analiza (lo decide el planificador adaptativo): sin CamShift ni flujo óptico,
+    # pero el tiempo transcurrido se integra en el analizador con el último estado conocido
+    # (el giro en curso, la pérdida del rostro o el foco actual de la ventana; con monitor, el foco
+    # ya es exacto por sus transiciones y omitir frames no lo altera)
+    def skip_frame(self, now=None, window_focused=True):
+        if now is None:
+            now = self.reloj.ahora()
+        self.frames_omitidos += 1
+        if self.exam_active:
+            self.analyzer.update(None, None, roi_present=self.roi is not None, window_focused=window_focused, now=now)
+        return self._ultimo_resultado
+
+    # Procesa un frame BGR completo: CamShift, flujo óptico, análisis de atención y estado textual.
+    # now: marca de tiempo del frame (segundos); si es None se usa self.reloj
+    def process_frame(self, frame_bgr, now=None, window_focused=True):
+        if now is None:
+            now = self.reloj.ahora()
+        result = FrameResult()
+        self.frames_procesados += 1
+        # Frames de cámara desde el último análisis: dx/dy se reparten entre ellos para que
+        # el umbral del analizador (px por frame) no cambie al omitir frames
+        pasos = 1 + self.frames_omitidos
+        self.frames_omitidos = 0
+        planes = self.planes.set_frame(frame_bgr) # Cada plano derivado se calcula como máximo una vez
+        esc = self.escala
+        metricas = self.metricas
+        perf = time.perf_counter
+
+        # DETECCIÓN (solo en modo automático): cada intervalo_deteccion frames, o más seguido sin rostro
+        if self.exam_active and self.detector is not None:
+            self._frames_sin_deteccion += 1
+            espera = self.reintento_deteccion if self.roi is None else self.intervalo_deteccion
+            if self._frames_sin_deteccion >= espera:
+                result.readquirido = self._verificar_rostro(planes)
+
+        # CONVERSIÓN DE COLOR
+        # Se calculan aquí los planos que usarán CamShift y el flujo óptico, para medir su costo por separado
+        camshift_activo = self.exam_active and self.roi_hist is not None and self.track_window is not None
+        if self.exam_active:
+            t = perf()
+            if camshift_activo:
+                planes.scaled("hue", esc)
+            if self.tracker.initialized:
+                planes.scaled("gray", esc)
+            metricas.observar("conversion", perf() - t)
+
+        # CAMSHIFT TRACKING
+        # Solo si el examen está activo y la ROI y ventana de seguimiento están definidas
+        if camshift_activo:
+            t = perf()
+            hue = planes.scaled("hue", esc)
+            x0, y0, x1, y1 = self._search_region(self.track_window, hue.shape)
+            # Proyección inversa sobre el canal H (el único que usa el histograma), solo en la región de búsqueda
+            backproj = cv2.calcBackProject([hue[y0:y1, x0:x1]], [0], self.roi_hist, [0, 180], 1)
+            # Aplicar CamShift para actualizar la posición de la ROI
+            try:
+                tx, ty, tw, th = self.track_window
+                track_box, ventana = cv2.CamShift(backproj, (tx - x0, ty - y0, tw, th), self.term_crit) # Actualizar ventana de seguimiento
+            except Exception:
+                track_box = None
+            metricas.observar("camshift", perf() - t)
+            # Sin masa en la proyección inversa CamShift no falla: devuelve una elipse de tamaño cero
+            # y agranda la ventana. Ambos casos cuentan como rostro perdido
+            if track_box is None or track_box[1][0] <= 0 or track_box[1][1] <= 0:
+                # Si CamShift falla, resetear estado de tracking
+                self.track_window = None # Resetear ventana de seguimiento
+                self.roi_hist = None # Resetear histograma de la ROI
+                self.roi = None # Resetear la ROI
+                result.tracking_perdido = True
+                # En modo automático, intentar re-adquirir el rostro en el siguiente frame
+                self._frames_sin_deteccion = self.reintento_deteccion
+            else:
+                x, y, w_t, h_t = ventana # Desempaquetar la ventana de seguimiento (relativa al recorte)
+                self.track_window = (int(x) + x0, int(y) + y0, int(w_t), int(h_t))
+                # Elipse en coordenadas del frame completo
+                (cx, cy), (bw, bh), ang = track_box
+                result.track_box = (((cx + x0) / esc, (cy + y0) / esc), (bw / esc, bh / esc), ang)
+                # Actualizar la ROI basada en la ventana de seguimiento
+                self.roi = self._to_frame(self.track_window)
+                # Actualizar el tracker óptico con la nueva ROI
+                if self.tracker.initialized:
+                    self.tracker.update_roi(self.track_window)
+
+        shape = frame_bgr.shape
+        t_analisis = perf()
+        lk = 0.0 # Tiempo del flujo óptico (se descuenta del análisis)
+        # OPTICAL FLOW TRACKING
+        # Solo si el examen está activo
+        if self.exam_active:
+            if self.roi is None: # Si no hay ROI definida
+                # ROI perdido: marcar como falta de atención por pérdida de rostro
+                self.analyzer.update(None, None, roi_present=False, window_focused=window_focused, now=now)
+                txt = self._estado_desde_posicion(self.roi, shape, now=now)
+            elif self.tracker.initialized: # Si el tracker óptico está inicializado
+                gray = planes.scaled("gray", esc)
+                x0, y0, x1, y1 = self._lk_region(self.tracker.roi_box, gray.shape)
+                t = perf()
+                # Obtener desplazamientos (dx, dy); si se vuelven a detectar puntos, solo sobre el rostro
+                track = self.tracker.track(gray[y0:y1, x0:x1], offset=(x0, y0),
+                                           mascara=lambda: mascara_siembra(planes.scaled("hsv", esc)[y0:y1, x0:x1]))
+                lk = perf() - t
+                metricas.observar("flujo_optico", lk)
+                # Puntos actuales del tracker para el análisis de simetría
+                points = track.points
+                if track.dx is not None: # Si se pudo calcular movimiento
+                    # Desplazamientos en píxeles del frame completo y por frame de cámara
+                    # (los umbrales del analizador no cambian)
+                    dx, dy = track.dx / (esc * pasos), track.dy / (esc * pasos)
+                    result.dx, result.dy = dx, dy
+                    # 1) Actualizar giro natural
+                    self.analyzer.update(dx, dy, roi_present=True, window_focused=window_focused, now=now)
+                    # 2) Detectar si está de frente por simetría de puntos
+                    txt = None
+                    if len(points) > 0:
+                        try:
+                            if self.analyzer.is_facing_forward(points, self.tracker.roi_box):
+                                txt = "Mirando de frente"
+                                self.analyzer.last_direction = None # La dirección anterior se resetea
+                        except Exception:
+                            # Si is_facing_forward falla por cualquier motivo, usar la posición
+                            txt = None
+                    if txt is None:
+                        txt = self._estado_desde_posicion(self.roi, shape, dx, dy, now=now)
+                else:
+                    # No se pudo calcular movimiento (puntos perdidos), asumir atención (sin movimiento)
+                    self.analyzer.update(0, 0, roi_present=True, window_focused=window_focused, now=now)
+                    txt = self._estado_desde_posicion(self.roi, shape, 0, 0, now=now)
+            else:
+                # Si el tracker óptico no está inicializado, deducir estado con la info disponible
+                txt = self._estado_desde_posicion(self.roi, shape, now=now)
+        else:
+            # Si el examen NO está activo, igualmente mostrar estado (p. ej., "Rostro Perdido" sin ROI)
+            txt = self._estado_desde_posicion(self.roi, shape, now=now)
+        if self.exam_active:
+            metricas.observar("analisis", perf() - t_analisis - lk)
+
+        result.roi = self.roi
+        result.texto = txt
+        self._ultimo_resultado = result
+        return result
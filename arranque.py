@@ -0,0 +1,47 @@
+# Medición del tiempo de arranque de la aplicación por fases.
+# main.py marca cada fase (ventana visible, imports pesados, UI construida, sesiones interrumpidas
+# recuperadas, cámara abierta, primer frame, primer frame mostrado); con --medir-arranque imprime el
+# desglose y termina.
+# Este módulo solo usa la biblioteca estándar para poder importarse antes que cv2/numpy/PIL.
+
+import json
+import threading
+import time
+
+
+class MedidorArranque:
+    def __init__(self, inicio=None):
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.fases = [] # (nombre, segundos desde el inicio), en orden de llegada
+        self._lock = threading.Lock() # Las fases se marcan desde el hilo de Tk y desde hilos de fondo
+
+    # Registra el fin de una fase (solo la primera vez que se marca)
+    def marcar(self, fase):
+        with self._lock:
+            if fase not in self:
+                self.fases.append((fase, time.perf_counter() - self.inicio))
+
+    def __contains__(self, fase):
+        return any(nombre == fase for nombre, _ in self.fases)
+
+    # Segundos desde el inicio hasta la fase (o None si aún no ocurrió)
+    def tiempo(self, fase):
+        for nombre, t in self.fases:
+            if nombre == fase:
+                return t
+        return None
+
+    # Tabla: fase, tiempo acumulado y duración de la fase (desde la fase anterior)
+    def resumen(self):
+        with self._lock:
+            fases = sorted(self.fases, key=lambda f: f[1])
+        lineas = [f"{'Fase':<26}{'acumulado ms':>14}{'fase ms':>10}"]
+        anterior = 0.0
+        for nombre, t in fases:
+            lineas.append(f"{nombre:<26}{t * 1000.0:>14.1f}{(t - anterior) * 1000.0:>10.1f}")
+            anterior = t
+        return "\n".join(lineas)
+
+    def a_json(self):
+        with self._lock:
+            return json.dumps({nombre: t for nombre, t in self.fases}, indent=2)
@@ -2,55 +2,91 @@
 # atención, giro izquierda/derecha/arriba/abajo y pérdida de la region de interes
 # Basado en los desplazamientos generados por optical_flow_tracker.py
 
-import time
+import numpy as np
 
-# Analiza la atención del usuario a partir de desplazamientos (dx, dy), presencia de ROI y foco de ventana
+from attention_timeline import CAUSAS, AttentionTimeline
+from reloj import RELOJ
+
+# Códigos de causa (índices en CAUSAS) usados por update_batch
+_LEFT, _RIGHT, _UP, _DOWN = (CAUSAS.index(c) for c in ("left", "right", "up", "down"))
+_LOST_ROI, _FOCUS_CHANGE = CAUSAS.index("lost_roi"), CAUSAS.index("focus_change")
+_SIN_DIRECCION = len(CAUSAS) # last_direction = None
+
+# Analiza la atención del usuario a partir de desplazamientos (dx, dy), presencia de ROI y foco de ventana.
+# Con un monitor (window_monitor.WindowMonitor) el foco no se muestrea por frame: update() solo registra
+# los intervalos de la visión y timeline los combina con las transiciones de foco del monitor
 class AttentionAnalyzer:
-    def __init__(self):
+    def __init__(self, reloj=None, monitor=None):
+        self.reloj = reloj or RELOJ # Reloj para las llamadas sin marca de tiempo (reloj.RelojSistema por defecto)
+        self.monitor = monitor # WindowMonitor con las transiciones de foco (None = foco por frame en update)
+        self._combinada = None # (clave, timeline) de la última combinación con el monitor
         # Marca el momento de la última actualización (ultimo frame procesado)
-        self.last_movement_time = time.time()
-
-        self.total_no_atention = 0 # Acumula el tiempo sin atención (en segundos)
-        # Desglose del tiempo sin atención por tipo
-        self.no_attention_breakdown = {
-            "left": 0, # Timepo acumulado girando a la izquierda
-            "right": 0, # Tiempo acumulado girando a la derecha
-            "up": 0, # Tiempo acumulado girando hacia arriba
-            "down": 0, # Tiempo acumulado girando hacia abajo
-            "lost_roi": 0, # Tiempo acumulado sin ROI detectado
-            "focus_change": 0 # Tiempo acumulado com cambio de ventana
-        }
+        self.last_movement_time = self.reloj.ahora()
+        self.start_time = self.last_movement_time # Inicio del examen (origen de la línea de tiempo)
+
+        # Intervalos sin atención (inicio, fin, causa); los totales y el desglose se derivan de aquí
+        self._timeline = AttentionTimeline()
 
         self.attention_threshold = 3.0  # umbral de segundos para considerar falta de atención
+        self.umbral_simetria = 0.7 # Simetría mínima (min/max de puntos por lado) para considerar mirada al frente
 
     # Función para reiniciar los contadores para un nuevo examen
-    def reset(self):
-        self.total_no_atention = 0  # Reinicia el tiempo total sin atención
-        # Reinicia el desglose por tipo
-        self.no_attention_breakdown = {
-            "left": 0,
-            "right": 0,
-            "up": 0,
-            "down": 0,
-            "lost_roi": 0,
-            "focus_change": 0
-        }
-        self.last_movement_time = time.time()  # Reinicia la marca de tiempo (evita que se acumule tiempo previo)
+    # now: marca de tiempo opcional (p. ej. timestamp del frame en análisis offline); por defecto self.reloj
+    def reset(self, now=None):
+        self.timeline = AttentionTimeline()  # Reinicia la línea de tiempo (y con ella totales y desglose)
+        self.last_movement_time = self.reloj.ahora() if now is None else now  # Reinicia la marca de tiempo (evita que se acumule tiempo previo)
+        self.start_time = self.last_movement_time
+
+    # Línea de tiempo sin atención. Con monitor, la de la visión combinada con los intervalos fuera de
+    # foco entre el inicio y el último frame; se recalcula solo si algo cambió desde la última consulta
+    @property
+    def timeline(self):
+        monitor = self.monitor
+        if monitor is None:
+            return self._timeline
+        vision = self._timeline
+        clave = (monitor, monitor.version, vision.n, vision.fines[vision.n - 1] if vision.n else None,
+                 self.start_time, self.last_movement_time)
+        if self._combinada is None or self._combinada[0] != clave:
+            fuera = monitor.intervalos_fuera(self.start_time, self.last_movement_time)
+            self._combinada = (clave, vision.con_foco(*fuera))
+        return self._combinada[1]
+
+    @timeline.setter
+    def timeline(self, timeline):
+        self._timeline = timeline
+        self._combinada = None
+
+    # Intervalos de la visión (dirección y pérdida de la ROI), sin el foco del monitor
+    @property
+    def timeline_vision(self):
+        return self._timeline
+
+    # Tiempo total sin atención (en segundos)
+    @property
+    def total_no_atention(self):
+        return self.timeline.total()
+
+    # Desglose del tiempo sin atención por tipo: left, right, up, down, lost_roi, focus_change
+    @property
+    def no_attention_breakdown(self):
+        return self.timeline.desglose()
 
     # Actuliza el estado de usando el desplazamiento del frame actual
-    def update(self, dx, dy, roi_present=True, window_focused=True):
-        now = time.time() # Marca de tiempo actual
-        dt = now - self.last_movement_time # Diferencia de tiempo desde la última actualización
+    # now: marca de tiempo del frame; si no se indica se usa self.reloj
+    # window_focused solo se usa sin monitor (con monitor, el foco sale de sus transiciones)
+    def update(self, dx, dy, roi_present=True, window_focused=True, now=None):
+        if now is None:
+            now = self.reloj.ahora() # Marca de tiempo actual
+        anterior = self.last_movement_time # El intervalo desde la última actualización es [anterior, now)
         self.last_movement_time = now # Actualiza la marca de tiempo para el próximo frame
 
         if not roi_present: # Si la ROI no está presente en el frame actual:
-            self.total_no_atention += dt # Acumula tiempo sin atención
-            self.no_attention_breakdown["lost_roi"] += dt # Acumula a la causa específica
+            self._timeline.registrar(anterior, now, "lost_roi") # Registra el intervalo con su causa
             return # No evalua más condiciones, sale 
 
-        if not window_focused: #Si la ventana de examen no es la que esta al frente o se cambio de ventana:
-            self.total_no_atention += dt # Acumula tiempo sin atención
-            self.no_attention_breakdown["focus_change"] += dt # Acumula a la causa específica
+        if not window_focused and self.monitor is None: #Si la ventana de examen no es la que esta al frente o se cambio de ventana:
+            self._timeline.registrar(anterior, now, "focus_change") # Registra el intervalo con su causa
             return # No evalua más condiciones, sale
 
         direction = None # Inicializa la dirección del movimiento como None
@@ -73,10 +109,57 @@ class AttentionAnalyzer:
             # Si no hay movimiento, mantener la última dirección
             direction = getattr(self, "last_direction", None)
 
-        # Si hay una dirección de giro detectada, acumular tiempo sin atención
+        # Si hay una dirección de giro detectada, registrar el intervalo sin atención
         if direction:
-            self.total_no_atention += dt # Acumula tiempo sin atención
-            self.no_attention_breakdown[direction] += dt # Acumula a la causa específica
+            self._timeline.registrar(anterior, now, direction)
+
+    # Versión vectorizada de update() para una serie de muestras (p. ej. trazas de movimiento guardadas,
+    # para recalcular con otros umbrales sin volver a procesar el video). Arrays de igual largo:
+    # timestamps, dx y dy (NaN = sin desplazamiento, como None en update), roi_present y focused
+    # (bool o un valor para todas). frente: opcional, True donde tras la muestra se detectó la mirada al
+    # frente y se reinició last_direction (lo que hace AnalysisEngine entre dos llamadas a update).
+    # El resultado (línea de tiempo, last_direction, last_movement_time) es idéntico al de llamar a
+    # update() muestra por muestra.
+    # La dirección sostenida se resuelve con un forward-fill: cada muestra i ocupa dos posiciones, la
+    # 2i con la dirección detectada (si hubo) y la 2i+1 con el reinicio por mirada al frente (si hubo);
+    # la dirección vigente en la muestra i es el último evento en o antes de la posición 2i
+    def update_batch(self, timestamps, dx, dy, roi_present=True, focused=True, frente=None):
+        ts = np.asarray(timestamps, dtype=np.float64)
+        n = len(ts)
+        if n == 0:
+            return
+        dx = np.asarray(dx, dtype=np.float64)
+        dy = np.asarray(dy, dtype=np.float64)
+        roi = np.broadcast_to(np.asarray(roi_present, dtype=bool), (n,))
+        enfocada = np.broadcast_to(np.asarray(focused, dtype=bool), (n,))
+        anteriores = np.empty(n)
+        anteriores[0] = self.last_movement_time
+        anteriores[1:] = ts[:-1]
+
+        fuera = roi & ~enfocada if self.monitor is None else np.zeros(n, dtype=bool)
+        activa = roi & ~fuera # Muestras en las que se evalúa la dirección
+        th = self.attention_threshold
+        valida = activa & ~np.isnan(dx) & ~np.isnan(dy)
+        detectada = np.select([dx > th, dx < -th, dy > th, dy < -th], [_RIGHT, _LEFT, _DOWN, _UP], -1)
+        detectada[~valida] = -1
+
+        eventos = np.full(2 * n, -1, dtype=np.int64)
+        eventos[0::2] = detectada
+        if frente is not None:
+            eventos[1::2][np.asarray(frente, dtype=bool)] = _SIN_DIRECCION
+        ultimo = np.where(eventos >= 0, np.arange(2 * n), -1)
+        np.maximum.accumulate(ultimo, out=ultimo)
+        previa = getattr(self, "last_direction", None)
+        vigente = np.where(ultimo >= 0, eventos[np.maximum(ultimo, 0)],
+                           CAUSAS.index(previa) if previa is not None else _SIN_DIRECCION)
+
+        direccion = vigente[0::2]
+        codigos = np.where(activa & (direccion != _SIN_DIRECCION), direccion, -1)
+        codigos[fuera] = _FOCUS_CHANGE
+        codigos[~roi] = _LOST_ROI
+        self._timeline.registrar_lote(anteriores, ts, codigos)
+        self.last_movement_time = float(ts[-1])
+        self.last_direction = CAUSAS[vigente[-1]] if vigente[-1] != _SIN_DIRECCION else None
 
     # Detecta si el alumno está mirando al frente usando simetría vertical
     def is_facing_forward(self, points, roi):
@@ -88,15 +171,10 @@ class AttentionAnalyzer:
         x, y, w, h = roi # Desempaqueta la ROI (posición y tamaño)
         cx_split = x + w / 2  # Calcula la mitad de la roi de forma vertical
 
-        left = 0 # Contador de puntos a la izquierda de la línea central
-        right = 0 # Contador de puntos a la derecha de la línea central
-
-        # Contar puntos en izquierda y derecha del ROI
-        for (px, py) in points:
-            if px < cx_split:
-                left += 1
-            else:
-                right += 1
+        # Contar puntos a la izquierda y derecha de la línea central (vectorizado sobre el array de puntos)
+        xs = np.asarray(points).reshape(-1, 2)[:, 0]
+        left = int(np.count_nonzero(xs < cx_split))
+        right = len(xs) - left
 
         # Si solo hay puntos en un lado, no hay simetría suficiente
         if left == 0 or right == 0:
@@ -106,4 +184,4 @@ class AttentionAnalyzer:
         ratio = min(left, right) / max(left, right)
 
         # Umbral recomendado: 70% de simetría
-        return ratio > 0.7
+        return ratio > self.umbral_simetria
@@ -0,0 +1,155 @@
+# Línea de tiempo de la falta de atención: registro comprimido por tramos (run-length) de los
+# intervalos sin atención, en arrays numpy preasignados que crecen por duplicación.
+# Cada fila es un intervalo [inicio, fin) con su causa; intervalos contiguos de la misma causa se
+# fusionan en uno solo, así la memoria crece con el número de cambios de estado y no con el de frames
+# (17 bytes por intervalo: un examen de horas con cientos de episodios ocupa unos pocos KB).
+# Los totales, el desglose por causa, el número de episodios, el episodio más largo y el histograma
+# por minuto se calculan a partir de este registro.
+
+import numpy as np
+
+
+# Causas de falta de atención, en el orden de sus códigos en el registro
+CAUSAS = ("left", "right", "up", "down", "lost_roi", "focus_change")
+_CODIGOS = {causa: i for i, causa in enumerate(CAUSAS)}
+
+
+class AttentionTimeline:
+    def __init__(self, capacidad=64):
+        self.inicios = np.empty(capacidad, dtype=np.float64) # Inicio de cada intervalo (s)
+        self.fines = np.empty(capacidad, dtype=np.float64) # Fin de cada intervalo (s)
+        self.causas = np.empty(capacidad, dtype=np.int8) # Código de causa (índice en CAUSAS)
+        self.n = 0 # Intervalos registrados
+
+    # Registra el intervalo [inicio, fin) sin atención por 'causa'. O(1) amortizado:
+    # si continúa al último intervalo con la misma causa solo se extiende su fin
+    def registrar(self, inicio, fin, causa):
+        if fin <= inicio:
+            return
+        codigo = _CODIGOS[causa]
+        n = self.n
+        if n and self.causas[n - 1] == codigo and self.fines[n - 1] == inicio:
+            self.fines[n - 1] = fin
+            return
+        if n == len(self.inicios):
+            self._crecer()
+        self.inicios[n] = inicio
+        self.fines[n] = fin
+        self.causas[n] = codigo
+        self.n = n + 1
+
+    # Registra en orden muchos intervalos [inicios, fines) con sus códigos de causa (índices en CAUSAS;
+    # -1 = sin falta de atención). Equivale a llamar a registrar() con cada uno: se descartan los
+    # vacíos y los de código -1, y los contiguos de la misma causa se fusionan entre sí y con el último
+    # intervalo registrado
+    def registrar_lote(self, inicios, fines, codigos):
+        m = (fines > inicios) & (codigos >= 0)
+        a, b, c = inicios[m], fines[m], codigos[m]
+        if len(a) == 0:
+            return
+        nuevo = np.ones(len(a), dtype=bool) # Intervalo que no continúa al anterior
+        nuevo[1:] = (c[1:] != c[:-1]) | (a[1:] != b[:-1])
+        primeros = np.flatnonzero(nuevo)
+        ultimos = np.append(primeros[1:] - 1, len(a) - 1)
+        a, b, c = a[primeros], b[ultimos], c[primeros]
+        n = self.n
+        if n and self.causas[n - 1] == c[0] and self.fines[n - 1] == a[0]:
+            self.fines[n - 1] = b[0]
+            a, b, c = a[1:], b[1:], c[1:]
+        while n + len(a) > len(self.inicios):
+            self._crecer()
+        self.inicios[n:n + len(a)] = a
+        self.fines[n:n + len(a)] = b
+        self.causas[n:n + len(a)] = c
+        self.n = n + len(a)
+
+    # Duplica la capacidad de los arrays conservando los intervalos registrados
+    def _crecer(self):
+        capacidad = 2 * len(self.inicios)
+        for nombre in ("inicios", "fines", "causas"):
+            viejo = getattr(self, nombre)
+            nuevo = np.empty(capacidad, dtype=viejo.dtype)
+            nuevo[:self.n] = viejo[:self.n]
+            setattr(self, nombre, nuevo)
+
+    # Vistas (inicios, fines, causas) de los intervalos registrados, opcionalmente de una sola causa
+    def intervalos(self, causa=None):
+        inicios, fines, causas = self.inicios[:self.n], self.fines[:self.n], self.causas[:self.n]
+        if causa is None:
+            return inicios, fines, causas
+        m = causas == _CODIGOS[causa]
+        return inicios[m], fines[m], causas[m]
+
+    # Duración de cada intervalo
+    def duraciones(self, causa=None):
+        inicios, fines, _ = self.intervalos(causa)
+        return fines - inicios
+
+    # Tiempo total sin atención
+    def total(self):
+        return float(self.duraciones().sum())
+
+    # Tiempo sin atención por causa
+    def desglose(self):
+        inicios, fines, causas = self.intervalos()
+        sumas = np.bincount(causas, weights=fines - inicios, minlength=len(CAUSAS))
+        return {causa: float(sumas[i]) for i, causa in enumerate(CAUSAS)}
+
+    # Número de episodios (intervalos) por causa
+    def episodios(self):
+        cuentas = np.bincount(self.causas[:self.n], minlength=len(CAUSAS))
+        return {causa: int(cuentas[i]) for i, causa in enumerate(CAUSAS)}
+
+    # Episodio más largo (de una causa o de cualquiera): (duración, inicio, causa) o None si no hubo
+    def episodio_mas_largo(self, causa=None):
+        inicios, fines, causas = self.intervalos(causa)
+        if len(inicios) == 0:
+            return None
+        i = int(np.argmax(fines - inicios))
+        return float(fines[i] - inicios[i]), float(inicios[i]), CAUSAS[causas[i]]
+
+    # Segundos sin atención en cada minuto desde 'origen' hasta 'fin' (por defecto, el último intervalo).
+    # Se evalúa el tiempo acumulado sin atención en cada borde de minuto: los intervalos están ordenados
+    # y no se solapan, así que solo el último que empezó antes del borde puede cruzarlo
+    def histograma_por_minuto(self, origen, fin=None, causa=None, minuto=60.0):
+        inicios, fines, _ = self.intervalos(causa)
+        if fin is None:
+            fin = float(fines[-1]) if len(fines) else origen
+        bordes = origen + minuto * np.arange(int(np.ceil(max(0.0, fin - origen) / minuto)) + 1)
+        if len(inicios) == 0:
+            return np.zeros(len(bordes) - 1)
+        acumulado = np.concatenate(([0.0], np.cumsum(fines - inicios)))
+        k = np.searchsorted(inicios, bordes, side="right") # Intervalos que empiezan antes de cada borde
+        exceso = np.where(k > 0, np.maximum(0.0, fines[np.maximum(k - 1, 0)] - bordes), 0.0)
+        return np.diff(acumulado[k] - exceso)
+
+    # Nueva línea de tiempo con los intervalos fuera de foco [inicios_fuera, fines_fuera) superpuestos
+    # a los de este registro (los de la visión). Prioridad: lost_roi > focus_change > dirección.
+    # Barrido sobre los bordes de ambos registros: entre dos bordes consecutivos la causa es constante,
+    # se evalúa en cada tramo elemental y los tramos contiguos de la misma causa se fusionan
+    def con_foco(self, inicios_fuera, fines_fuera):
+        if len(inicios_fuera) == 0:
+            return self
+        inicios, fines, causas = self.intervalos()
+        bordes = np.unique(np.concatenate((inicios, fines, inicios_fuera, fines_fuera)))
+        a, b = bordes[:-1], bordes[1:]
+        codigo = np.full(len(a), -1, dtype=np.int64) # Causa de la visión en cada tramo (-1 = atento)
+        if len(inicios):
+            k = np.searchsorted(inicios, a, side="right") - 1 # Intervalo de la visión que podría contener al tramo
+            dentro = (k >= 0) & (fines[np.maximum(k, 0)] > a)
+            codigo[dentro] = causas[k[dentro]]
+        j = np.searchsorted(inicios_fuera, a, side="right") - 1
+        fuera = (j >= 0) & (fines_fuera[np.maximum(j, 0)] > a)
+        codigo = np.where((codigo != _CODIGOS["lost_roi"]) & fuera, _CODIGOS["focus_change"], codigo)
+
+        combinada = AttentionTimeline()
+        combinada.registrar_lote(a, b, codigo)
+        return combinada
+
+    # Memoria ocupada por los arrays del registro (bytes)
+    @property
+    def nbytes(self):
+        return self.inicios.nbytes + self.fines.nbytes + self.causas.nbytes
+
+    def __len__(self):
+        return self.n
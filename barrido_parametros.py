@@ -0,0 +1,303 @@
+# Barrido de parámetros del tracker y del analizador sobre clips etiquetados, en paralelo (un proceso
+# por núcleo). Cada configuración reproduce todos los clips con el mismo AnalysisEngine que se usa en
+# vivo y se evalúa con:
+#   - exactitud: fracción de frames cuya causa (giro, pérdida del rostro, cambio de ventana o atento)
+#     coincide con la etiqueta
+#   - error_desglose: suma de |obtenido - etiquetado| (s) del desglose por causa
+#   - fps y latencia p50/p95 de AnalysisEngine.process_frame ("procesamiento" en Metricas)
+# y se imprime el frente de Pareto (exactitud frente a fps): las configuraciones que ninguna otra
+# supera en ambas cosas a la vez. La configuración actual del código siempre se evalúa como referencia.
+#
+# Clips:
+#   sintetico[:WxH[:semilla]]  examen sintético (synthetic_video.py) con su guion como etiqueta
+#   <carpeta>                  grabación (grabacion.py) con etiquetas.jsonl: una línea
+#                              {"inicio": ts, "fin": ts, "causa": "left"} por intervalo sin atención,
+#                              en el reloj de la grabación (el resto del examen se considera atento)
+#
+# Las latencias se miden con todos los procesos ocupados; con --procesos 1 se miden sin competencia.
+#
+# Uso:
+#   python barrido_parametros.py [sintetico] [sintetico:1280x720:3] [grabaciones/a01 ...]
+#                                [--muestras 64] [--param escala=0.5,0.75,1.0] [--procesos 8]
+#                                [--semilla 0] [--top 15] [--json barrido.json]
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from analysis_engine import AnalysisEngine
+from attention_timeline import CAUSAS
+from grabacion import ReproductorSesion
+from metricas import Metricas
+from synthetic_video import SyntheticExam
+
+
+# Espacio de búsqueda por defecto: parámetro -> valores. Incluye los valores actuales del código
+# y los anteriores que quedaron en los comentarios
+ESPACIO_POR_DEFECTO = {
+    "escala": (0.5, 0.75, 1.0), # AnalysisEngine: reducción para CamShift y flujo óptico
+    "margen": (None, 1.0), # AnalysisEngine: ventana de búsqueda (None = frame completo)
+    "max_corners": (100, 200, 300, 500), # goodFeaturesToTrack maxCorners
+    "win_size": (11, 15, 21, 31), # calcOpticalFlowPyrLK winSize (cuadrada)
+    "max_level": (1, 2, 3), # calcOpticalFlowPyrLK maxLevel
+    "attention_threshold": (2.0, 3.0, 4.0, 5.0), # AttentionAnalyzer: desplazamiento (px) que cuenta como giro
+    "umbral_simetria": (0.6, 0.7, 0.8), # AttentionAnalyzer: simetría para mirada al frente
+    "front_hysteresis_ms": (100, 250, 500), # AnalysisEngine: histéresis de "Mirando de frente"
+}
+
+# Configuración actual del código (la referencia)
+ACTUAL = {"escala": 1.0, "margen": None, "max_corners": 300, "win_size": 21, "max_level": 3,
+          "attention_threshold": 3.0, "umbral_simetria": 0.7, "front_hysteresis_ms": 250}
+
+
+# Crea un AnalysisEngine con la configuración dada
+def crear_engine(config, metricas=None):
+    engine = AnalysisEngine(escala=config["escala"], margen_busqueda=config["margen"], metricas=metricas)
+    engine.tracker.feature_params["maxCorners"] = int(config["max_corners"])
+    engine.tracker.lk_params["winSize"] = (int(config["win_size"]), int(config["win_size"]))
+    engine.tracker.lk_params["maxLevel"] = int(config["max_level"])
+    engine.analyzer.attention_threshold = float(config["attention_threshold"])
+    engine.analyzer.umbral_simetria = float(config["umbral_simetria"])
+    engine.front_hysteresis_ms = float(config["front_hysteresis_ms"])
+    return engine
+
+
+# Configuraciones a evaluar: la cuadrícula completa (muestras=0) o una muestra aleatoria sin repetir.
+# La configuración actual va primero
+def configuraciones(espacio, muestras=64, semilla=0):
+    nombres = list(espacio)
+    actual = dict(ACTUAL)
+    total = int(np.prod([len(espacio[n]) for n in nombres]))
+    if muestras <= 0 or muestras >= total:
+        combinaciones = [dict(zip(nombres, valores)) for valores in itertools.product(*(espacio[n] for n in nombres))]
+    else:
+        # Muestreo por índice de la cuadrícula: no la materializa aunque tenga millones de puntos
+        rng = random.Random(semilla)
+        combinaciones = []
+        for indice in rng.sample(range(total), muestras):
+            config = {}
+            for n in reversed(nombres):
+                indice, k = divmod(indice, len(espacio[n]))
+                config[n] = espacio[n][k]
+            combinaciones.append({n: config[n] for n in nombres})
+    return [actual] + [c for c in combinaciones if c != actual]
+
+
+# Código de causa (índice en CAUSAS, -1 = atento) vigente en cada instante según intervalos [inicio, fin)
+def _codigos_en(inicios, fines, codigos, instantes):
+    if len(inicios) == 0:
+        return np.full(len(instantes), -1, dtype=np.int64)
+    orden = np.argsort(inicios, kind="stable")
+    inicios, fines, codigos = inicios[orden], fines[orden], np.asarray(codigos)[orden]
+    i = np.searchsorted(inicios, instantes, side="right") - 1
+    dentro = (i >= 0) & (instantes < fines[np.maximum(i, 0)])
+    return np.where(dentro, codigos[np.maximum(i, 0)], -1).astype(np.int64)
+
+
+# Compara la línea de tiempo del analizador con las etiquetas. instantes: timestamps de los frames
+# analizados (el primero es el inicio del examen); esperados: código esperado de cada intervalo
+# [instantes[i-1], instantes[i]). Devuelve (aciertos, error_desglose)
+def evaluar(timeline, instantes, esperados):
+    instantes = np.asarray(instantes, dtype=np.float64)
+    medios = (instantes[:-1] + instantes[1:]) / 2.0
+    inicios, fines, causas = timeline.intervalos()
+    obtenidos = _codigos_en(inicios, fines, causas, medios)
+    aciertos = int(np.count_nonzero(obtenidos == esperados))
+    dt = np.diff(instantes)
+    error = 0.0
+    for codigo in range(len(CAUSAS)):
+        error += abs(float(dt[obtenidos == codigo].sum()) - float(dt[esperados == codigo].sum()))
+    return aciertos, error
+
+
+# Reproduce el examen sintético 'fuente' con la configuración. Devuelve (frames, aciertos, error_desglose)
+def _clip_sintetico(fuente, config, metricas):
+    partes = fuente.split(":")
+    width, height = (int(v) for v in partes[1].lower().split("x")) if len(partes) > 1 else (640, 480)
+    video = SyntheticExam(width, height, semilla=int(partes[2]) if len(partes) > 2 else 0)
+    engine = crear_engine(config, metricas)
+    frames = video.frames()
+    frame, ts0, _, _ = next(frames)
+    engine.set_roi(frame, video.roi)
+    if not engine.start(frame, now=ts0):
+        raise ValueError(f"{fuente}: no se detectaron puntos en la ROI")
+    instantes = [ts0]
+    for frame, ts, enfocada, _ in frames:
+        t = time.perf_counter()
+        engine.process_frame(frame, now=ts, window_focused=enfocada)
+        metricas.observar("procesamiento", time.perf_counter() - t)
+        instantes.append(ts)
+    codigos = {causa: i for i, causa in enumerate(CAUSAS)}
+    esperados = np.array([codigos.get(e, -1) for e in video.etiquetas[1:]], dtype=np.int64)
+    aciertos, error = evaluar(engine.analyzer.timeline, instantes, esperados)
+    return len(esperados), aciertos, error
+
+
+# Reproduce una grabación etiquetada con la configuración. Devuelve (frames, aciertos, error_desglose)
+def _clip_grabacion(carpeta, config, metricas):
+    ruta = os.path.join(carpeta, "etiquetas.jsonl")
+    if not os.path.exists(ruta):
+        raise IOError(f"La grabación no tiene etiquetas: {ruta}")
+    with open(ruta, encoding="utf-8") as f:
+        etiquetas = [json.loads(linea) for linea in f if linea.strip()]
+    reproductor = ReproductorSesion(carpeta)
+    engine = crear_engine(config, metricas)
+    elapsed, engine = reproductor.reproducir(engine)
+    # Frames que procesó reproducir(): posteriores al inicio y hasta el fin del examen
+    inicio = reproductor.evento("inicio")
+    fin = inicio["ts"] + elapsed
+    i_inicio = reproductor.indice_de(inicio["seq"])
+    ts = reproductor.timestamps
+    posteriores = ts[i_inicio + 1:]
+    instantes = np.concatenate([[inicio["ts"]], posteriores[posteriores <= fin]])
+    medios = (instantes[:-1] + instantes[1:]) / 2.0
+    codigos = {causa: i for i, causa in enumerate(CAUSAS)}
+    esperados = _codigos_en(np.array([e["inicio"] for e in etiquetas], dtype=np.float64),
+                            np.array([e["fin"] for e in etiquetas], dtype=np.float64),
+                            np.array([codigos[e["causa"]] for e in etiquetas], dtype=np.int64), medios)
+    aciertos, error = evaluar(engine.analyzer.timeline, instantes, esperados)
+    return len(esperados), aciertos, error
+
+
+# Trabajo de cada proceso: evalúa una configuración sobre todos los clips. Devuelve un resumen serializable
+def _evaluar_configuracion(config, fuentes):
+    # Un solo hilo de OpenCV por proceso: el paralelismo lo dan los procesos, no los hilos internos
+    cv2.setNumThreads(1)
+    metricas = Metricas() # Un histograma para todos los clips de la configuración
+    resultado = {"config": config, "frames": 0, "exactitud": 0.0, "error_desglose": 0.0,
+                 "fps": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "error": None}
+    aciertos = 0
+    try:
+        for fuente in fuentes:
+            if fuente.split(":")[0] == "sintetico":
+                n, a, e = _clip_sintetico(fuente, config, metricas)
+            else:
+                n, a, e = _clip_grabacion(fuente, config, metricas)
+            resultado["frames"] += n
+            aciertos += a
+            resultado["error_desglose"] += e
+    except Exception as e:
+        # Una configuración inválida no debe detener el barrido
+        resultado["error"] = str(e)
+        return resultado
+    procesamiento = metricas.resumen().get("procesamiento", {})
+    resultado["exactitud"] = aciertos / resultado["frames"] if resultado["frames"] else 0.0
+    resultado["fps"] = 1000.0 / procesamiento["media_ms"] if procesamiento.get("media_ms") else 0.0
+    resultado["p50_ms"] = procesamiento.get("p50_ms", 0.0)
+    resultado["p95_ms"] = procesamiento.get("p95_ms", 0.0)
+    return resultado
+
+
+# Evalúa todas las configuraciones repartidas en 'procesos' workers (por defecto, uno por núcleo).
+# Devuelve los resultados en el orden de 'configs'
+def barrer(configs, fuentes, procesos=None):
+    procesos = procesos or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(procesos, max(1, len(configs)))) as pool:
+        futuros = [pool.submit(_evaluar_configuracion, c, list(fuentes)) for c in configs]
+        return [f.result() for f in futuros]
+
+
+# Frente de Pareto: resultados sin error que ninguna otra configuración supera en exactitud y fps a la vez
+# (al menos igual en ambas y mejor en una). Ordenado por exactitud descendente
+def frente_pareto(resultados):
+    validos = [r for r in resultados if r["error"] is None]
+    frente = []
+    for r in validos:
+        dominado = any(o["exactitud"] >= r["exactitud"] and o["fps"] >= r["fps"]
+                       and (o["exactitud"] > r["exactitud"] or o["fps"] > r["fps"]) for o in validos)
+        if not dominado:
+            frente.append(r)
+    return sorted(frente, key=lambda r: (-r["exactitud"], -r["fps"]))
+
+
+# Texto compacto de una configuración (solo lo que difiere de la actual)
+def _describir(config):
+    cambios = [f"{n}={v}" for n, v in config.items() if ACTUAL.get(n) != v]
+    return ", ".join(cambios) if cambios else "(actual)"
+
+
+# Tabla de resultados: exactitud, error del desglose, fps y latencias
+def _tabla(resultados):
+    lineas = [f"{'exactitud':>9} {'error s':>8} {'fps':>8} {'p50 ms':>7} {'p95 ms':>7}  configuración"]
+    for r in resultados:
+        if r["error"] is not None:
+            lineas.append(f"{'-':>9} {'-':>8} {'-':>8} {'-':>7} {'-':>7}  {_describir(r['config'])}: {r['error']}")
+            continue
+        lineas.append(f"{r['exactitud'] * 100:8.2f}% {r['error_desglose']:8.2f} {r['fps']:8.1f} "
+                      f"{r['p50_ms']:7.2f} {r['p95_ms']:7.2f}  {_describir(r['config'])}")
+    return "\n".join(lineas)
+
+
+# Parámetros con valores enteros (el resto son float)
+_ENTEROS = ("max_corners", "win_size", "max_level", "front_hysteresis_ms")
+
+
+# Convierte "nombre=v1,v2,..." en (nombre, valores); "none" es None
+def _parse_param(texto):
+    nombre, _, valores = texto.partition("=")
+    if nombre not in ESPACIO_POR_DEFECTO or not valores:
+        raise argparse.ArgumentTypeError(
+            f"Formato: nombre=v1,v2,... con nombre en {', '.join(ESPACIO_POR_DEFECTO)}")
+    convertidos = []
+    for v in valores.split(","):
+        if v.strip().lower() == "none":
+            convertidos.append(None)
+        else:
+            convertidos.append(int(v) if nombre in _ENTEROS else float(v))
+    return nombre, tuple(convertidos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barrido de parámetros del tracker y del analizador sobre clips etiquetados")
+    parser.add_argument("clips", nargs="*", default=["sintetico"],
+                        help="sintetico[:WxH[:semilla]] o carpetas de grabaciones con etiquetas.jsonl")
+    parser.add_argument("--muestras", type=int, default=64,
+                        help="Configuraciones aleatorias a evaluar (0 = cuadrícula completa)")
+    parser.add_argument("--param", type=_parse_param, action="append", default=[],
+                        help="Valores de un parámetro, p. ej. escala=0.5,1.0 (reemplaza los del espacio por defecto)")
+    parser.add_argument("--procesos", type=int, default=None, help="Número de procesos (por defecto, núcleos del CPU)")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla del muestreo aleatorio")
+    parser.add_argument("--top", type=int, default=15, help="Mejores configuraciones a listar")
+    parser.add_argument("--json", default=None, help="Guardar todos los resultados en un JSON")
+    args = parser.parse_args(argv)
+
+    espacio = dict(ESPACIO_POR_DEFECTO)
+    espacio.update(dict(args.param))
+    configs = configuraciones(espacio, args.muestras, args.semilla)
+    print(f"Evaluando {len(configs)} configuraciones sobre {len(args.clips)} clip(s)...", file=sys.stderr)
+    inicio = time.perf_counter()
+    resultados = barrer(configs, args.clips, args.procesos)
+    print(f"Barrido completo en {time.perf_counter() - inicio:.1f} s\n", file=sys.stderr)
+
+    referencia = resultados[0]
+    if referencia["error"] is not None:
+        print(f"La configuración actual falló: {referencia['error']}", file=sys.stderr)
+    print("== Configuración actual ==")
+    print(_tabla([referencia]))
+    print(f"\n== Mejores {args.top} por exactitud ==")
+    mejores = sorted((r for r in resultados if r["error"] is None), key=lambda r: (-r["exactitud"], -r["fps"]))
+    print(_tabla(mejores[:args.top]))
+    print("\n== Frente de Pareto (exactitud frente a fps) ==")
+    print(_tabla(frente_pareto(resultados)))
+    errores = [r for r in resultados if r["error"] is not None]
+    if errores:
+        print(f"\n{len(errores)} configuraciones fallaron:")
+        print(_tabla(errores))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"clips": args.clips, "resultados": resultados,
+                       "pareto": [r["config"] for r in frente_pareto(resultados)]}, f, indent=2)
+    return 0 if referencia["error"] is None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
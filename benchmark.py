@@ -0,0 +1,261 @@
+# Benchmark del pipeline sobre video sintético (no necesita cámara, corre en máquinas de CI sin pantalla).
+# Mide, para varias resoluciones:
+#   - tracker: OpticalFlowTracker.initialize (una vez) y track (por frame)
+#   - camshift: calcBackProject + CamShift sobre el frame completo
+#   - analyzer: AttentionAnalyzer.update por muestra
+#   - pipeline: AnalysisEngine.process_frame completo (con --adaptativo, decidido por el planificador
+#     adaptativo: los frames omitidos solo integran el tiempo con skip_frame)
+# y reporta fps y latencias p50/p95/p99. Además comprueba que el no_attention_breakdown
+# del pipeline coincida con el guion del video sintético (código de salida 1 si no coincide).
+# Con --rostros N compara, sobre N candidatos lado a lado en la misma imagen, el MotorMultiRostro
+# (un proceso, flujo óptico en una llamada) con N AnalysisEngine independientes.
+#
+# Uso:
+#   python benchmark.py [--resoluciones 640x480,1280x720,1920x1080] [--fps 30] [--escala 0.5] [--margen 1.0]
+#                       [--adaptativo] [--rostros 4] [--json resultados.json]
+
+import argparse
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from analysis_engine import AnalysisEngine
+from attention_analyzer import AttentionAnalyzer
+from frame_planes import FramePlanes
+from motor_multirostro import MotorMultiRostro
+from optical_flow_tracker import OpticalFlowTracker
+from planificador import PlanificadorAdaptativo
+from synthetic_video import SyntheticExam
+
+
+# Resumen de una serie de latencias (segundos): fps y percentiles en milisegundos
+def resumir(latencias):
+    lat = np.asarray(latencias, dtype=np.float64)
+    if lat.size == 0:
+        return {"n": 0, "fps": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    p50, p95, p99 = np.percentile(lat, (50, 95, 99)) * 1000.0
+    total = float(lat.sum())
+    return {"n": int(lat.size), "fps": lat.size / total if total > 0 else float("inf"),
+            "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+# Compara el desglose obtenido con el esperado. Tolerancia: 3 frames o 10% de la causa
+def comparar_desglose(obtenido, esperado, fps):
+    diferencias = {}
+    for causa, valor in esperado.items():
+        tolerancia = max(3.0 / fps, 0.1 * valor)
+        if abs(obtenido[causa] - valor) > tolerancia:
+            diferencias[causa] = (obtenido[causa], valor)
+    return diferencias
+
+
+# Ejecuta todas las mediciones sobre el video sintético de una resolución
+def medir_resolucion(width, height, fps, escala=1.0, margen=None, adaptativo=False):
+    video = SyntheticExam(width, height, fps)
+    roi = video.roi
+    perf = time.perf_counter
+
+    frames = video.frames()
+    frame, ts0, _, _ = next(frames)
+    planes = FramePlanes().set_frame(frame)
+
+    # tracker.initialize (sobre el primer frame, varias repeticiones)
+    tracker = OpticalFlowTracker()
+    lat_init = []
+    for _ in range(20):
+        t = perf()
+        tracker.initialize(planes.gray, roi)
+        lat_init.append(perf() - t)
+
+    # CamShift: histograma de la ROI como en AnalysisEngine.set_roi
+    engine_ref = AnalysisEngine()
+    engine_ref.set_roi(frame, roi)
+    roi_hist, term_crit = engine_ref.roi_hist, engine_ref.term_crit
+    ventana = engine_ref.track_window
+
+    # Pipeline completo
+    engine = AnalysisEngine(escala=escala, margen_busqueda=margen)
+    engine.set_roi(frame, roi)
+    if not engine.start(frame, now=ts0):
+        raise RuntimeError("No se detectaron puntos en la ROI sintética")
+
+    planificador = PlanificadorAdaptativo() if adaptativo else None
+    lat_track, lat_camshift, lat_pipeline = [], [], []
+    dxs, dys = [], []
+    for frame, ts, enfocada, _ in frames:
+        planes.set_frame(frame)
+        gray = planes.gray
+
+        t = perf()
+        dx, dy = tracker.track(gray)
+        lat_track.append(perf() - t)
+        dxs.append(0.0 if dx is None else dx)
+        dys.append(0.0 if dy is None else dy)
+
+        if ventana is not None:
+            t = perf()
+            backproj = cv2.calcBackProject([planes.hue], [0], roi_hist, [0, 180], 1)
+            box, ventana = cv2.CamShift(backproj, ventana, term_crit)
+            lat_camshift.append(perf() - t)
+            if box[1][0] <= 0 or box[1][1] <= 0:
+                ventana = None
+
+        t = perf()
+        if planificador is None:
+            engine.process_frame(frame, now=ts, window_focused=enfocada)
+        elif planificador.debe_analizar(frame, ts):
+            planificador.registrar(engine.process_frame(frame, now=ts, window_focused=enfocada), perf() - t)
+        else:
+            engine.skip_frame(now=ts, window_focused=enfocada)
+        lat_pipeline.append(perf() - t)
+
+    # AttentionAnalyzer.update con los desplazamientos reales, repetidos hasta tener una muestra estable
+    analyzer = AttentionAnalyzer()
+    analyzer.reset(now=0.0)
+    muestras = list(zip(dxs, dys)) * max(1, 20000 // max(1, len(dxs)))
+    lat_analyzer = []
+    ahora = 0.0
+    for dx, dy in muestras:
+        ahora += 1.0 / fps
+        t = perf()
+        analyzer.update(dx, dy, now=ahora)
+        lat_analyzer.append(perf() - t)
+
+    return {
+        "resolucion": f"{width}x{height}",
+        "frames": len(video),
+        "omitidos": planificador.fraccion_omitida if planificador else 0.0,
+        "tracker_initialize": resumir(lat_init),
+        "tracker_track": resumir(lat_track),
+        "camshift": resumir(lat_camshift),
+        "analyzer_update": resumir(lat_analyzer),
+        "pipeline": resumir(lat_pipeline),
+        "etapas_pipeline": engine.metricas.resumen(),
+        "desglose": engine.analyzer.no_attention_breakdown,
+        "desglose_esperado": video.expected_breakdown(),
+        "diferencias": comparar_desglose(engine.analyzer.no_attention_breakdown, video.expected_breakdown(), fps),
+    }
+
+
+# Varios candidatos en una sola cámara: n videos sintéticos (width x height cada uno) uno al lado del otro.
+# Mide MotorMultiRostro frente a n AnalysisEngine (lo que haría un proceso por candidato) y compara
+# el desglose de cada rostro con su guion
+def medir_multirostro(width, height, fps, n, escala=1.0, margen=1.0):
+    videos = [SyntheticExam(width, height, fps, semilla=k) for k in range(n)]
+    perf = time.perf_counter
+    compuesto = np.empty((height, width * n, 3), dtype=np.uint8)
+
+    def frame(i):
+        for k, video in enumerate(videos):
+            compuesto[:, k * width:(k + 1) * width] = video.frame(i)
+        return compuesto
+
+    primero = frame(0)
+    rois = [(v.roi[0] + k * width,) + tuple(v.roi[1:]) for k, v in enumerate(videos)]
+    motor = MotorMultiRostro(escala=escala, margen_busqueda=margen if margen is not None else 1.0)
+    for roi in rois:
+        motor.agregar_rostro(primero, roi)
+    motor.start(primero, now=0.0)
+    engines = []
+    for roi in rois:
+        engine = AnalysisEngine(escala=escala, margen_busqueda=margen)
+        engine.set_roi(primero, roi)
+        engine.start(primero, now=0.0)
+        engines.append(engine)
+
+    lat_multi, lat_engines = [], []
+    for i in range(1, len(videos[0])):
+        f = frame(i)
+        ts = i / fps
+        focos = {k + 1: v.focos[i] for k, v in enumerate(videos)}
+        t = perf()
+        motor.process_frame(f, now=ts, window_focused=focos)
+        lat_multi.append(perf() - t)
+        t = perf()
+        for k, engine in enumerate(engines):
+            engine.process_frame(f, now=ts, window_focused=videos[k].focos[i])
+        lat_engines.append(perf() - t)
+
+    diferencias = {}
+    for k, video in enumerate(videos):
+        d = comparar_desglose(motor.rostros[k + 1].analyzer.no_attention_breakdown, video.expected_breakdown(), fps)
+        if d:
+            diferencias[k + 1] = d
+    return {
+        "resolucion": f"{width * n}x{height}",
+        "rostros": n,
+        "frames": len(videos[0]),
+        "multirostro": resumir(lat_multi),
+        "motores_independientes": resumir(lat_engines),
+        "etapas_multirostro": motor.metricas.resumen(),
+        "diferencias": diferencias,
+    }
+
+
+def _parse_resoluciones(texto):
+    try:
+        return [tuple(int(v) for v in r.lower().split("x")) for r in texto.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("Formato esperado: 640x480,1280x720")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline sobre video sintético")
+    parser.add_argument("--resoluciones", type=_parse_resoluciones, default=[(640, 480), (1280, 720), (1920, 1080)])
+    parser.add_argument("--fps", type=float, default=30.0, help="fps del video sintético")
+    parser.add_argument("--escala", type=float, default=1.0, help="Escala de procesamiento del pipeline")
+    parser.add_argument("--margen", type=float, default=None, help="Margen de la ventana de búsqueda del pipeline")
+    parser.add_argument("--adaptativo", action="store_true",
+                        help="Usar el planificador adaptativo (omite el análisis de frames sin movimiento)")
+    parser.add_argument("--rostros", type=int, default=None,
+                        help="Comparar el motor multirostro con N motores independientes (N candidatos por imagen)")
+    parser.add_argument("--json", default=None, help="Guardar los resultados en este archivo JSON")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    ok = True
+    for width, height in args.resoluciones:
+        if args.rostros:
+            r = medir_multirostro(width, height, args.fps, args.rostros, args.escala, args.margen)
+            resultados.append(r)
+            print(f"\n== {r['resolucion']} ({r['rostros']} rostros, {r['frames']} frames) ==")
+            print(f"{'etapa':<24}{'fps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+            for etapa in ("multirostro", "motores_independientes"):
+                m = r[etapa]
+                print(f"{etapa:<24}{m['fps']:>10.1f}{m['p50_ms']:>10.3f}{m['p95_ms']:>10.3f}{m['p99_ms']:>10.3f}")
+            for etapa, m in r["etapas_multirostro"].items():
+                print(f"  {etapa:<22}{'':>10}{m['p50_ms']:>10.3f}{m['p95_ms']:>10.3f}{m['p99_ms']:>10.3f}")
+            for rostro, d in r["diferencias"].items():
+                ok = False
+                for causa, (obtenido, esperado) in d.items():
+                    print(f"DESGLOSE DISTINTO rostro {rostro} {causa}: {obtenido:.2f} s (esperado {esperado:.2f} s)")
+            if not r["diferencias"]:
+                print("Desglose de atención de cada rostro: coincide con el guion")
+            continue
+        r = medir_resolucion(width, height, args.fps, args.escala, args.margen, args.adaptativo)
+        resultados.append(r)
+        print(f"\n== {r['resolucion']} ({r['frames']} frames, {r['omitidos'] * 100.0:.0f}% sin analizar) ==")
+        print(f"{'etapa':<20}{'fps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for etapa in ("tracker_initialize", "tracker_track", "camshift", "analyzer_update", "pipeline"):
+            m = r[etapa]
+            print(f"{etapa:<20}{m['fps']:>10.1f}{m['p50_ms']:>10.3f}{m['p95_ms']:>10.3f}{m['p99_ms']:>10.3f}")
+        for etapa, m in r["etapas_pipeline"].items():
+            print(f"  {etapa:<18}{'':>10}{m['p50_ms']:>10.3f}{m['p95_ms']:>10.3f}{m['p99_ms']:>10.3f}")
+        if r["diferencias"]:
+            ok = False
+            for causa, (obtenido, esperado) in r["diferencias"].items():
+                print(f"DESGLOSE DISTINTO {causa}: {obtenido:.2f} s (esperado {esperado:.2f} s)")
+        else:
+            print("Desglose de atención: coincide con el guion")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+# Cliente liviano de ingesta: solo captura, codifica en JPEG y envía los frames y los eventos de foco
+# a un servidor de análisis (servidor_ingesta.py). Todo el trabajo de visión se hace en el servidor,
+# así el equipo del candidato puede ser modesto.
+# - Con cámara, la captura corre en su propio hilo sobre un ring buffer (frame_capture.CameraCapture)
+#   y se envía siempre el frame más reciente: si la red o el servidor van lentos, el envío espera
+#   (contrapresión) y los frames intermedios se descartan en el cliente, sin acumular retraso.
+# - Créditos: no hay más de --creditos frames enviados sin que el servidor confirme haberlos procesado.
+#   Sin ellos el envío solo espera cuando se llenan los buffers de TCP, que guardan segundos de video.
+# - Con un video, se envían todos los frames con sus timestamps (útil para probar en localhost).
+# - El foco de la ventana del examen se lee de self.monitor (WindowMonitor); con --ventana el cliente
+#   abre una pequeña ventana propia cuyo foco es el que se reporta.
+#
+# Uso:
+#   python cliente_ingesta.py --servidor 192.168.0.10:8765 --sesion alumno01 --roi 200,120,180,220 [--ventana]
+#   python cliente_ingesta.py --servidor 127.0.0.1:8765 --sesion prueba --fuente sesion.mp4 --roi 200,120,180,220
+#                             [--calidad 80] [--ancho 640] [--duracion 3600] [--sala A-101] [--creditos 2]
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+
+import cv2
+
+from analisis_offline import leer_frames
+from frame_capture import CameraCapture
+from metricas import Metricas
+from protocolo_ingesta import escribir_mensaje, leer_mensaje
+from window_monitor import WindowMonitor
+
+
+class ClienteIngesta:
+    def __init__(self, host, puerto, sesion_id, sala="", duracion=None, roi=None, calidad=80, ancho_max=640,
+                 creditos=2):
+        self.host = host
+        self.puerto = puerto
+        self.sesion_id = sesion_id
+        self.sala = sala
+        self.duracion = duracion # Segundos a enviar (None = hasta el final de la fuente o detener())
+        self.roi = roi # ROI (x, y, w, h) en el frame de la fuente; None = detección en el servidor
+        self.calidad = calidad # Calidad JPEG (0..100)
+        self.ancho_max = ancho_max # Los frames más anchos se reducen antes de codificar (menos ancho de banda)
+        self.creditos = creditos # Frames enviados sin confirmar como máximo (0/None = sin límite)
+        self.confirmados = 0 # Último seq confirmado por el servidor
+        self._credito = None # asyncio.Event: llegó una confirmación o la respuesta final
+        self.monitor = WindowMonitor() # Foco de la ventana del examen
+        self.metricas = Metricas() # Latencias del cliente: codificacion, envio
+        self.enviados = 0
+        self.descartados = 0 # Frames de cámara que no se enviaron por contrapresión
+        self.bytes = 0
+        self.running = False
+
+    # Termina la sesión tras el frame en curso (desde cualquier hilo)
+    def detener(self):
+        self.running = False
+
+    # Reduce (si hace falta) y codifica un frame en JPEG
+    def _codificar(self, frame, factor):
+        t = time.perf_counter()
+        if factor < 1.0:
+            h, w = frame.shape[:2]
+            frame = cv2.resize(frame, (int(round(w * factor)), int(round(h * factor))), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.calidad])
+        self.metricas.observar("codificacion", time.perf_counter() - t)
+        if not ok:
+            raise IOError("No se pudo codificar el frame en JPEG")
+        return jpeg.tobytes()
+
+    # Lee los mensajes del servidor durante la sesión: las confirmaciones actualizan self.confirmados
+    # y el primer mensaje de otro tipo (reporte o error), o None si se cerró la conexión, es la respuesta
+    async def _recibir(self, reader):
+        try:
+            while True:
+                mensaje = await leer_mensaje(reader)
+                if mensaje is None or mensaje[0].get("tipo") != "ack":
+                    return mensaje
+                self.confirmados = max(self.confirmados, int(mensaje[0].get("seq") or 0))
+                self._credito.set()
+        finally:
+            self._credito.set() # Despierta a quien espera un crédito: ya no llegarán más
+
+    # Espera hasta tener un crédito (menos de self.creditos frames sin confirmar) o una respuesta final
+    async def _esperar_credito(self, respuesta):
+        while self.creditos and self.enviados - self.confirmados >= self.creditos and not respuesta.done():
+            self._credito.clear()
+            await self._credito.wait()
+
+    # Envía la sesión completa desde 'fuente' (índice de cámara o ruta de video) y devuelve el reporte
+    # que genera el servidor. enfocada_en: función opcional ts -> bool que reemplaza a self.monitor
+    # (p. ej., para reenviar un video con el foco que tuvo la ventana)
+    async def ejecutar(self, fuente, enfocada_en=None):
+        loop = asyncio.get_running_loop()
+        camara = isinstance(fuente, int)
+        capture = lector = frames = None
+        if camara:
+            capture = CameraCapture(cv2.VideoCapture(fuente), capacidad=3)
+            if not capture.start():
+                raise IOError(f"La cámara {fuente} no entregó ningún frame")
+            lector = capture.ring.crear_lector()
+            forma = capture.ring.frames.shape[1:]
+        else:
+            frames = leer_frames(fuente)
+            primero = await loop.run_in_executor(None, next, frames)
+            forma = primero[0].shape
+        factor = min(1.0, self.ancho_max / float(forma[1])) if self.ancho_max else 1.0
+        roi = [int(round(v * factor)) for v in self.roi] if self.roi is not None else None
+
+        reader, writer = await asyncio.open_connection(self.host, self.puerto)
+        self.running = True
+        respuesta = None
+        try:
+            await escribir_mensaje(writer, {"tipo": "hola", "sesion": self.sesion_id, "sala": self.sala,
+                                            "duracion": self.duracion, "roi": roi, "escala": factor,
+                                            "reloj": time.time(), "creditos": self.creditos or None})
+            mensaje = await leer_mensaje(reader)
+            if mensaje is None or mensaje[0].get("tipo") != "listo":
+                raise ConnectionError(mensaje[0].get("mensaje") if mensaje else "El servidor cerró la conexión")
+            self.confirmados = 0
+            self._credito = asyncio.Event()
+            respuesta = loop.create_task(self._recibir(reader))
+
+            enfocada = None
+            inicio = None
+            while self.running:
+                # Con todos los créditos en uso se espera antes de tomar el frame: así, con cámara,
+                # el que se envía es el más reciente cuando el servidor ya puede recibirlo
+                await self._esperar_credito(respuesta)
+                if respuesta.done(): # El servidor respondió o cerró antes del "fin"
+                    break
+                # Siguiente frame: el más reciente de la cámara, o el siguiente del video
+                if camara:
+                    ref = await loop.run_in_executor(None, lector.siguiente, 0.5)
+                    if ref is None:
+                        if capture.ring.cerrado:
+                            break
+                        continue
+                    frame, ts, captura = ref.frame, ref.timestamp, ref.timestamp
+                else:
+                    if primero is not None:
+                        (frame, ts), primero = primero, None
+                    else:
+                        siguiente = await loop.run_in_executor(None, next, frames, None)
+                        if siguiente is None:
+                            break
+                        frame, ts = siguiente
+                    captura = time.time()
+                if inicio is None:
+                    inicio = ts
+                if self.duracion is not None and ts - inicio > self.duracion:
+                    break
+
+                # Evento de foco cuando cambia (antes del frame: el servidor lo aplica a ese frame)
+                estado = enfocada_en(ts) if enfocada_en is not None else self.monitor.focused
+                if estado != enfocada:
+                    enfocada = estado
+                    await escribir_mensaje(writer, {"tipo": "foco", "ts": ts, "enfocada": enfocada})
+
+                jpeg = await loop.run_in_executor(None, self._codificar, frame, factor)
+                t = time.perf_counter()
+                # drain(): si el servidor no da abasto, aquí se espera y la cámara sigue sobrescribiendo
+                await escribir_mensaje(writer, {"tipo": "frame", "seq": self.enviados + 1, "ts": ts,
+                                                "captura": captura, "enviado": time.time()}, jpeg)
+                self.metricas.observar("envio", time.perf_counter() - t)
+                self.enviados += 1
+                self.bytes += len(jpeg)
+                if camara:
+                    self.descartados = lector.descartados
+
+            if not respuesta.done():
+                await escribir_mensaje(writer, {"tipo": "fin", "ts": time.time()})
+            mensaje = await respuesta
+            if mensaje is None:
+                raise ConnectionError("El servidor cerró la conexión sin enviar el reporte")
+            cabecera, carga = mensaje
+            if cabecera.get("tipo") == "error":
+                raise ValueError(cabecera.get("mensaje", "Error en el servidor"))
+            return carga.decode("utf-8")
+        finally:
+            self.running = False
+            if respuesta is not None and not respuesta.done():
+                respuesta.cancel()
+            writer.close()
+            if capture is not None:
+                capture.stop()
+                capture.cap.release()
+            if frames is not None:
+                frames.close()
+
+
+# Ventana mínima del examen (Tk, en el hilo principal): su foco es el que se reporta al servidor.
+# Cerrarla termina la sesión
+def _ventana_examen(cliente, hilo):
+    import tkinter as tk
+    root = tk.Tk()
+    root.title("Examen en curso")
+    tk.Label(root, text=f"Sesión {cliente.sesion_id}\nMantén esta ventana enfocada durante el examen.",
+             font=("Helvetica", 14), padx=40, pady=40).pack()
+    root.bind("<FocusIn>", lambda e: cliente.monitor.set_focus(True))
+    root.bind("<FocusOut>", lambda e: cliente.monitor.set_focus(False))
+    root.protocol("WM_DELETE_WINDOW", cliente.detener)
+
+    def vigilar():
+        if not hilo.is_alive():
+            root.destroy()
+            return
+        root.after(200, vigilar)
+
+    vigilar()
+    root.mainloop()
+
+
+# Convierte "x,y,w,h" en una tupla de enteros
+def _parse_roi(texto):
+    partes = texto.split(",")
+    if len(partes) != 4:
+        raise argparse.ArgumentTypeError("La ROI debe tener el formato x,y,w,h")
+    return tuple(int(p) for p in partes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cliente liviano: envía la cámara a un servidor de análisis")
+    parser.add_argument("--servidor", required=True, help="host:puerto del servidor de ingesta")
+    parser.add_argument("--sesion", required=True, help="Id de la sesión (candidato)")
+    parser.add_argument("--fuente", default="0", help="Índice de cámara o ruta de un video (por defecto, cámara 0)")
+    parser.add_argument("--roi", type=_parse_roi, default=None,
+                        help="ROI del rostro x,y,w,h (sin ROI, el servidor detecta el rostro)")
+    parser.add_argument("--sala", default="")
+    parser.add_argument("--duracion", type=float, default=None, help="Segundos de examen (por defecto, sin límite)")
+    parser.add_argument("--calidad", type=int, default=80, help="Calidad JPEG")
+    parser.add_argument("--ancho", type=int, default=640, help="Ancho máximo de los frames enviados (0 = sin reducir)")
+    parser.add_argument("--ventana", action="store_true", help="Abrir una ventana de examen cuyo foco se reporta")
+    parser.add_argument("--creditos", type=int, default=2,
+                        help="Frames enviados sin confirmar como máximo (0 = solo la contrapresión de TCP)")
+    args = parser.parse_args(argv)
+
+    host, _, puerto = args.servidor.rpartition(":")
+    fuente = int(args.fuente) if args.fuente.isdigit() else args.fuente
+    cliente = ClienteIngesta(host or "127.0.0.1", int(puerto), args.sesion, args.sala, args.duracion, args.roi,
+                             args.calidad, args.ancho, args.creditos)
+    resultado = {}
+
+    def ejecutar():
+        try:
+            resultado["reporte"] = asyncio.run(cliente.ejecutar(fuente))
+        except (IOError, ValueError, ConnectionError) as e:
+            resultado["error"] = e
+
+    hilo = threading.Thread(target=ejecutar, daemon=True)
+    hilo.start()
+    try:
+        if args.ventana:
+            _ventana_examen(cliente, hilo)
+        while hilo.is_alive():
+            hilo.join(0.5)
+    except KeyboardInterrupt:
+        cliente.detener() # Ctrl+C termina la sesión y espera el reporte del servidor
+        hilo.join()
+    if "error" in resultado:
+        print("Error:", resultado["error"], file=sys.stderr)
+        return 1
+    print(resultado["reporte"])
+    print(f"{cliente.enviados} frames enviados ({cliente.bytes / 1e6:.1f} MB), "
+          f"{cliente.descartados} descartados por contrapresión", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
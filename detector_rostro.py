@@ -0,0 +1,74 @@
+# Detección automática del rostro con los clasificadores en cascada incluidos en OpenCV (cv2.data).
+# Se usa para sembrar la ROI sin intervención del operador y para re-adquirirla cuando CamShift la pierde.
+# La detección es mucho más cara que el seguimiento, así que AnalysisEngine solo la ejecuta cada
+# N frames o tras una pérdida; entre detecciones sigue trabajando CamShift + flujo óptico.
+# El frame se reduce a un ancho fijo antes de detectar, así el costo no depende de la cámara.
+
+import os
+
+import cv2
+import numpy as np
+
+
+# Cascada por defecto: rostro frontal (Haar). Cualquier otro XML de cv2.data o una ruta a un
+# clasificador propio (p. ej., una cascada LBP, más rápida) también sirve
+CASCADA_POR_DEFECTO = "haarcascade_frontalface_default.xml"
+
+
+# Ruta de una cascada: tal cual si existe, o dentro de la carpeta de cascadas de OpenCV
+def _ruta_cascada(cascada):
+    if os.path.exists(cascada):
+        return cascada
+    datos = getattr(getattr(cv2, "data", None), "haarcascades", "")
+    return os.path.join(datos, cascada)
+
+
+class DetectorRostro:
+    def __init__(self, cascada=CASCADA_POR_DEFECTO, ancho_deteccion=320, factor_escala=1.1, vecinos=5,
+                 tamano_min=0.15):
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise IOError("Esta versión de OpenCV no incluye CascadeClassifier (objdetect)")
+        ruta = _ruta_cascada(cascada)
+        self.clasificador = cv2.CascadeClassifier(ruta)
+        if self.clasificador.empty():
+            raise IOError(f"No se pudo cargar la cascada de detección: {ruta}")
+        self.ancho_deteccion = ancho_deteccion # Ancho (px) al que se reduce la imagen para detectar
+        self.factor_escala = factor_escala # Paso entre escalas de la pirámide de detección
+        self.vecinos = vecinos # Detecciones vecinas necesarias para aceptar un rostro (menos falsos positivos)
+        self.tamano_min = tamano_min # Tamaño mínimo del rostro, como fracción de la altura de la imagen
+        self._reducida = None # Buffer reutilizado para la imagen reducida y ecualizada
+
+    # Detecta el rostro más grande en una imagen en escala de grises.
+    # Devuelve (x, y, w, h) en coordenadas de 'gray' o None si no hay ningún rostro
+    def detectar(self, gray):
+        H, W = gray.shape[:2]
+        factor = min(1.0, self.ancho_deteccion / float(W))
+        if factor < 1.0:
+            size = (self.ancho_deteccion, max(1, int(round(H * factor))))
+            if self._reducida is None or self._reducida.shape != (size[1], size[0]):
+                self._reducida = np.empty((size[1], size[0]), dtype=np.uint8)
+            imagen = cv2.resize(gray, size, dst=self._reducida, interpolation=cv2.INTER_AREA)
+        else:
+            imagen = gray
+        # Ecualizar compensa la iluminación del aula; el resultado va a un buffer propio
+        imagen = cv2.equalizeHist(imagen, dst=self._reducida if factor < 1.0 else None)
+        minimo = max(20, int(imagen.shape[0] * self.tamano_min))
+        rostros = self.clasificador.detectMultiScale(imagen, scaleFactor=self.factor_escala,
+                                                     minNeighbors=self.vecinos, minSize=(minimo, minimo))
+        if len(rostros) == 0:
+            return None
+        # El candidato frente a la cámara es el rostro más grande
+        x, y, w, h = max(rostros, key=lambda r: r[2] * r[3])
+        return tuple(int(round(v / factor)) for v in (x, y, w, h))
+
+
+# Intersección sobre unión de dos cajas (x, y, w, h)
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
@@ -0,0 +1,212 @@
+# Diario de sesión: registro incremental (append-only) de un examen en un archivo JSONL por sesión.
+# Sustituye a la escritura única del reporte al final del examen: si el proceso muere, el driver
+# de la cámara se cuelga o el equipo se suspende, el reporte parcial se reconstruye desde el diario.
+# - Cada línea es un evento JSON: "inicio", "intervalo" (intervalo sin atención ya cerrado),
+#   "punto" (punto de control con el timestamp actual y el intervalo aún abierto) y "fin".
+# - Un hilo escritor consume los eventos de una cola y los escribe por lotes (flush + fsync cada
+#   'intervalo' segundos): registrar un evento nunca bloquea el bucle de frames.
+# - Cada sesión tiene su propio diario y su propio reporte (<carpeta>/<id>.jsonl y <carpeta>/<id>.txt),
+#   así un examen nuevo no sobrescribe el anterior.
+#
+# Uso (reconstruir el reporte de una sesión interrumpida):
+#   python diario_sesion.py sesiones/20261017-101500.jsonl
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+from attention_analyzer import AttentionAnalyzer
+from attention_timeline import CAUSAS
+from reporte import Reporte
+
+
+_FIN_COLA = object() # Marca para que el hilo escritor termine
+
+
+class DiarioSesion:
+    def __init__(self, carpeta="sesiones", sesion_id=None, intervalo=1.0):
+        os.makedirs(carpeta, exist_ok=True)
+        self.carpeta = carpeta
+        self.sesion_id = sesion_id or self._nuevo_id(carpeta)
+        self.ruta = os.path.join(carpeta, self.sesion_id + ".jsonl")
+        self.ruta_reporte = os.path.join(carpeta, self.sesion_id + ".txt")
+        self.intervalo = intervalo # Segundos entre fsync del diario (y entre puntos de control)
+        self._cola = queue.SimpleQueue()
+        self._enviados = 0 # Intervalos del timeline ya registrados como cerrados
+        self._ultimo_punto = 0.0 # Momento (reloj monotónico) del último punto de control
+        self._thread = threading.Thread(target=self._escritor, daemon=True)
+        self._thread.start()
+
+    # Id basado en fecha y hora; si ya existe (dos sesiones en el mismo segundo) se agrega un sufijo
+    @staticmethod
+    def _nuevo_id(carpeta):
+        base = time.strftime("%Y%m%d-%H%M%S")
+        sesion_id, n = base, 1
+        while os.path.exists(os.path.join(carpeta, sesion_id + ".jsonl")):
+            n += 1
+            sesion_id = f"{base}-{n}"
+        return sesion_id
+
+    # Encola un evento (no bloquea)
+    def registrar(self, evento, **datos):
+        datos["evento"] = evento
+        self._cola.put(datos)
+
+    def iniciar(self, inicio, duracion=None):
+        self.registrar("inicio", sesion=self.sesion_id, ts=inicio, duracion=duracion)
+
+    # Registra los intervalos cerrados desde la última llamada y, como máximo una vez por 'intervalo'
+    # segundos, un punto de control con el intervalo abierto. Llamar con el analizador protegido
+    # (el costo es O(intervalos nuevos): solo copia unos pocos números a la cola)
+    def sincronizar(self, analyzer, forzar=False):
+        timeline = analyzer.timeline
+        n = timeline.n
+        for i in range(self._enviados, n - 1): # El último intervalo aún puede extenderse
+            self.registrar("intervalo", inicio=float(timeline.inicios[i]), fin=float(timeline.fines[i]),
+                           causa=CAUSAS[timeline.causas[i]])
+        self._enviados = max(self._enviados, n - 1)
+        ahora = time.monotonic()
+        if forzar or ahora - self._ultimo_punto >= self.intervalo:
+            self._ultimo_punto = ahora
+            abierto = None
+            if n:
+                abierto = [float(timeline.inicios[n - 1]), float(timeline.fines[n - 1]),
+                           CAUSAS[timeline.causas[n - 1]]]
+            self.registrar("punto", ts=analyzer.last_movement_time, abierto=abierto)
+
+    # Cierra el diario con el reporte final y lo guarda en <carpeta>/<id>.txt. Devuelve la ruta del reporte
+    def finalizar(self, analyzer, elapsed, reporte):
+        self.sincronizar(analyzer, forzar=True)
+        self.registrar("fin", ts=analyzer.last_movement_time, elapsed=elapsed)
+        self.cerrar()
+        _escribir_reporte(self.ruta_reporte, reporte)
+        return self.ruta_reporte
+
+    # Vacía la cola y detiene el hilo escritor
+    def cerrar(self, timeout=5.0):
+        if self._thread is not None:
+            self._cola.put(_FIN_COLA)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # Hilo escritor: agrupa los eventos disponibles en un lote, los escribe y sincroniza a disco
+    # como máximo una vez por 'intervalo' segundos
+    def _escritor(self):
+        ultimo_fsync = time.monotonic()
+        pendiente = False # Hay eventos escritos que aún no se sincronizaron a disco
+        with open(self.ruta, "a", encoding="utf-8") as f:
+            terminar = False
+            while not terminar:
+                try:
+                    lote = [self._cola.get(timeout=self.intervalo)]
+                except queue.Empty:
+                    lote = []
+                while True:
+                    try:
+                        lote.append(self._cola.get_nowait())
+                    except queue.Empty:
+                        break
+                if lote and lote[-1] is _FIN_COLA:
+                    lote.pop()
+                    terminar = True
+                if lote:
+                    f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in lote))
+                    pendiente = True
+                if pendiente and (terminar or time.monotonic() - ultimo_fsync >= self.intervalo):
+                    f.flush()
+                    os.fsync(f.fileno())
+                    ultimo_fsync = time.monotonic()
+                    pendiente = False
+
+
+def _escribir_reporte(ruta, reporte):
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(reporte)
+    os.replace(temporal, ruta)
+
+
+# Lee un diario y reconstruye el analizador hasta el último punto registrado.
+# Tolera una última línea truncada (el proceso murió a mitad de una escritura).
+# Devuelve (elapsed, analyzer, completo) con completo=True si el diario tiene evento "fin"
+def reconstruir(ruta):
+    analyzer = AttentionAnalyzer()
+    inicio = ultimo_ts = None
+    abierto = None
+    completo = False
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            try:
+                e = json.loads(linea)
+            except ValueError:
+                break # Línea truncada: todo lo anterior es válido
+            tipo = e.get("evento")
+            if tipo == "inicio":
+                inicio = ultimo_ts = e["ts"]
+                analyzer.reset(now=inicio)
+            elif tipo == "intervalo":
+                analyzer.timeline.registrar(e["inicio"], e["fin"], e["causa"])
+                ultimo_ts = max(ultimo_ts, e["fin"])
+            elif tipo == "punto":
+                ultimo_ts, abierto = max(ultimo_ts, e["ts"]), e["abierto"]
+            elif tipo == "fin":
+                ultimo_ts = max(ultimo_ts, e["ts"])
+                completo = True
+    if inicio is None:
+        raise ValueError(f"El diario no tiene evento de inicio: {ruta}")
+    # El intervalo abierto del último punto de control solo cuenta si no se registró después como cerrado
+    timeline = analyzer.timeline
+    if abierto is not None and (timeline.n == 0 or abierto[0] > timeline.inicios[timeline.n - 1]):
+        timeline.registrar(*abierto)
+        ultimo_ts = max(ultimo_ts, abierto[1])
+    analyzer.last_movement_time = ultimo_ts
+    return ultimo_ts - inicio, analyzer, completo
+
+
+# Genera el reporte parcial de cada diario sin evento "fin" que aún no tenga reporte.
+# Devuelve la lista de rutas de reporte generadas
+def recuperar_pendientes(carpeta="sesiones"):
+    if not os.path.isdir(carpeta):
+        return []
+    generados = []
+    for nombre in sorted(os.listdir(carpeta)):
+        if not nombre.endswith(".jsonl"):
+            continue
+        ruta = os.path.join(carpeta, nombre)
+        ruta_reporte = ruta[:-len(".jsonl")] + ".txt"
+        if os.path.exists(ruta_reporte):
+            continue
+        try:
+            elapsed, analyzer, completo = reconstruir(ruta)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No se pudo reconstruir {ruta}: {e}")
+            continue
+        reporte = Reporte.construir_reporte(elapsed, analyzer)
+        if not completo:
+            reporte = "(Reporte parcial reconstruido: la sesión terminó de forma inesperada)\n\n" + reporte
+        _escribir_reporte(ruta_reporte, reporte)
+        generados.append(ruta_reporte)
+    return generados
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("Uso: python diario_sesion.py sesiones/<id>.jsonl", file=sys.stderr)
+        return 2
+    try:
+        elapsed, analyzer, completo = reconstruir(argv[0])
+    except (OSError, ValueError, KeyError) as e:
+        print("Error:", e, file=sys.stderr)
+        return 1
+    if not completo:
+        print("(Reporte parcial reconstruido: la sesión terminó de forma inesperada)\n")
+    print(Reporte.construir_reporte(elapsed, analyzer))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+# Captura de frames sobre un buffer circular (ring buffer) preasignado.
+# Reemplaza al hilo que sobrescribía self.frame_bgr con time.sleep(0.01) sin sincronización:
+# - La cámara decodifica directamente dentro de una ranura del buffer (sin asignar arrays por frame).
+# - Cada frame lleva número de secuencia y timestamp de captura.
+# - Los consumidores reciben una vista de la ranura (sin copia); mientras la sostienen, el productor no la reutiliza.
+# - Se contabilizan frames descartados (nunca vistos por un consumidor) y duplicados (entregados dos veces).
+
+import threading
+import time
+
+import numpy as np
+
+from reloj import RELOJ
+
+
+# Referencia a un frame dentro del ring buffer: vista sin copia + metadatos de captura
+class FrameRef:
+    __slots__ = ("frame", "seq", "timestamp")
+
+    def __init__(self, frame, seq, timestamp):
+        self.frame = frame # Vista (sin copia) de la ranura del buffer
+        self.seq = seq # Número de secuencia de captura (1, 2, 3, ...)
+        self.timestamp = timestamp # Momento de captura (reloj del buffer, en segundos)
+
+
+# Buffer circular de frames con capacidad fija, preasignado en un solo bloque de memoria
+class FrameRingBuffer:
+    def __init__(self, shape, capacidad=4, dtype=np.uint8, reloj=None):
+        self.reloj = reloj or RELOJ # Reloj de los timestamps de captura
+        self.frames = np.empty((capacidad,) + tuple(shape), dtype=dtype) # Ranuras de imagen
+        self.seqs = np.zeros(capacidad, dtype=np.int64) # Secuencia del frame en cada ranura (0 = vacía)
+        self.timestamps = np.zeros(capacidad, dtype=np.float64) # Timestamp de captura de cada ranura
+        self.capacidad = capacidad
+        self._cond = threading.Condition() # Protege el estado compartido y despierta a los lectores
+        self._ultimo = -1 # Ranura con el último frame publicado
+        self._seq = 0 # Último número de secuencia publicado
+        self._escribiendo = -1 # Ranura que está llenando el productor
+        self._sostenidas = np.zeros(capacidad, dtype=np.int64) # Lectores que sostienen cada ranura
+        self._lectores = []
+        self.cerrado = False
+
+    # Crea un lector independiente con sus propios contadores de descartados/duplicados.
+    # Cada lector sostiene como máximo una ranura, así que se necesitan lectores + 2 ranuras
+    def crear_lector(self):
+        with self._cond:
+            if len(self._lectores) + 1 + 2 > self.capacidad:
+                raise ValueError("Capacidad insuficiente: se requieren al menos lectores + 2 ranuras")
+            lector = RingReader(self)
+            self._lectores.append(lector)
+            return lector
+
+    # Devuelve (indice, vista) de una ranura libre para que el productor escriba el siguiente frame
+    def reservar(self):
+        with self._cond:
+            for i in range(1, self.capacidad + 1):
+                idx = (self._ultimo + i) % self.capacidad
+                if idx != self._ultimo and self._sostenidas[idx] == 0:
+                    self._escribiendo = idx
+                    return idx, self.frames[idx]
+        raise RuntimeError("No hay ranuras libres en el ring buffer")
+
+    # Publica el frame escrito en la ranura reservada y despierta a los lectores en espera
+    def publicar(self, idx, timestamp=None):
+        with self._cond:
+            self._seq += 1
+            self.seqs[idx] = self._seq
+            self.timestamps[idx] = self.reloj.ahora() if timestamp is None else timestamp
+            self._ultimo = idx
+            self._escribiendo = -1
+            self._cond.notify_all()
+        return self._seq
+
+    # Marca el buffer como cerrado (fin de captura) y libera a los lectores en espera
+    def cerrar(self):
+        with self._cond:
+            self.cerrado = True
+            self._cond.notify_all()
+
+    # Último número de secuencia publicado
+    @property
+    def seq(self):
+        return self._seq
+
+
+# Lector del ring buffer. Sostiene la ranura del último frame entregado hasta la siguiente lectura
+class RingReader:
+    def __init__(self, ring):
+        self.ring = ring
+        self.ultimo_seq = 0 # Secuencia del último frame entregado a este lector
+        self._sostenida = -1 # Ranura que este lector está usando
+        self.entregados = 0 # Frames distintos entregados
+        self.descartados = 0 # Frames publicados que este lector nunca vio
+        self.duplicados = 0 # Veces que se entregó de nuevo un frame ya visto
+
+    # Cambia la ranura sostenida (se llama con el lock del ring tomado)
+    def _sostener(self, idx):
+        sostenidas = self.ring._sostenidas
+        if self._sostenida >= 0:
+            sostenidas[self._sostenida] -= 1
+        self._sostenida = idx
+        if idx >= 0:
+            sostenidas[idx] += 1
+
+    # Construye la referencia al frame de la ranura 'idx' actualizando contadores
+    def _entregar(self, idx):
+        ring = self.ring
+        seq = int(ring.seqs[idx])
+        if seq == self.ultimo_seq:
+            self.duplicados += 1
+        else:
+            self.descartados += max(0, seq - self.ultimo_seq - 1)
+            self.entregados += 1
+            self.ultimo_seq = seq
+        self._sostener(idx)
+        return FrameRef(ring.frames[idx], seq, float(ring.timestamps[idx]))
+
+    # Espera un frame más nuevo que el último entregado y lo devuelve.
+    # timeout=0 no bloquea; devuelve None si no hay frame nuevo (o si el buffer se cerró)
+    def siguiente(self, timeout=None):
+        ring = self.ring
+        with ring._cond:
+            if ring._seq <= self.ultimo_seq and not ring.cerrado and timeout != 0:
+                ring._cond.wait_for(lambda: ring._seq > self.ultimo_seq or ring.cerrado, timeout)
+            if ring._seq <= self.ultimo_seq:
+                return None
+            return self._entregar(ring._ultimo)
+
+    # Devuelve siempre el último frame disponible (aunque ya se haya entregado: cuenta como duplicado)
+    def ultimo(self):
+        ring = self.ring
+        with ring._cond:
+            if ring._ultimo < 0:
+                return None
+            return self._entregar(ring._ultimo)
+
+    # Libera la ranura sostenida (el productor puede reutilizarla)
+    def liberar(self):
+        with self.ring._cond:
+            self._sostener(-1)
+
+    # Contadores del lector
+    def estadisticas(self):
+        return {"entregados": self.entregados, "descartados": self.descartados, "duplicados": self.duplicados}
+
+
+# Hilo de captura: lee de un cv2.VideoCapture directamente dentro de las ranuras del ring buffer.
+# crear_ring: función opcional (shape, capacidad, dtype, reloj) -> ring que reemplaza a FrameRingBuffer
+# (p. ej. pipeline_procesos.AnilloCompartido, en memoria compartida entre procesos)
+class CameraCapture:
+    def __init__(self, cap, capacidad=4, metricas=None, reloj=None, crear_ring=None):
+        self.cap = cap
+        self.reloj = reloj or RELOJ # Reloj de los timestamps de captura (el mismo que usa el análisis)
+        self.capacidad = capacidad
+        self.metricas = metricas # Metricas opcional: registra la latencia de cada lectura como "captura"
+        self.crear_ring = crear_ring or FrameRingBuffer
+        self.ring = None # Se crea con la forma del primer frame
+        self.running = False
+        self.errores_lectura = 0 # Lecturas fallidas de la cámara
+        self._thread = None
+
+    # Lee el primer frame para dimensionar el buffer e inicia el hilo de captura.
+    # Devuelve False si la cámara no entrega frames
+    def start(self):
+        ok, frame = self.cap.read()
+        if not ok:
+            return False
+        self.ring = self.crear_ring(frame.shape, self.capacidad, frame.dtype, self.reloj)
+        idx, ranura = self.ring.reservar()
+        ranura[...] = frame
+        self.ring.publicar(idx)
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return True
+
+    # Bucle de captura: sin pausas fijas, el ritmo lo marca cap.read()
+    def _loop(self):
+        ring = self.ring
+        metricas = self.metricas
+        while self.running:
+            idx, ranura = ring.reservar()
+            t = time.perf_counter()
+            ok, frame = self.cap.read(ranura) # Decodificar directamente en la ranura
+            if metricas is not None:
+                metricas.observar("captura", time.perf_counter() - t)
+            if not ok:
+                self.errores_lectura += 1
+                time.sleep(0.005) # Evita girar en vacío si la cámara no responde
+                continue
+            ts = self.reloj.ahora()
+            if frame.shape != ranura.shape:
+                # El dispositivo cambió de resolución: no cabe en el buffer preasignado
+                self.errores_lectura += 1
+                continue
+            if not np.shares_memory(frame, ranura):
+                ranura[...] = frame # El backend asignó su propio array: copiar a la ranura
+            ring.publicar(idx, ts)
+        ring.cerrar()
+
+    # Detiene el hilo de captura y espera a que termine la lectura en curso
+    def stop(self, timeout=1.0):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
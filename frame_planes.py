@@ -0,0 +1,112 @@
+# Caché por frame de las imágenes derivadas (gris, HSV, canal H, RGB y versiones reducidas).
+# Cada plano se calcula de forma perezosa la primera vez que se pide y se reutiliza durante el
+# resto del frame. Los arrays de salida se reutilizan entre frames (cv2 escribe en dst),
+# así que no se asigna memoria nueva por frame mientras no cambie la resolución.
+#
+# Importante: los planos devueltos son válidos solo hasta el siguiente set_frame();
+# quien necesite conservarlos entre frames debe copiarlos.
+
+import cv2
+import numpy as np
+
+
+# Conversiones de color soportadas: nombre -> (código cv2, número de canales)
+_CONVERSIONES = {
+    "gray": (cv2.COLOR_BGR2GRAY, 1),
+    "hsv": (cv2.COLOR_BGR2HSV, 3),
+    "rgb": (cv2.COLOR_BGR2RGB, 3),
+}
+
+
+class FramePlanes:
+    # interpolacion_reduccion: interpolación al reducir. INTER_AREA evita aliasing (análisis);
+    # para pantalla INTER_LINEAR es varias veces más barata y visualmente suficiente
+    def __init__(self, interpolacion_reduccion=cv2.INTER_AREA):
+        self.bgr = None # Frame BGR actual (no se copia)
+        self.interpolacion_reduccion = interpolacion_reduccion
+        self._buffers = {} # Nombre -> array de salida reutilizado entre frames
+        self._listos = {} # Planos ya calculados para el frame actual
+
+    # Registra un nuevo frame e invalida los planos calculados del anterior
+    def set_frame(self, frame_bgr):
+        self.bgr = frame_bgr
+        self._listos.clear()
+        return self
+
+    # Devuelve un buffer reutilizable con la forma pedida (lo reasigna solo si cambió la forma)
+    def _buffer(self, clave, shape, dtype=np.uint8):
+        buf = self._buffers.get(clave)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[clave] = buf
+        return buf
+
+    # Calcula (una vez por frame) la conversión de color 'nombre' del frame BGR.
+    # Con size=(ancho, alto) se convierte el BGR ya reducido: reducir primero y convertir después
+    # cuesta proporcional a la resolución de procesamiento, no a la de la cámara
+    def _convertir(self, nombre, size=None):
+        clave = nombre if size is None else (nombre, size)
+        plano = self._listos.get(clave)
+        if plano is None:
+            codigo, canales = _CONVERSIONES[nombre]
+            fuente = self.bgr if size is None else self.resized("bgr", size)
+            h, w = fuente.shape[:2]
+            shape = (h, w) if canales == 1 else (h, w, canales)
+            plano = cv2.cvtColor(fuente, codigo, dst=self._buffer(clave, shape))
+            self._listos[clave] = plano
+        return plano
+
+    # Canal H (matiz) del HSV, contiguo en memoria, a resolución completa o reducida
+    def _hue(self, size=None):
+        clave = "hue" if size is None else ("hue", size)
+        plano = self._listos.get(clave)
+        if plano is None:
+            hsv = self._convertir("hsv", size)
+            plano = cv2.extractChannel(hsv, 0, dst=self._buffer(clave, hsv.shape[:2]))
+            self._listos[clave] = plano
+        return plano
+
+    # Escala de grises (flujo óptico, detección de puntos)
+    @property
+    def gray(self):
+        return self._convertir("gray")
+
+    # HSV completo (histograma de la ROI)
+    @property
+    def hsv(self):
+        return self._convertir("hsv")
+
+    # Canal H (matiz) del HSV (proyección inversa de CamShift)
+    @property
+    def hue(self):
+        return self._hue()
+
+    # RGB (pantalla)
+    @property
+    def rgb(self):
+        return self._convertir("rgb")
+
+    # Versión reducida de un plano ("gray", "hue", "rgb", "hsv" o "bgr") al tamaño (ancho, alto)
+    def resized(self, nombre, size):
+        size = (int(size[0]), int(size[1]))
+        if nombre == "hue":
+            return self._hue(size)
+        if nombre != "bgr":
+            return self._convertir(nombre, size)
+        clave = ("bgr", size)
+        plano = self._listos.get(clave)
+        if plano is None:
+            w, h = size
+            # Para ampliar basta INTER_LINEAR
+            interp = self.interpolacion_reduccion if w < self.bgr.shape[1] else cv2.INTER_LINEAR
+            plano = cv2.resize(self.bgr, size, dst=self._buffer(clave, (h, w) + self.bgr.shape[2:]),
+                               interpolation=interp)
+            self._listos[clave] = plano
+        return plano
+
+    # Versión reducida por un factor de escala (0 < escala <= 1)
+    def scaled(self, nombre, escala):
+        if escala >= 1.0:
+            return self.bgr if nombre == "bgr" else getattr(self, nombre)
+        h, w = self.bgr.shape[:2]
+        return self.resized(nombre, (max(1, int(round(w * escala))), max(1, int(round(h * escala)))))
@@ -0,0 +1,118 @@
+# Etapa de procesamiento en un hilo dedicado, fuera del event loop de Tk.
+# Consume frames del ring buffer, ejecuta el AnalysisEngine (CamShift, flujo óptico, análisis)
+# y publica solo el último resultado (ROI, dx/dy, estado y primitivas de overlay).
+# La UI se limita a componer y mostrar el último resultado, así el fps de análisis
+# y el fps de pantalla quedan desacoplados y se miden por separado.
+# Con un planificador (planificador.PlanificadorAdaptativo) los frames sin movimiento o que no
+# caben en el presupuesto de CPU no se analizan: solo se integra su tiempo (AnalysisEngine.skip_frame).
+
+import threading
+import time
+
+
+# Medidor de fps por ventana deslizante de tiempo (barato: un contador y un timestamp)
+class FpsMeter:
+    def __init__(self, ventana=1.0):
+        self.ventana = ventana # Segundos entre recálculos
+        self.fps = 0.0
+        self._cuenta = 0
+        self._inicio = None
+
+    # Registra un evento (frame procesado o mostrado)
+    def tick(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if self._inicio is None:
+            self._inicio = now
+        self._cuenta += 1
+        transcurrido = now - self._inicio
+        if transcurrido >= self.ventana:
+            self.fps = self._cuenta / transcurrido
+            self._cuenta = 0
+            self._inicio = now
+
+
+# Colores de overlay (RGB), los mismos que usaba show_frame
+COLOR_FRENTE = (0, 255, 0)
+COLOR_ALERTA = (255, 165, 0)
+COLOR_ROI = (0, 191, 255)
+COLOR_ELIPSE = (0, 255, 0)
+
+
+# Traduce un FrameResult a primitivas de dibujo en coordenadas del frame completo:
+# ("ellipse", track_box, color), ("rect", (x, y, w, h), color), ("text", texto, color)
+def overlay_primitives(result):
+    primitivas = []
+    if result.track_box is not None:
+        primitivas.append(("ellipse", result.track_box, COLOR_ELIPSE))
+    color = COLOR_FRENTE if result.texto == "Mirando de frente" else COLOR_ALERTA
+    primitivas.append(("text", result.texto, color))
+    if result.roi:
+        primitivas.append(("rect", result.roi, COLOR_ROI))
+    return primitivas
+
+
+# Hilo que ejecuta el análisis sobre cada frame nuevo del ring buffer.
+# al_publicar: función opcional (seq, timestamp, FrameResult, primitivas, latencia) que se llama con cada
+# resultado publicado (p. ej. para enviarlo a otro proceso)
+class FrameProcessor:
+    def __init__(self, engine, reader, monitor, lock=None, planificador=None, al_publicar=None):
+        self.engine = engine # AnalysisEngine compartido con la UI (protegido por self.lock)
+        self.reader = reader # Lector propio del ring buffer
+        self.monitor = monitor # WindowMonitor con el estado de foco de la ventana
+        self.lock = lock or threading.Lock() # La UI lo toma para set_roi / start / stop / reporte
+        self.planificador = planificador # Decide qué frames analizar (None = todos)
+        self.al_publicar = al_publicar
+        self.fps = FpsMeter() # fps de análisis
+        self.camshift_fallos = 0 # Número de veces que CamShift perdió el rostro
+        self.running = False
+        self._resultado = None # Último (seq, FrameResult, primitivas) publicado
+        self._thread = None
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.reader.liberar()
+
+    # Bucle: espera un frame nuevo, lo analiza y publica el resultado (reemplazando al anterior)
+    def _loop(self):
+        while self.running:
+            ref = self.reader.siguiente(timeout=0.1)
+            if ref is None:
+                if self.reader.ring.cerrado:
+                    break
+                continue
+            planificador = self.planificador
+            if planificador is not None and self.engine.exam_active \
+                    and not planificador.debe_analizar(ref.frame, ref.timestamp):
+                with self.lock:
+                    self.engine.skip_frame(now=ref.timestamp, window_focused=self.monitor.focused)
+                continue
+            t = time.perf_counter()
+            with self.lock:
+                result = self.engine.process_frame(ref.frame, now=ref.timestamp,
+                                                   window_focused=self.monitor.focused)
+            # Latencia total por frame (incluye la espera del lock si la UI lo estaba usando)
+            latencia = time.perf_counter() - t
+            self.engine.metricas.observar("procesamiento", latencia)
+            if planificador is not None:
+                planificador.registrar(result, latencia)
+            if result.tracking_perdido:
+                self.camshift_fallos += 1
+            # Desde la captura del frame hasta su resultado (incluye la espera en el ring buffer)
+            self.engine.metricas.observar("extremo_a_extremo", self.engine.reloj.ahora() - ref.timestamp)
+            # Publicar es una sola asignación de tupla: la UI siempre ve un resultado consistente
+            self._resultado = (ref.seq, result, overlay_primitives(result))
+            if self.al_publicar is not None:
+                self.al_publicar(ref.seq, ref.timestamp, result, self._resultado[2], latencia)
+            self.fps.tick()
+
+    # Último resultado publicado: (seq, FrameResult, primitivas) o None
+    def latest(self):
+        return self._resultado
@@ -0,0 +1,224 @@
+# Grabación de sesiones con timestamps de captura y reproducción determinista.
+# Una grabación es una carpeta con:
+#   grabacion.json  metadatos (modo, forma y tipo de los frames, fps)
+#   indice.bin      un registro (seq int64, ts float64) por frame grabado, en orden
+#   frames.raw      (modo "raw") frames sin comprimir uno tras otro con tamaño fijo: la reproducción
+#                   los mapea en memoria (np.memmap) y no decodifica nada
+#   video.avi       (modo "comprimido") frames codificados con cv2.VideoWriter (MJPG por defecto)
+#   eventos.jsonl   eventos con timestamp: "roi" (ROI, frame sobre el que se seleccionó y si el rostro
+#                   se detectó automáticamente),
+#                   "inicio" y "fin" del examen, y "foco" (cambios de foco de la ventana)
+#   etiquetas.jsonl (opcional, se agrega a mano) intervalos {"inicio", "fin", "causa"} con la causa real
+#                   de la falta de atención, en el mismo reloj; los usa barrido_parametros.py
+# Todos los archivos solo se agregan, así una grabación interrumpida sigue siendo reproducible
+# hasta el último frame completo.
+#
+# La reproducción (ReproductorSesion) alimenta al mismo AnalysisEngine con los frames grabados,
+# usando como reloj los timestamps de captura y el foco grabado: el resultado no depende del
+# reloj de pared ni de la velocidad del equipo.
+
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from window_monitor import WindowMonitor
+
+
+# Registro de indice.bin
+_INDICE = np.dtype([("seq", "<i8"), ("ts", "<f8")])
+
+
+class GrabadorSesion:
+    def __init__(self, carpeta, shape, dtype=np.uint8, modo="raw", fps=30.0, fourcc="MJPG"):
+        if modo not in ("raw", "comprimido"):
+            raise ValueError(f"Modo de grabación desconocido: {modo}")
+        os.makedirs(carpeta, exist_ok=True)
+        self.carpeta = carpeta
+        self.modo = modo
+        self.shape = tuple(shape)
+        self.grabados = 0 # Frames escritos
+        self._ultimo_seq = 0 # Secuencia del último frame escrito (no se escribe dos veces el mismo)
+        self._lock = threading.Lock() # Serializa escrituras del hilo de grabación y de la UI
+        self._thread = None
+        self.running = False
+        with open(os.path.join(carpeta, "grabacion.json"), "w", encoding="utf-8") as f:
+            json.dump({"modo": modo, "shape": list(self.shape), "dtype": np.dtype(dtype).str, "fps": fps}, f)
+        self._indice = open(os.path.join(carpeta, "indice.bin"), "ab")
+        self._eventos = open(os.path.join(carpeta, "eventos.jsonl"), "a", encoding="utf-8")
+        if modo == "raw":
+            self._frames = open(os.path.join(carpeta, "frames.raw"), "ab")
+            self._video = None
+        else:
+            h, w = self.shape[:2]
+            self._frames = None
+            self._video = cv2.VideoWriter(os.path.join(carpeta, "video.avi"), cv2.VideoWriter_fourcc(*fourcc),
+                                          fps, (w, h))
+            if not self._video.isOpened():
+                raise IOError(f"No se pudo crear el video con el codec {fourcc}")
+
+    # Escribe un frame con su secuencia y timestamp de captura (ignora secuencias ya escritas)
+    def escribir_frame(self, frame, seq, ts):
+        with self._lock:
+            if seq <= self._ultimo_seq:
+                return False
+            if self._video is not None:
+                self._video.write(frame)
+            else:
+                self._frames.write(np.ascontiguousarray(frame).data)
+            self._indice.write(np.array([(seq, ts)], dtype=_INDICE).tobytes())
+            self._ultimo_seq = seq
+            self.grabados += 1
+            return True
+
+    # Registra un evento con timestamp (mismo reloj que los frames)
+    def evento(self, tipo, ts, **datos):
+        datos["tipo"] = tipo
+        datos["ts"] = ts
+        with self._lock:
+            self._eventos.write(json.dumps(datos) + "\n")
+            self._eventos.flush()
+
+    # Graba en un hilo propio todos los frames que entregue 'lector' (un RingReader dedicado)
+    def start(self, lector):
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, args=(lector,), daemon=True)
+        self._thread.start()
+
+    def _loop(self, lector):
+        while self.running:
+            ref = lector.siguiente(timeout=0.1)
+            if ref is None:
+                if lector.ring.cerrado:
+                    break
+                continue
+            self.escribir_frame(ref.frame, ref.seq, ref.timestamp)
+        lector.liberar()
+
+    # Detiene el hilo y cierra los archivos
+    def stop(self, timeout=2.0):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            for f in (self._indice, self._eventos, self._frames):
+                if f is not None:
+                    f.close()
+            if self._video is not None:
+                self._video.release()
+
+
+# Fuente de reproducción de una grabación
+class ReproductorSesion:
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+        with open(os.path.join(carpeta, "grabacion.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.modo = meta["modo"]
+        self.shape = tuple(meta["shape"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.fps = meta["fps"]
+        indice = np.fromfile(os.path.join(carpeta, "indice.bin"), dtype=_INDICE)
+        self.frames = None
+        if self.modo == "raw":
+            ruta = os.path.join(carpeta, "frames.raw")
+            tam_frame = int(np.prod(self.shape)) * self.dtype.itemsize
+            n = min(len(indice), os.path.getsize(ruta) // tam_frame) # Descarta un frame final incompleto
+            if n:
+                self.frames = np.memmap(ruta, dtype=self.dtype, mode="r", shape=(n,) + self.shape)
+            indice = indice[:n]
+        self.seqs = indice["seq"]
+        self.timestamps = indice["ts"]
+        self.eventos = []
+        ruta_eventos = os.path.join(carpeta, "eventos.jsonl")
+        if os.path.exists(ruta_eventos):
+            with open(ruta_eventos, encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        self.eventos.append(json.loads(linea))
+                    except ValueError:
+                        break # Línea final truncada
+        focos = [e for e in self.eventos if e["tipo"] == "foco"]
+        self._foco_ts = np.array([e["ts"] for e in focos], dtype=np.float64)
+        self._foco_estado = [bool(e["enfocada"]) for e in focos]
+
+    def __len__(self):
+        return len(self.seqs)
+
+    # Primer evento del tipo dado (o None)
+    def evento(self, tipo):
+        for e in self.eventos:
+            if e["tipo"] == tipo:
+                return e
+        return None
+
+    # Estado de foco de la ventana en el instante ts (el del último evento de foco anterior o igual)
+    def enfocada_en(self, ts):
+        i = int(np.searchsorted(self._foco_ts, ts, side="right")) - 1
+        return self._foco_estado[i] if i >= 0 else True
+
+    # WindowMonitor con las transiciones de foco grabadas (para un analizador con foco por eventos)
+    def monitor_foco(self):
+        monitor = WindowMonitor()
+        for ts, enfocada in zip(self._foco_ts, self._foco_estado):
+            monitor.set_focus(enfocada, float(ts))
+        return monitor
+
+    # Índice del frame grabado con secuencia 'seq' (o del último anterior, si ese no se grabó)
+    def indice_de(self, seq):
+        return max(0, int(np.searchsorted(self.seqs, seq, side="right")) - 1)
+
+    # Itera (frame, ts, enfocada) desde el frame 'desde'. En modo raw los frames son vistas del memmap
+    def iterar(self, desde=0):
+        if self.modo == "raw":
+            for i in range(desde, len(self)):
+                ts = float(self.timestamps[i])
+                yield self.frames[i], ts, self.enfocada_en(ts)
+            return
+        cap = cv2.VideoCapture(os.path.join(self.carpeta, "video.avi"))
+        try:
+            i = 0
+            while i < len(self):
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                if i >= desde:
+                    ts = float(self.timestamps[i])
+                    yield frame, ts, self.enfocada_en(ts)
+                i += 1
+        finally:
+            cap.release()
+
+    # Reproduce el examen grabado sobre 'engine': selecciona la ROI sobre el mismo frame que en vivo,
+    # inicia el examen en el frame de inicio y procesa cada frame posterior hasta el evento "fin".
+    # Si el analizador no tiene monitor de foco se le asigna uno con los eventos grabados, así el foco
+    # se cuenta por sus transiciones como en vivo. Devuelve (elapsed, engine) como analisis_offline.analizar_video
+    def reproducir(self, engine):
+        ev_roi, ev_inicio, ev_fin = self.evento("roi"), self.evento("inicio"), self.evento("fin")
+        if ev_roi is None or ev_inicio is None:
+            raise ValueError(f"La grabación no contiene la selección de ROI y el inicio del examen: {self.carpeta}")
+        i_roi, i_inicio = self.indice_de(ev_roi["seq"]), self.indice_de(ev_inicio["seq"])
+        fin = ev_fin["ts"] if ev_fin is not None else float("inf")
+        inicio = ultimo = ev_inicio["ts"]
+        if engine.analyzer.monitor is None:
+            engine.analyzer.monitor = self.monitor_foco()
+        fuente = self.iterar(min(i_roi, i_inicio))
+        for i, (frame, ts, enfocada) in enumerate(fuente, start=min(i_roi, i_inicio)):
+            if i == i_roi:
+                engine.set_roi(frame, tuple(ev_roi["roi"]))
+            if i == i_inicio:
+                if not engine.start(frame, now=inicio):
+                    raise ValueError("No se pudieron detectar puntos en el ROI grabado.")
+            elif i > i_inicio:
+                if ts > fin:
+                    break
+                t = time.perf_counter()
+                engine.process_frame(frame, now=ts, window_focused=enfocada)
+                engine.metricas.observar("procesamiento", time.perf_counter() - t)
+                ultimo = ts
+        engine.stop()
+        return (fin if ev_fin is not None else ultimo) - inicio, engine
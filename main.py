@@ -1,9 +1,98 @@
+import time # Se toma el instante de inicio antes que cualquier otro import
+_INICIO = time.perf_counter()
+
+import argparse # Opciones de línea de comandos (grabación, medición de arranque)
+import sys
+import threading # Para importar los módulos pesados en segundo plano
 import tkinter as tk # Importar la biblioteca tkinter para la interfaz gráfica
-from Pantalla_UI import Pantalla_UI # Importar la clase Pantalla_UI desde el módulo Pantalla_UI
+from tkinter import ttk # Barra de progreso de la pantalla de carga
+
+from arranque import MedidorArranque # Desglose del tiempo de arranque por fases (solo biblioteca estándar)
+
+
+# Importa en segundo plano la UI (y con ella cv2, numpy y PIL), que es lo que más tarda en cargar.
+# El resultado (la clase o la excepción) queda en 'resultado'
+def _importar_ui(resultado, arranque):
+    try:
+        # Las bibliotecas pesadas se importan por separado solo para medir cuánto tarda cada una
+        import numpy
+        arranque.marcar("import_numpy")
+        import cv2
+        arranque.marcar("import_cv2")
+        import PIL.ImageTk
+        arranque.marcar("import_pil")
+        from Pantalla_UI import Pantalla_UI # Importar la clase Pantalla_UI desde el módulo Pantalla_UI
+        resultado["clase"] = Pantalla_UI
+    except Exception as e:
+        resultado["error"] = e
+    arranque.marcar("imports")
+
+
+# Pantalla de carga: se muestra de inmediato mientras terminan los imports
+def _pantalla_carga(root):
+    frame = tk.Frame(root, bg="#F0F8FF")
+    frame.pack(expand=True, fill=tk.BOTH)
+    tk.Label(frame, text="Cargando el sistema de monitoreo...", bg="#F0F8FF", fg="#1565C0",
+             font=("Helvetica", 16, "bold")).pack(pady=(300, 20))
+    barra = ttk.Progressbar(frame, mode="indeterminate", length=300)
+    barra.pack()
+    barra.start(15)
+    return frame
+
 
 # Punto de entrada principal de la aplicación
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sistema de monitoreo de atención")
+    parser.add_argument("--grabar", default=None, help="Grabar cada examen en esta carpeta para poder reproducirlo")
+    parser.add_argument("--modo-grabacion", choices=("raw", "comprimido"), default="raw",
+                        help="raw: frames sin comprimir (reproducción sin decodificar); comprimido: video MJPG")
+    parser.add_argument("--fps-pantalla", type=float, default=30.0,
+                        help="Frecuencia de refresco del video en pantalla (independiente del análisis)")
+    parser.add_argument("--roi-automatica", action="store_true",
+                        help="Detectar el rostro automáticamente y re-adquirirlo si el seguimiento se pierde")
+    parser.add_argument("--multiproceso", action="store_true",
+                        help="Captura y análisis en procesos propios, con los frames en memoria compartida")
+    parser.add_argument("--medir-arranque", action="store_true",
+                        help="Imprimir el desglose del tiempo de arranque al mostrar el primer frame y salir")
+    args = parser.parse_args()
+    arranque = MedidorArranque(_INICIO)
+
     root = tk.Tk() # Crear la ventana principal de la aplicación
-    app = Pantalla_UI(root) # Crear una instancia de Pantalla_UI, pasando la ventana principal
-    root.protocol("WM_DELETE_WINDOW", app.cierre) # Configurar el protocolo de cierre de la ventana para llamar al método cierre de Pantalla_UI
+    root.title("Sistema Avanzado de Monitoreo de Atención")
+    root.geometry("1200x800")
+    carga = _pantalla_carga(root)
+    root.update() # Mostrar la ventana antes de cargar los módulos pesados
+    arranque.marcar("ventana_visible")
+
+    resultado = {}
+    threading.Thread(target=_importar_ui, args=(resultado, arranque), daemon=True).start()
+
+    # Cuando el arranque llega al primer frame mostrado y a la recuperación de sesiones interrumpidas,
+    # imprimir el desglose y salir (--medir-arranque)
+    def esperar_primer_frame(app):
+        if (("primer_frame_mostrado" in arranque or "error_camara" in arranque)
+                and "sesiones_recuperadas" in arranque):
+            print(arranque.resumen())
+            app.cierre()
+            return
+        root.after(20, esperar_primer_frame, app)
+
+    # Construir la UI en el hilo de Tk en cuanto los imports terminen
+    def esperar_imports():
+        if "imports" not in arranque:
+            root.after(10, esperar_imports)
+            return
+        if "error" in resultado:
+            print("No se pudo cargar la aplicación:", resultado["error"], file=sys.stderr)
+            root.destroy()
+            return
+        carga.destroy()
+        app = resultado["clase"](root, args.grabar, args.modo_grabacion, arranque, args.fps_pantalla,
+                                   args.roi_automatica, multiproceso=args.multiproceso) # Crear una instancia de Pantalla_UI
+        arranque.marcar("ui_construida")
+        root.protocol("WM_DELETE_WINDOW", app.cierre) # Configurar el protocolo de cierre de la ventana para llamar al método cierre de Pantalla_UI
+        if args.medir_arranque:
+            esperar_primer_frame(app)
+
+    root.after(0, esperar_imports)
     root.mainloop() # Iniciar el bucle principal de la interfaz gráfica
@@ -0,0 +1,210 @@
+# Métricas de latencia por etapa del pipeline (captura, conversión de color, CamShift, flujo óptico,
+# análisis y pantalla), pensadas para dejarse activas en producción:
+# - Cada etapa guarda sus latencias en un histograma de tamaño fijo (cubetas geométricas),
+#   así la memoria no crece con la duración del examen y registrar una muestra es O(log cubetas).
+# - Los percentiles se estiman a partir de las cubetas (error acotado por el ancho de la cubeta, ~12%).
+# - Un hilo exportador vuelca periódicamente las métricas a un archivo JSON o de texto Prometheus
+#   (escritura atómica: se escribe a un temporal y se reemplaza).
+#
+# Uso:
+#   metricas = Metricas()
+#   with metricas.medir("camshift"):
+#       ...
+#   ExportadorMetricas(metricas, "metricas.prom").start()
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Límites superiores (segundos) de las cubetas: de 50 µs a ~5 s con razón 1.25, más una de desborde
+_LIMITES = []
+_limite = 50e-6
+while _limite < 5.0:
+    _LIMITES.append(_limite)
+    _limite *= 1.25
+_LIMITES.append(_limite)
+del _limite
+
+
+# Histograma de latencias de una etapa: conteos por cubeta, suma y máximo
+class HistogramaLatencia:
+    __slots__ = ("conteos", "n", "suma", "maximo")
+
+    def __init__(self):
+        self.conteos = [0] * (len(_LIMITES) + 1) # Última cubeta: mayores que el último límite
+        self.n = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    # Registra una latencia en segundos
+    def observar(self, segundos):
+        self.conteos[bisect.bisect_left(_LIMITES, segundos)] += 1
+        self.n += 1
+        self.suma += segundos
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    # Estima el percentil q (0..1) interpolando linealmente dentro de la cubeta que lo contiene
+    def percentil(self, q):
+        if self.n == 0:
+            return 0.0
+        objetivo = q * self.n
+        acumulado = 0
+        for i, c in enumerate(self.conteos):
+            if c and acumulado + c >= objetivo:
+                inferior = _LIMITES[i - 1] if i > 0 else 0.0
+                superior = _LIMITES[i] if i < len(_LIMITES) else self.maximo
+                fraccion = (objetivo - acumulado) / c
+                return min(self.maximo, inferior + (superior - inferior) * fraccion)
+            acumulado += c
+        return self.maximo
+
+    # Resumen en milisegundos
+    def resumen(self):
+        return {
+            "n": self.n,
+            "media_ms": self.suma / self.n * 1000.0 if self.n else 0.0,
+            "p50_ms": self.percentil(0.50) * 1000.0,
+            "p95_ms": self.percentil(0.95) * 1000.0,
+            "p99_ms": self.percentil(0.99) * 1000.0,
+            "max_ms": self.maximo * 1000.0,
+        }
+
+    def copia(self):
+        h = HistogramaLatencia()
+        h.conteos = list(self.conteos)
+        h.n, h.suma, h.maximo = self.n, self.suma, self.maximo
+        return h
+
+
+# Registro de histogramas por etapa, compartido entre hilos (captura, procesamiento y UI)
+class Metricas:
+    def __init__(self):
+        self._etapas = {} # Nombre de etapa -> HistogramaLatencia
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+
+    # Registra una latencia (segundos) para la etapa
+    def observar(self, etapa, segundos):
+        with self._lock:
+            h = self._etapas.get(etapa)
+            if h is None:
+                h = self._etapas[etapa] = HistogramaLatencia()
+            h.observar(segundos)
+
+    # Mide la duración del bloque y la registra en la etapa
+    @contextmanager
+    def medir(self, etapa):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(etapa, time.perf_counter() - t)
+
+    # Copia consistente de todos los histogramas (para exportar sin bloquear a los productores)
+    def instantanea(self):
+        with self._lock:
+            return {etapa: h.copia() for etapa, h in self._etapas.items()}
+
+    # Resumen por etapa (n, media y percentiles en ms)
+    def resumen(self):
+        return {etapa: h.resumen() for etapa, h in sorted(self.instantanea().items())}
+
+    # Suma a estas métricas una instantánea de otras (p. ej. las de otro proceso)
+    def agregar(self, instantanea):
+        with self._lock:
+            for etapa, otro in instantanea.items():
+                h = self._etapas.get(etapa)
+                if h is None:
+                    self._etapas[etapa] = otro.copia()
+                    continue
+                h.conteos = [a + b for a, b in zip(h.conteos, otro.conteos)]
+                h.n += otro.n
+                h.suma += otro.suma
+                h.maximo = max(h.maximo, otro.maximo)
+
+    # Devuelve los histogramas registrados desde la última extracción y los quita, en un solo paso
+    # (para enviar a otro proceso solo lo nuevo, que allí se suma con agregar)
+    def extraer(self):
+        with self._lock:
+            etapas, self._etapas = self._etapas, {}
+            return etapas
+
+    # Reinicia todos los histogramas (p. ej., al iniciar un examen nuevo)
+    def reiniciar(self):
+        with self._lock:
+            self._etapas.clear()
+            self.inicio = time.time()
+
+    def a_json(self):
+        return json.dumps({"inicio": self.inicio, "ahora": time.time(), "etapas": self.resumen()}, indent=2)
+
+    # Formato de texto de Prometheus (histograma con cubetas acumuladas)
+    def a_prometheus(self, nombre="monitoreo_latencia_segundos"):
+        lineas = [f"# HELP {nombre} Latencia por etapa del pipeline de monitoreo",
+                  f"# TYPE {nombre} histogram"]
+        for etapa, h in sorted(self.instantanea().items()):
+            acumulado = 0
+            for limite, c in zip(_LIMITES, h.conteos):
+                acumulado += c
+                lineas.append(f'{nombre}_bucket{{etapa="{etapa}",le="{limite:.6g}"}} {acumulado}')
+            lineas.append(f'{nombre}_bucket{{etapa="{etapa}",le="+Inf"}} {h.n}')
+            lineas.append(f'{nombre}_sum{{etapa="{etapa}"}} {h.suma:.6f}')
+            lineas.append(f'{nombre}_count{{etapa="{etapa}"}} {h.n}')
+        return "\n".join(lineas) + "\n"
+
+    # Escribe las métricas en 'ruta' (Prometheus si termina en .prom, JSON en otro caso)
+    def exportar(self, ruta):
+        contenido = self.a_prometheus() if ruta.endswith(".prom") else self.a_json()
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        os.replace(temporal, ruta) # Un lector nunca ve el archivo a medio escribir
+
+    # Tabla legible para el reporte del examen
+    def texto_resumen(self):
+        resumen = self.resumen()
+        if not resumen:
+            return "Sin métricas de rendimiento registradas.\n"
+        lineas = [f"{'Etapa':<22}{'n':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}"]
+        for etapa, r in resumen.items():
+            lineas.append(f"{etapa:<22}{r['n']:>8}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+                          f"{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}")
+        return "\n".join(lineas) + "\n"
+
+
+# Hilo que vuelca las métricas a disco cada 'intervalo' segundos (y una última vez al detenerse)
+class ExportadorMetricas:
+    def __init__(self, metricas, ruta, intervalo=10.0):
+        self.metricas = metricas
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._detener.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._detener.wait(self.intervalo):
+            self._volcar()
+        self._volcar()
+
+    def _volcar(self):
+        try:
+            self.metricas.exportar(self.ruta)
+        except OSError as e:
+            # Un disco lleno o sin permisos no debe afectar al examen
+            print("No se pudieron exportar las métricas:", e)
+
+    def stop(self, timeout=2.0):
+        self._detener.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
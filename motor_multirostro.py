@@ -0,0 +1,187 @@
+# Motor de análisis de varios candidatos frente a una sola cámara (una cámara y un proceso por sala).
+# Cada rostro tiene su propia ROI, su histograma y ventana de CamShift, su conjunto de puntos y su
+# AttentionAnalyzer. Lo que se hace una sola vez por frame, para todos los rostros:
+#   - las conversiones de color (canal H y gris a la escala de procesamiento, en un FramePlanes compartido)
+#   - el flujo óptico: una llamada a calcOpticalFlowPyrLK con los puntos de todos los rostros (MultiFlowTracker)
+# Por rostro solo queda CamShift sobre su región de búsqueda y la actualización de su analizador,
+# así que el costo crece con el número de puntos y no con el número de pasadas sobre el frame completo.
+# El estado de cada rostro es el mismo que calcula AnalysisEngine para un candidato.
+
+import time
+
+import cv2
+
+from analysis_engine import EstadoMirada, FrameResult, histograma_roi, mascara_siembra, normalizar_roi
+from attention_analyzer import AttentionAnalyzer
+from frame_planes import FramePlanes
+from metricas import Metricas
+from optical_flow_tracker import MultiFlowTracker
+from reloj import RELOJ
+
+
+# Estado de seguimiento y análisis de un candidato dentro de MotorMultiRostro
+class Rostro(EstadoMirada):
+    def __init__(self, id_rostro, roi, reloj=RELOJ):
+        self.id = id_rostro
+        self.reloj = reloj
+        self.roi = roi # ROI (x, y, w, h) en coordenadas del frame completo, o None si se perdió
+        self.roi_hist = None # Histograma de la ROI para CamShift
+        self.track_window = None # Ventana de CamShift en coordenadas de procesamiento
+        self.analyzer = AttentionAnalyzer(reloj) # Analizador de atención propio
+        self.neutral_center = (roi[0] + roi[2] / 2.0, roi[1] + roi[3] / 2.0) # Centro neutral (de frente)
+        self.front_hysteresis_ms = 250 # Tiempo de histéresis para confirmar mirada al frente
+        self._front_inside_since = None
+
+
+class MotorMultiRostro:
+    def __init__(self, escala=1.0, margen_busqueda=1.0, metricas=None, reloj=None):
+        self.reloj = reloj or RELOJ # Reloj para las llamadas sin marca de tiempo
+        self.escala = escala # Factor de reducción para CamShift y flujo óptico
+        self.margen_busqueda = margen_busqueda # Relleno de la ventana de búsqueda de CamShift (fracción de la ROI)
+        self.rostros = {} # id -> Rostro, en orden de alta
+        # Flujo óptico de todos los rostros en una sola llamada (descarta puntos que salen de cada ROI,
+        # como el de AnalysisEngine)
+        self.tracker = MultiFlowTracker(margen_poda=0.2)
+        self.planes = FramePlanes() # Conversiones del frame actual, compartidas por todos los rostros
+        self.metricas = metricas or Metricas() # Latencias por etapa (para todos los rostros juntos)
+        self.exam_active = False
+        self.frames_procesados = 0
+        # Criterio de parada de CamShift: hasta 10 iteraciones o epsilon=1
+        self.term_crit = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 1)
+
+    # Convierte una ROI del frame completo a coordenadas de procesamiento (y viceversa)
+    def _to_proc(self, roi):
+        if self.escala >= 1.0:
+            return tuple(int(v) for v in roi)
+        return tuple(int(round(v * self.escala)) for v in roi)
+
+    def _to_frame(self, roi):
+        if self.escala >= 1.0:
+            return tuple(int(v) for v in roi)
+        return tuple(int(round(v / self.escala)) for v in roi)
+
+    # Región de búsqueda de CamShift alrededor de la ventana de un rostro
+    def _search_region(self, roi, shape):
+        H, W = shape[:2]
+        x, y, w, h = roi
+        px = int(w * self.margen_busqueda) + 1
+        py = int(h * self.margen_busqueda) + 1
+        return max(0, x - px), max(0, y - py), min(W, x + w + px), min(H, y + h + py)
+
+    # Registra un rostro sobre el frame dado (igual que AnalysisEngine.set_roi) y devuelve su id.
+    # Con el examen activo el rostro se incorpora en el siguiente start()
+    def agregar_rostro(self, frame_bgr, roi, id_rostro=None):
+        if id_rostro is None:
+            id_rostro = len(self.rostros) + 1
+        rostro = Rostro(id_rostro, normalizar_roi(roi, frame_bgr.shape), self.reloj)
+        rostro.roi_hist = histograma_roi(self.planes.set_frame(frame_bgr).hsv, rostro.roi)
+        rostro.track_window = self._to_proc(rostro.roi)
+        self.rostros[id_rostro] = rostro
+        return id_rostro
+
+    # Inicia el examen de todos los rostros: reinicia sus analizadores e inicializa sus puntos.
+    # Devuelve los ids de los rostros sin puntos detectados: el flujo óptico no los sigue y su tiempo
+    # cuenta como rostro perdido (lost_roi), aunque CamShift siga encontrando su ROI
+    def start(self, frame_bgr, now=None):
+        if now is None:
+            now = self.reloj.ahora()
+        planes = self.planes.set_frame(frame_bgr)
+        gray = planes.scaled("gray", self.escala)
+        # Puntos solo sobre los rostros (ver AnalysisEngine.start)
+        sin_puntos = self.tracker.initialize(gray, {i: r.track_window for i, r in self.rostros.items()},
+                                             mascara=mascara_siembra(planes.scaled("hsv", self.escala)))
+        for rostro in self.rostros.values():
+            rostro.analyzer.reset(now)
+            rostro._front_inside_since = None
+        self.frames_procesados = 0
+        self.exam_active = True
+        return sin_puntos
+
+    def stop(self):
+        self.exam_active = False
+
+    # Procesa un frame BGR para todos los rostros. window_focused puede ser un bool común
+    # o un dict {id: bool}. Devuelve {id: FrameResult}
+    def process_frame(self, frame_bgr, now=None, window_focused=True):
+        if now is None:
+            now = self.reloj.ahora()
+        self.frames_procesados += 1
+        planes = self.planes.set_frame(frame_bgr)
+        esc = self.escala
+        metricas = self.metricas
+        perf = time.perf_counter
+        resultados = {i: FrameResult() for i in self.rostros}
+        if not self.exam_active:
+            for i, rostro in self.rostros.items():
+                resultados[i].roi = rostro.roi
+                resultados[i].texto = rostro._estado_desde_posicion(rostro.roi, frame_bgr.shape, now=now)
+            return resultados
+
+        # CONVERSIÓN DE COLOR (una vez para todos los rostros)
+        t = perf()
+        hue = planes.scaled("hue", esc)
+        gray = planes.scaled("gray", esc)
+        metricas.observar("conversion", perf() - t)
+
+        # CAMSHIFT por rostro, solo sobre su región de búsqueda
+        t = perf()
+        for i, rostro in self.rostros.items():
+            if rostro.track_window is None:
+                continue
+            x0, y0, x1, y1 = self._search_region(rostro.track_window, hue.shape)
+            backproj = cv2.calcBackProject([hue[y0:y1, x0:x1]], [0], rostro.roi_hist, [0, 180], 1)
+            try:
+                tx, ty, tw, th = rostro.track_window
+                track_box, ventana = cv2.CamShift(backproj, (tx - x0, ty - y0, tw, th), self.term_crit)
+            except Exception:
+                track_box = None
+            if track_box is None or track_box[1][0] <= 0 or track_box[1][1] <= 0:
+                # Rostro perdido: deja de seguirse (también en el flujo óptico)
+                rostro.track_window = None
+                rostro.roi = None
+                self.tracker.quitar(i)
+                resultados[i].tracking_perdido = True
+                continue
+            x, y, w_t, h_t = ventana
+            rostro.track_window = (int(x) + x0, int(y) + y0, int(w_t), int(h_t))
+            (cx, cy), (bw, bh), ang = track_box
+            resultados[i].track_box = (((cx + x0) / esc, (cy + y0) / esc), (bw / esc, bh / esc), ang)
+            rostro.roi = self._to_frame(rostro.track_window)
+            self.tracker.update_roi(i, rostro.track_window)
+        metricas.observar("camshift", perf() - t)
+
+        # FLUJO ÓPTICO: una sola llamada para los puntos de todos los rostros
+        t = perf()
+        tracks = self.tracker.track(gray, mascara=lambda: mascara_siembra(planes.scaled("hsv", esc)))
+        metricas.observar("flujo_optico", perf() - t)
+
+        # ANÁLISIS por rostro (mismas reglas que AnalysisEngine.process_frame)
+        t = perf()
+        shape = frame_bgr.shape
+        for i, rostro in self.rostros.items():
+            result = resultados[i]
+            enfocada = window_focused.get(i, True) if isinstance(window_focused, dict) else window_focused
+            track = tracks.get(i)
+            if rostro.roi is None:
+                rostro.analyzer.update(None, None, roi_present=False, window_focused=enfocada, now=now)
+                txt = rostro._estado_desde_posicion(None, shape, now=now)
+            elif track is None: # Sin puntos desde start(): no se puede medir su movimiento
+                rostro.analyzer.update(None, None, roi_present=False, window_focused=enfocada, now=now)
+                txt = rostro._estado_desde_posicion(rostro.roi, shape, now=now)
+            elif track.dx is not None:
+                dx, dy = track.dx / esc, track.dy / esc
+                result.dx, result.dy = dx, dy
+                rostro.analyzer.update(dx, dy, roi_present=True, window_focused=enfocada, now=now)
+                txt = None
+                if len(track.points) > 0 and rostro.analyzer.is_facing_forward(track.points, rostro.track_window):
+                    txt = "Mirando de frente"
+                    rostro.analyzer.last_direction = None
+                if txt is None:
+                    txt = rostro._estado_desde_posicion(rostro.roi, shape, dx, dy, now=now)
+            else:
+                rostro.analyzer.update(0, 0, roi_present=True, window_focused=enfocada, now=now)
+                txt = rostro._estado_desde_posicion(rostro.roi, shape, 0, 0, now=now)
+            result.roi = rostro.roi
+            result.texto = txt
+        metricas.observar("analisis", perf() - t)
+        return resultados
@@ -3,12 +3,49 @@
 # da seguimiento a puntos de interés en un ROI seleccionado manualmente
 # calcula los vectores promedio de movimiento y clasifica la dirección del movimiento
 
+import functools
+
 import cv2
 import numpy as np
 
+
+# Resultado compacto de track() para un frame, con arrays numpy en lugar de atributos sueltos:
+# - points: puntos que sobrevivieron al flujo óptico, (M, 2) en coordenadas globales
+# - status: máscara booleana (N,) sobre los puntos del frame previo (True = seguido con éxito)
+# - displacement: desplazamiento de cada punto superviviente, (M, 2)
+# - dx, dy: desplazamiento promedio (float) o None si no se pudo estimar movimiento
+# - replenished: True si en este frame se repusieron puntos en la ROI
+class TrackResult:
+    __slots__ = ("points", "status", "displacement", "dx", "dy", "replenished")
+
+    def __init__(self, points=None, status=None, displacement=None, dx=None, dy=None, replenished=False):
+        self.points = _SIN_PUNTOS if points is None else points
+        self.status = _SIN_ESTADO if status is None else status
+        self.displacement = _SIN_PUNTOS if displacement is None else displacement
+        self.dx = dx
+        self.dy = dy
+        self.replenished = replenished
+
+    # Permite desempaquetar como antes: dx, dy = tracker.track(frame_gray)
+    def __iter__(self):
+        yield self.dx
+        yield self.dy
+
+
+# Arrays vacíos compartidos (de solo lectura) para los resultados sin movimiento
+_SIN_PUNTOS = np.empty((0, 2), dtype=np.float32)
+_SIN_PUNTOS.flags.writeable = False
+_SIN_ESTADO = np.empty(0, dtype=bool)
+_SIN_ESTADO.flags.writeable = False
+
 # Clase que realiza el seguimiento de flujo óptico dentro de un ROI
+# margen_poda: si no es None, los puntos que terminan fuera de la ROI seguida (ampliada en esta fracción
+# de su tamaño) se descartan en cada track(). Solo tiene sentido si la ROI se actualiza con update_roi
+# (CamShift): los puntos que LK deja pegados al fondo (p. ej. en el borde del rostro durante un giro)
+# no se mueven con él, su desplazamiento nulo diluye dx/dy y, como LK no los pierde, se acumulan
+# durante el examen hasta que los giros dejan de detectarse
 class OpticalFlowTracker:
-    def __init__(self):
+    def __init__(self, margen_poda=None):
         # Parametros recomendados para la detección de caracteristicas.
         self.feature_params = dict(
             maxCorners=300, #500 # Número máximo de puntos a detectar
@@ -22,29 +59,131 @@ class OpticalFlowTracker:
             maxLevel=3, #2 # Número de niveles en la pirámide
             criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01)) #10, 0.03 # Criterios de terminación
         
+        self.min_points = 10 # Con menos puntos válidos se reponen puntos en la ROI
+        self.margen_poda = margen_poda
+        # Simetría izquierda/derecha (min/max) por debajo de la cual, tras reponer, se detectan de nuevo
+        # todos los puntos (la misma que pide AttentionAnalyzer.is_facing_forward para ver el rostro de frente)
+        self.umbral_desbalance = 0.7
+
         self.initialized = False # Indica si el tracker ha sido inicializado
-        self.prev_gray = None # Frame gris previo
+        self.prev_gray = None # Frame gris previo (uno de los dos buffers de _gray_buffers)
+        self._gray_buffers = [None, None] # Doble buffer preasignado para el frame previo (sin asignar por frame)
+        self._gray_idx = 0 # Buffer en el que se guardará el próximo frame
+        self.prev_offset = (0, 0) # Origen (x, y) de prev_gray cuando es un recorte del frame
         self.prev_points = None # Puntos detectados en el frame previo
         # ROI actual en forma (x, y, w, h)
         self.roi_box = None 
 
-    # Inicializa el tracker con el primer frame y la ROI seleccionada
-    def initialize(self, frame_gray, roi):
-        x, y, w, h = roi # Desempaqueta coordenadas y dimenciones de la ROI
-        roi_gray = frame_gray[y:y+h, x:x+w] # Extrae la región de interés del frame gris
+    # Guarda la imagen actual y sus puntos como referencia para el siguiente frame.
+    # La imagen se copia en el buffer que no está en uso (alternando entre dos), así no se asigna
+    # memoria nueva por frame y el llamador puede reutilizar su propio buffer de gris
+    def _set_prev(self, frame_gray, puntos, offset):
+        buf = self._gray_buffers[self._gray_idx]
+        if buf is None or buf.shape != frame_gray.shape:
+            buf = np.empty(frame_gray.shape, dtype=frame_gray.dtype)
+            self._gray_buffers[self._gray_idx] = buf
+        np.copyto(buf, frame_gray)
+        self._gray_idx ^= 1
+        self.prev_gray = buf
+        self.prev_points = puntos
+        self.prev_offset = tuple(offset)
+
+    # Detecta puntos dentro de la ROI (coordenadas globales) sobre una imagen cuyo origen es 'offset'.
+    # existentes: puntos globales ya seguidos; se excluye un radio minDistance alrededor de cada uno
+    # para reponer solo las zonas vacías de la ROI. mascara: opcional, uint8 del tamaño de frame_gray
+    # (0 = no buscar puntos ahí, p. ej. el fondo), o una función sin argumentos que la devuelve (así solo
+    # se calcula si hace falta detectar); si con ella no hay puntos (p. ej. una cámara en blanco y negro)
+    # y no se está reponiendo, se busca en toda la ROI. Devuelve los puntos en coordenadas globales o None
+    def _detect(self, frame_gray, roi, offset, existentes=None, max_corners=None, mascara=None):
+        ox, oy = offset
+        x, y, w, h = roi
+        # ROI relativa a la imagen recibida, recortada a sus bordes
+        x0, y0 = max(0, x - ox), max(0, y - oy)
+        x1 = min(frame_gray.shape[1], x - ox + w)
+        y1 = min(frame_gray.shape[0], y - oy + h)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        roi_gray = frame_gray[y0:y1, x0:x1] # Extrae la región de interés del frame gris
+        params = dict(self.feature_params)
+        if max_corners is not None:
+            params["maxCorners"] = max_corners
+        if callable(mascara):
+            mascara = mascara()
+        mask = None if mascara is None else mascara[y0:y1, x0:x1].copy()
+        if existentes is not None and len(existentes) > 0:
+            # Máscara de la ROI con círculos a cero alrededor de los puntos que siguen vivos
+            if mask is None:
+                mask = np.full(roi_gray.shape, 255, dtype=np.uint8)
+            radio = int(params["minDistance"])
+            locales = np.rint(existentes.reshape(-1, 2) - (x0 + ox, y0 + oy)).astype(np.int32)
+            for px, py in locales:
+                cv2.circle(mask, (int(px), int(py)), radio, 0, -1)
+        puntos = cv2.goodFeaturesToTrack(roi_gray, mask=mask, **params)
+        if puntos is None:
+            if mascara is not None and (existentes is None or len(existentes) == 0):
+                return self._detect(frame_gray, roi, offset, max_corners=max_corners)
+            return None
+        # Se suman el origen de la ROI y el de la imagen para llevarlos a coordenadas globales
+        puntos[:, 0, 0] += x0 + ox
+        puntos[:, 0, 1] += y0 + oy
+        return puntos
+
+    # Quita de 'mask' (N,) los puntos (N, 2) que quedaron fuera de la ROI ampliada en margen_poda.
+    # Devuelve cuántos puntos válidos se descartaron
+    def _podar(self, puntos, mask, roi):
+        if self.margen_poda is None or roi is None:
+            return 0
+        x, y, w, h = roi
+        mx, my = w * self.margen_poda, h * self.margen_poda
+        dentro = ((puntos[:, 0] >= x - mx) & (puntos[:, 0] <= x + w + mx)
+                  & (puntos[:, 1] >= y - my) & (puntos[:, 1] <= y + h + my))
+        podados = int(np.count_nonzero(mask & ~dentro))
+        mask &= dentro
+        return podados
+
+    # Simetría min/max entre los puntos a la izquierda y a la derecha del centro de la ROI
+    @staticmethod
+    def _simetria(puntos, roi):
+        x, _, w, _ = roi
+        xs = puntos.reshape(-1, 2)[:, 0]
+        izquierda = int(np.count_nonzero(xs < x + w / 2))
+        derecha = len(xs) - izquierda
+        return min(izquierda, derecha) / max(izquierda, derecha, 1)
 
+    # Repone los puntos de una ROI después del flujo óptico. puntos: los supervivientes (N, 1, 2) o None;
+    # podados: cuántos se descartaron por salir de la ROI. Si se podaron puntos (se reponen tantos como
+    # se podaron, así el conjunto no crece con esquinas cada vez más débiles) o quedan menos de
+    # min_points, se buscan puntos nuevos solo en las zonas vacías de la ROI. Con mascara, si el conjunto
+    # queda desbalanceado (umbral_desbalance) se detectan todos de nuevo sobre ella: si no, los puntos
+    # quedan concentrados en un lado del rostro y la simetría de is_facing_forward falla al volver al
+    # frente. Devuelve (puntos o None, True si se repusieron puntos)
+    def _reponer(self, frame_gray, roi, offset, puntos, podados=0, mascara=None):
+        n = 0 if puntos is None else len(puntos)
+        if podados == 0 and n >= self.min_points:
+            return puntos, False
+        maximo = max(podados, self.min_points - n) if podados and n else max(1, self.feature_params["maxCorners"] - n)
+        nuevos = self._detect(frame_gray, roi, offset, existentes=puntos if n else None,
+                              max_corners=maximo, mascara=mascara)
+        if nuevos is None:
+            return puntos, False
+        puntos = np.concatenate((puntos, nuevos)) if n else nuevos
+        if n and mascara is not None and self._simetria(puntos, roi) < self.umbral_desbalance:
+            todos = self._detect(frame_gray, roi, offset, mascara=mascara)
+            if todos is not None:
+                puntos = todos
+        return puntos, True
+
+    # Inicializa el tracker con el primer frame y la ROI seleccionada.
+    # offset: origen (x, y) de frame_gray si es un recorte del frame (modo ventana de búsqueda)
+    # mascara: opcional, zonas de frame_gray donde buscar puntos (ver _detect)
+    def initialize(self, frame_gray, roi, offset=(0, 0), mascara=None):
         # Detectar puntos dentro del ROI
-        puntos = cv2.goodFeaturesToTrack(roi_gray, mask=None, **self.feature_params)
+        puntos = self._detect(frame_gray, roi, offset, mascara=mascara)
         if puntos is None: # Si no se detectan puntos, no se puede inicializar
             return False
-        
-        # Ajustar coordenadas al frame completo}
-        # Se suman x e y para posicionarlos en el sistema de coordenadas del frame completo
-        puntos[:, 0, 0] += x
-        puntos[:, 0, 1] += y
 
-        self.prev_points = puntos # Guardar el estado previo para el calculo del flujo optico en el siguiente frame
-        self.prev_gray = frame_gray.copy() # Copiar el frame actual como referencia previo
+        # Guardar el estado previo (frame + puntos) para el calculo del flujo optico en el siguiente frame
+        self._set_prev(frame_gray, puntos, offset)
         self.roi_box = roi # Registrar la ROI actual
         self.initialized = True # Marcar como inicializado
         return True
@@ -55,53 +194,156 @@ class OpticalFlowTracker:
         self.roi_box = roi
     
     # Calcula el flujo óptico entre el frame previo y el frame actual para los puntos previos, 
-    # filtra los puntos válidos y calcula el desplazamiento promedio (dx, dy).
-    def track(self, frame_gray):
-        # Validación de estado: no se puede trackear si no hay inicialización o puntos previos
-        if not self.initialized or self.prev_points is None:
-            return None, None
+    # filtra los puntos válidos y calcula el desplazamiento promedio (dx, dy). Devuelve un TrackResult.
+    # offset: origen (x, y) de frame_gray si es un recorte; los recortes de frames consecutivos
+    # pueden tener orígenes distintos porque los puntos se guardan en coordenadas globales.
+    # mascara: opcional, zonas de frame_gray donde buscar puntos al reponerlos (ver _detect y _reponer)
+    def track(self, frame_gray, offset=(0, 0), mascara=None):
+        # Validación de estado: no se puede trackear si no hay inicialización
+        if not self.initialized:
+            return TrackResult()
+        # Si se perdieron todos los puntos, intentar detectarlos de nuevo en la ROI actual
+        if self.prev_points is None:
+            if self.roi_box is not None:
+                puntos = self._detect(frame_gray, self.roi_box, offset, mascara=mascara)
+                if puntos is not None:
+                    self._set_prev(frame_gray, puntos, offset)
+            return TrackResult()
         
+        # LK requiere imágenes del mismo tamaño: si el recorte cambió de tamaño, volver a detectar puntos
+        if frame_gray.shape != self.prev_gray.shape:
+            if self.roi_box is not None:
+                self.initialize(frame_gray, self.roi_box, offset, mascara)
+            return TrackResult()
+
+        # Puntos en coordenadas de cada imagen; la estimación inicial es "sin movimiento"
+        ox, oy = offset
+        pox, poy = self.prev_offset
+        prev_local = self.prev_points - np.float32((pox, poy))
+        next_guess = self.prev_points - np.float32((ox, oy))
+
         # Calcular flujo óptico:
         # next_points: posiciones estimadas de los puntos en el frame actual
         # status: indica por punto si el seguimiento fue exitoso (1) o falló (0)
+        # (los bindings de Python no aceptan pirámides precalculadas, LK las construye en cada llamada)
         next_points, status, _ = cv2.calcOpticalFlowPyrLK( 
-            self.prev_gray, frame_gray, self.prev_points, None, **self.lk_params)
+            self.prev_gray, frame_gray, prev_local, next_guess,
+            flags=cv2.OPTFLOW_USE_INITIAL_FLOW, **self.lk_params)
         
         # Si no se pudieron calcular los puntos siguientes, devolver None
         if next_points is None:
-            return None, None
+            return TrackResult()
+        next_points += np.float32((ox, oy)) # De vuelta a coordenadas globales
         
         # Filtrar puntos válidos
-        good_new = next_points[status == 1]
-        good_old = self.prev_points[status == 1]
-
-        # Si se perdieron muchos puntos → intentar reinicializar en el ROI ACTUALIZADO
-        # Umbral: menos de 10 puntos válidos pueden ser suficiente para un buen trabajo
-        if len(good_new) < 10 and self.roi_box is not None:
-            # Recortar nuevamente puntos en la ROI actual
-            x, y, w, h = self.roi_box
-            roi_gray = frame_gray[y:y + h, x:x + w]
-            puntos = cv2.goodFeaturesToTrack(roi_gray, mask=None, **self.feature_params) # Detectar puntos dentro del ROI
-            if puntos is not None:
-                # Ajustar coordenadas al frame completo
-                puntos[:, 0, 0] += x
-                puntos[:, 0, 1] += y
-                # Actualizar estado previo con los nuevos puntos y el frame 0actua
-                self.prev0_0p0o0i00vbgvbbvgnts = puntos
-                self.prev_gray = frame_gray.copy()
-                return None, None  # No devolver movimiento hasta el próximo frame
-            else:
-                # Si no se pueden detectar puntos, devolver None para marcar falta de atención
-                return None, None
+        mask = status.reshape(-1).astype(bool)
+        podados = self._podar(next_points.reshape(-1, 2), mask, self.roi_box) # Fuera de la ROI
+        good_new = next_points.reshape(-1, 2)[mask]
+        good_old = self.prev_points.reshape(-1, 2)[mask]
 
         # Calculo del movimiento promedio (vector medio entre pares de puntos good_old -> good_new)
+        # con los puntos que sobrevivieron, también en los frames en que se reponen puntos
         movimiento = good_new - good_old
-        # Promedio de desplazamientos en X y Y. Se castea a float para garantizar tipo nativo de Python.
-        dx = float(np.mean(movimiento[:, 0]))
-        dy = float(np.mean(movimiento[:, 1]))
+        result = TrackResult(good_new, mask, movimiento)
+        if len(good_new) > 0:
+            # Promedio de desplazamientos en X y Y. Se castea a float para garantizar tipo nativo de Python.
+            media = movimiento.mean(axis=0)
+            result.dx = float(media[0])
+            result.dy = float(media[1])
+        puntos = good_new.reshape(-1, 1, 2) # Vista: el estado previo comparte memoria con result.points
+
+        # Si se podaron puntos o quedan pocos → reponer en las zonas vacías de la ROI ACTUALIZADA
+        # Umbral: menos de 10 puntos válidos pueden ser suficiente para un buen trabajo
+        if self.roi_box is not None:
+            puntos, result.replenished = self._reponer(frame_gray, self.roi_box, offset, puntos, podados, mascara)
 
         # Actualizar estado previo para el próximo frame
-        self.prev_points = good_new.reshape(-1, 1, 2)
-        self.prev_gray = frame_gray.copy()
+        self._set_prev(frame_gray, puntos if len(puntos) else None, offset)
+
+        return result # Resultado del frame actual (puntos, máscara, desplazamientos y dx/dy promedio)
+
+
+# Seguimiento de varios rostros en la misma imagen con un solo flujo óptico por frame.
+# Cada rostro (id) tiene su ROI y su propio conjunto de puntos. En track() los puntos de todos los
+# rostros se concatenan y avanzan con una única llamada a calcOpticalFlowPyrLK (la pirámide del frame
+# se construye una sola vez) y después se separan por rostro. El costo crece con el número de puntos,
+# no con el de rostros. Trabaja sobre el frame completo: todos los rostros comparten la imagen previa
+class MultiFlowTracker(OpticalFlowTracker):
+    def __init__(self, margen_poda=None):
+        super().__init__(margen_poda)
+        self.rois = {} # id -> ROI (x, y, w, h)
+        self.puntos = {} # id -> puntos (N, 1, 2) del frame previo, o None si se perdieron todos
+
+    # Inicializa el tracker con el primer frame y las ROIs {id: (x, y, w, h)}.
+    # Devuelve los ids en los que no se detectó ningún punto (esos rostros no se siguen).
+    # mascara: opcional, zonas del frame donde buscar puntos (ver _detect)
+    def initialize(self, frame_gray, rois, mascara=None):
+        self.rois, self.puntos = {}, {}
+        sin_puntos = []
+        for id_rostro, roi in rois.items():
+            puntos = self._detect(frame_gray, roi, (0, 0), mascara=mascara)
+            if puntos is None:
+                sin_puntos.append(id_rostro)
+                continue
+            self.rois[id_rostro] = roi
+            self.puntos[id_rostro] = puntos
+        self._set_prev(frame_gray, None, (0, 0))
+        self.initialized = bool(self.rois)
+        return sin_puntos
+
+    # Actualiza la ROI de un rostro (la que CamShift siguió en este frame)
+    def update_roi(self, id_rostro, roi):
+        if id_rostro in self.rois:
+            self.rois[id_rostro] = roi
+
+    # Deja de seguir un rostro (p. ej., porque CamShift lo perdió)
+    def quitar(self, id_rostro):
+        self.rois.pop(id_rostro, None)
+        self.puntos.pop(id_rostro, None)
+
+    # Flujo óptico de todos los rostros entre el frame previo y frame_gray.
+    # Devuelve {id: TrackResult} con los mismos campos que OpticalFlowTracker.track.
+    # mascara: como en OpticalFlowTracker.track (se calcula una sola vez por frame aunque la usen varios rostros)
+    def track(self, frame_gray, mascara=None):
+        resultados = {}
+        if not self.initialized:
+            return resultados
+        podados = {} # id -> puntos descartados por quedar fuera de su ROI
+        ids = [i for i, p in self.puntos.items() if p is not None]
+        supervivientes = {}
+        if ids:
+            # Todos los puntos en un solo array y una sola llamada a LK
+            previos = np.concatenate([self.puntos[i] for i in ids])
+            next_points, status, _ = cv2.calcOpticalFlowPyrLK(
+                self.prev_gray, frame_gray, previos, previos.copy(),
+                flags=cv2.OPTFLOW_USE_INITIAL_FLOW, **self.lk_params)
+            if next_points is None:
+                next_points = previos
+                status = np.zeros(len(previos), dtype=np.uint8)
+            # Separar por rostro: los puntos de cada uno son un tramo contiguo del array
+            cortes = np.cumsum([len(self.puntos[i]) for i in ids])[:-1]
+            tramos = zip(ids, np.split(previos.reshape(-1, 2), cortes), np.split(next_points.reshape(-1, 2), cortes),
+                         np.split(status.reshape(-1).astype(bool), cortes))
+            for id_rostro, old, new, mask in tramos:
+                podados[id_rostro] = self._podar(new, mask, self.rois[id_rostro])
+                good_new = new[mask]
+                movimiento = good_new - old[mask]
+                result = TrackResult(good_new, mask, movimiento)
+                if len(good_new) > 0:
+                    media = movimiento.mean(axis=0)
+                    result.dx = float(media[0])
+                    result.dy = float(media[1])
+                resultados[id_rostro] = result
+                supervivientes[id_rostro] = good_new.reshape(-1, 1, 2)
+
+        # Reponer los puntos de los rostros que los perdieron (como OpticalFlowTracker.track)
+        if callable(mascara):
+            mascara = functools.cache(mascara)
+        for id_rostro, roi in self.rois.items():
+            result = resultados.setdefault(id_rostro, TrackResult())
+            puntos, result.replenished = self._reponer(frame_gray, roi, (0, 0), supervivientes.get(id_rostro),
+                                                       podados.get(id_rostro, 0), mascara)
+            self.puntos[id_rostro] = puntos if puntos is not None and len(puntos) else None
 
-        return dx, dy # Devolver el desplazamiento promedio del frame actual
+        self._set_prev(frame_gray, None, (0, 0))
+        return resultados
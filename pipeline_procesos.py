@@ -0,0 +1,708 @@
+# Modo multiproceso: captura, análisis y UI en procesos separados, para que el trabajo en Python de
+# una etapa (Tk, el reporte, el análisis) no frene a las otras por el GIL.
+# - Los frames viajan por un ring buffer en memoria compartida (AnilloCompartido): la captura decodifica
+#   directamente en una ranura y los lectores de los otros procesos reciben vistas de esa ranura, con
+#   su número de secuencia y timestamp. Los píxeles nunca se serializan ni se copian entre procesos.
+#   Es el mismo FrameRingBuffer (ranuras sostenidas por los lectores, descartados y duplicados por
+#   lector); solo cambian dónde viven sus arrays y la sincronización (multiprocessing.Condition).
+# - CapturaEnProceso reemplaza a frame_capture.CameraCapture: el proceso hijo lee la cámara (o un video)
+#   con un CameraCapture sobre el anillo que crea y al final libera el proceso de la UI. Sus latencias
+#   de lectura ("captura") se envían cada 200 ms por su Pipe y se suman a las métricas de la UI.
+# - MotorRemoto reemplaza a AnalysisEngine en la UI y ProcesadorRemoto a FrameProcessor: el proceso de
+#   análisis ejecuta un AnalysisEngine y un FrameProcessor sobre su propio lector del anillo y devuelve
+#   solo registros pequeños (el FrameResult y sus primitivas de overlay por frame y, cada 200 ms, el
+#   estado: línea de tiempo, ROI, fps, métricas). Los comandos de la UI (ROI, inicio, fin) llevan su
+#   frame en una ranura auxiliar del anillo; el foco de la ventana se reenvía como transiciones.
+# Los procesos se crean con "spawn" (seguro con Tk e hilos en el proceso padre). Cada uno recibe el reloj
+# de la UI (un RelojSistema viaja con su ancla a la época), así los timestamps de captura, el "now" del
+# análisis y las transiciones de foco se miden con el mismo reloj aunque la hora del sistema cambie
+# entre el lanzamiento de uno y otro proceso.
+#
+# Uso (medición de latencia de extremo a extremo con la UI ocupada, sin cámara):
+#   python pipeline_procesos.py [--fuente sintetico|video.avi|0] [--resolucion 640x480] [--fps 30]
+#                               [--segundos 20] [--carga-ui 0.8] [--modo ambos|hilos|procesos] [--json lat.json]
+
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import queue
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from attention_analyzer import AttentionAnalyzer
+from attention_timeline import AttentionTimeline
+from frame_capture import FrameRingBuffer, RingReader
+from metricas import Metricas
+from reloj import RELOJ
+
+_CTX = mp.get_context("spawn")
+
+# Campos de control del anillo (int64 en la memoria compartida)
+_SEQ, _ULTIMO, _ESCRIBIENDO, _CERRADO, _LECTORES, _ERRORES = range(6)
+_N_CAMPOS = 6
+
+
+def _alinear(n, a=8):
+    return (n + a - 1) // a * a
+
+
+# FrameRingBuffer cuyos arrays (ranuras, secuencias, timestamps, ranuras sostenidas y campos de control)
+# viven en un bloque de multiprocessing.shared_memory. Hay una ranura auxiliar más, fuera del anillo,
+# donde la UI deja el frame de un comando (la selección de ROI, el inicio del examen)
+class AnilloCompartido(FrameRingBuffer):
+    def __init__(self, shm, shape, capacidad, dtype, cond, reloj=None, propietario=False):
+        self.reloj = reloj or RELOJ
+        self.capacidad = capacidad
+        self._cond = cond # multiprocessing.Condition compartida por todos los procesos
+        self._lectores = [] # Lectores de este proceso (el total está en la memoria compartida)
+        self.propietario = propietario # El propietario elimina el bloque al liberarlo
+        shape, dtype = tuple(shape), np.dtype(dtype)
+        tam_frame = int(np.prod(shape)) * dtype.itemsize
+        self.frames = np.ndarray((capacidad,) + shape, dtype, buffer=shm.buf)
+        self.auxiliar = np.ndarray(shape, dtype, buffer=shm.buf, offset=capacidad * tam_frame)
+        offset = _alinear((capacidad + 1) * tam_frame)
+        self._meta = np.ndarray(_N_CAMPOS, np.int64, buffer=shm.buf, offset=offset)
+        offset += 8 * _N_CAMPOS
+        self.seqs = np.ndarray(capacidad, np.int64, buffer=shm.buf, offset=offset)
+        self._sostenidas = np.ndarray(capacidad, np.int64, buffer=shm.buf, offset=offset + 8 * capacidad)
+        self.timestamps = np.ndarray(capacidad, np.float64, buffer=shm.buf, offset=offset + 16 * capacidad)
+        self._shm = shm # Al final: al destruir el anillo, las vistas se liberan antes que el bloque
+
+    # Bytes del bloque compartido para frames de 'shape' y 'capacidad' ranuras
+    @staticmethod
+    def tamano(shape, capacidad, dtype=np.uint8):
+        tam_frame = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        return _alinear((capacidad + 1) * tam_frame) + 8 * _N_CAMPOS + 24 * capacidad
+
+    # Crea el bloque compartido y un anillo vacío (en el proceso propietario)
+    @classmethod
+    def crear(cls, shape, capacidad=4, dtype=np.uint8, cond=None, reloj=None):
+        shm = shared_memory.SharedMemory(create=True, size=cls.tamano(shape, capacidad, dtype))
+        anillo = cls(shm, shape, capacidad, dtype, cond or _CTX.Condition(), reloj, propietario=True)
+        anillo._meta[:] = 0
+        anillo._meta[_ULTIMO] = anillo._meta[_ESCRIBIENDO] = -1
+        anillo.seqs[:] = 0
+        anillo._sostenidas[:] = 0
+        return anillo
+
+    # Se conecta al anillo de otro proceso a partir de su descriptor
+    @classmethod
+    def adjuntar(cls, descriptor, cond, reloj=None):
+        shm = shared_memory.SharedMemory(name=descriptor["nombre"])
+        return cls(shm, descriptor["shape"], descriptor["capacidad"], descriptor["dtype"], cond, reloj)
+
+    # Lo necesario para adjuntar el anillo desde otro proceso (la Condition se pasa aparte, al crearlo)
+    @property
+    def descriptor(self):
+        return {"nombre": self._shm.name, "shape": self.frames.shape[1:], "dtype": self.frames.dtype.str,
+                "capacidad": self.capacidad}
+
+    # Estado del anillo en la memoria compartida (los métodos de FrameRingBuffer lo usan sin cambios)
+    @property
+    def _seq(self):
+        return int(self._meta[_SEQ])
+
+    @_seq.setter
+    def _seq(self, valor):
+        self._meta[_SEQ] = valor
+
+    @property
+    def _ultimo(self):
+        return int(self._meta[_ULTIMO])
+
+    @_ultimo.setter
+    def _ultimo(self, valor):
+        self._meta[_ULTIMO] = valor
+
+    @property
+    def _escribiendo(self):
+        return int(self._meta[_ESCRIBIENDO])
+
+    @_escribiendo.setter
+    def _escribiendo(self, valor):
+        self._meta[_ESCRIBIENDO] = valor
+
+    @property
+    def cerrado(self):
+        return bool(self._meta[_CERRADO])
+
+    @cerrado.setter
+    def cerrado(self, valor):
+        self._meta[_CERRADO] = int(valor)
+
+    # Lecturas fallidas de la cámara (las actualiza el proceso de captura)
+    @property
+    def errores_lectura(self):
+        return int(self._meta[_ERRORES])
+
+    @errores_lectura.setter
+    def errores_lectura(self, valor):
+        self._meta[_ERRORES] = valor
+
+    # Como FrameRingBuffer.crear_lector, pero contando los lectores de todos los procesos
+    def crear_lector(self):
+        with self._cond:
+            if self._meta[_LECTORES] + 1 + 2 > self.capacidad:
+                raise ValueError("Capacidad insuficiente: se requieren al menos lectores + 2 ranuras")
+            self._meta[_LECTORES] += 1
+            lector = RingReader(self)
+            self._lectores.append(lector)
+            return lector
+
+    # Libera el bloque en este proceso; el propietario además lo elimina del sistema. Si todavía hay
+    # vistas en uso (un FrameRef que la UI sigue mostrando) el mapeo se libera al destruir el anillo
+    def liberar_memoria(self):
+        if self.propietario:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self.propietario = False
+
+
+# Fuente de video a ritmo real: entrega los frames de un archivo (en bucle) o de un examen sintético
+# al fps indicado, con la interfaz de cv2.VideoCapture que usa CameraCapture
+class FuenteAlRitmo:
+    def __init__(self, fuente, fps=None, resolucion=(640, 480)):
+        self._video = None
+        self._cap = None
+        if fuente == "sintetico":
+            from synthetic_video import SyntheticExam
+            self._video = SyntheticExam(resolucion[0], resolucion[1], fps or 30.0)
+            self.fps = self._video.fps
+        else:
+            self._cap = cv2.VideoCapture(fuente)
+            self.fps = fps or self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._i = 0
+        self._proximo = None
+
+    def isOpened(self):
+        return self._video is not None or self._cap.isOpened()
+
+    def get(self, prop):
+        return self.fps if prop == cv2.CAP_PROP_FPS else 0.0
+
+    def read(self, image=None):
+        ahora = time.perf_counter()
+        if self._proximo is None:
+            self._proximo = ahora
+        elif self._proximo > ahora:
+            time.sleep(self._proximo - ahora)
+        self._proximo += 1.0 / self.fps
+        if self._video is not None:
+            frame = self._video.frame(self._i % len(self._video))
+            self._i += 1
+            if image is None:
+                return True, frame.copy()
+            image[...] = frame
+            return True, image
+        ok, frame = self._cap.read(image)
+        if not ok: # Fin del archivo: volver al principio
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._cap.read(image)
+        return ok, frame
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+
+
+# Abre una fuente: índice de cámara (int), "sintetico" o ruta de un video (estos dos, a ritmo real)
+def abrir_fuente(fuente, resolucion=(640, 480), fps=None):
+    if isinstance(fuente, int):
+        return cv2.VideoCapture(fuente)
+    return FuenteAlRitmo(fuente, fps, resolucion)
+
+
+# Proceso de captura: abre la fuente, informa la forma del primer frame, recibe el descriptor del anillo
+# que crea la UI y captura dentro de él hasta que se le pida detenerse. Cada 200 ms envía las latencias
+# de lectura registradas desde el envío anterior
+def _proceso_captura(fuente, capacidad, cond, conexion, detener, reloj, opciones_fuente):
+    from frame_capture import CameraCapture
+    cap = abrir_fuente(fuente, **opciones_fuente)
+    if not cap.isOpened():
+        conexion.send(("error", f"No se pudo abrir la cámara ({fuente})."))
+        return
+
+    def crear_ring(shape, capacidad, dtype, reloj):
+        conexion.send(("forma", tuple(shape), np.dtype(dtype).str, cap.get(cv2.CAP_PROP_FPS) or 30.0))
+        return AnilloCompartido.adjuntar(conexion.recv(), cond, reloj)
+
+    metricas = Metricas()
+    capture = CameraCapture(cap, capacidad, metricas=metricas, reloj=reloj, crear_ring=crear_ring)
+    if not capture.start():
+        conexion.send(("error", "La cámara no entregó ningún frame."))
+        cap.release()
+        return
+    conexion.send(("listo",))
+    ring = capture.ring
+
+    def enviar_metricas():
+        nuevas = metricas.extraer()
+        if nuevas:
+            conexion.send(("metricas", nuevas))
+
+    while not detener.wait(0.2):
+        ring.errores_lectura = capture.errores_lectura
+        enviar_metricas()
+    capture.stop()
+    ring.errores_lectura = capture.errores_lectura
+    enviar_metricas()
+    cap.release()
+
+
+# Reemplazo de frame_capture.CameraCapture con la captura en un proceso propio.
+# El anillo lo crea (y al final lo elimina) este proceso; ring, errores_lectura y stop() como en CameraCapture.
+# metricas: Metricas opcional donde un hilo suma las latencias de lectura que envía el proceso ("captura")
+class CapturaEnProceso:
+    def __init__(self, fuente=0, capacidad=4, reloj=None, metricas=None, **opciones_fuente):
+        self.fuente = fuente
+        self.capacidad = capacidad
+        self.reloj = reloj or RELOJ
+        self.metricas = metricas
+        self.opciones_fuente = opciones_fuente # resolucion / fps de una fuente "sintetico" o de un video
+        self.ring = None
+        self.fps = None # fps informado por la cámara
+        self.error = None # Motivo por el que start() devolvió False
+        self.running = False
+        self._proceso = None
+        self._detener = None
+        self._conexion = None
+        self._thread = None # Receptor de las métricas del proceso
+
+    # Lanza el proceso de captura y espera su primer frame. Devuelve False si la fuente no entrega frames
+    def start(self, timeout=30.0):
+        cond = _CTX.Condition()
+        self._detener = _CTX.Event()
+        conexion, hijo = _CTX.Pipe()
+        self._conexion = conexion
+        self._proceso = _CTX.Process(target=_proceso_captura, daemon=True, name="captura",
+                                     args=(self.fuente, self.capacidad, cond, hijo, self._detener,
+                                           self.reloj, self.opciones_fuente))
+        self._proceso.start()
+        hijo.close() # Solo lo usa el proceso: al terminar éste, recv() aquí termina con EOFError
+        try:
+            mensaje = conexion.recv() if conexion.poll(timeout) else ("error", "La cámara no respondió.")
+            if mensaje[0] == "forma":
+                _, shape, dtype, self.fps = mensaje
+                self.ring = AnilloCompartido.crear(shape, self.capacidad, dtype, cond, self.reloj)
+                conexion.send(self.ring.descriptor)
+                mensaje = conexion.recv() if conexion.poll(timeout) else ("error", "La cámara no respondió.")
+        except EOFError:
+            mensaje = ("error", "El proceso de captura terminó inesperadamente.")
+        if mensaje[0] != "listo":
+            self.error = mensaje[1]
+            self.stop()
+            return False
+        self.running = True
+        self._thread = threading.Thread(target=self._recibir_metricas, daemon=True)
+        self._thread.start()
+        return True
+
+    # Hilo receptor: suma a self.metricas las latencias que envía el proceso, hasta que éste termina
+    def _recibir_metricas(self):
+        while True:
+            try:
+                mensaje = self._conexion.recv()
+            except (EOFError, OSError):
+                return
+            if mensaje[0] == "metricas" and self.metricas is not None:
+                self.metricas.agregar(mensaje[1])
+
+    @property
+    def errores_lectura(self):
+        return self.ring.errores_lectura if self.ring is not None else 0
+
+    # Detiene el proceso de captura y elimina el bloque compartido (los lectores ven el anillo cerrado)
+    def stop(self, timeout=2.0):
+        self.running = False
+        if self._proceso is not None:
+            self._detener.set()
+            self._proceso.join(timeout)
+            if self._proceso.is_alive():
+                self._proceso.terminate()
+            self._proceso = None
+        if self._thread is not None: # Recibe el último envío del proceso y termina con su EOF
+            self._thread.join(timeout)
+            self._thread = None
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+        if self.ring is not None:
+            self.ring.cerrar()
+            self.ring.liberar_memoria()
+
+
+# Estado del motor que el proceso de análisis envía a la UI (arrays pequeños, nunca frames)
+def _estado(engine, processor):
+    analyzer = engine.analyzer
+    inicios, fines, causas = analyzer.timeline.intervalos()
+    planificador = processor.planificador
+    return {
+        "roi": engine.roi, "exam_active": engine.exam_active, "readquisiciones": engine.readquisiciones,
+        "start_time": analyzer.start_time, "last_movement_time": analyzer.last_movement_time,
+        "intervalos": (inicios.copy(), fines.copy(), causas.copy()),
+        "fps": processor.fps.fps, "camshift_fallos": processor.camshift_fallos,
+        "omitidos": planificador.fraccion_omitida if planificador is not None else 0.0,
+        "metricas": engine.metricas.instantanea(),
+    }
+
+
+# Proceso de análisis: AnalysisEngine + FrameProcessor sobre un lector del anillo. Atiende los comandos
+# de la UI y le envía cada resultado y, cada 200 ms, el estado
+def _proceso_analisis(descriptor, cond, comandos, salida, opciones):
+    from analysis_engine import AnalysisEngine
+    from frame_processor import FrameProcessor
+    from planificador import PlanificadorAdaptativo
+    from window_monitor import WindowMonitor
+
+    reloj = opciones["reloj"] # El de la UI: mismos timestamps que la captura y las transiciones de foco
+    ring = AnilloCompartido.adjuntar(descriptor, cond, reloj)
+    monitor = WindowMonitor(reloj)
+    detector = None
+    if opciones["roi_automatica"]:
+        from detector_rostro import DetectorRostro
+        try:
+            detector = DetectorRostro()
+        except IOError:
+            pass
+    engine = AnalysisEngine(escala=opciones["escala"], margen_busqueda=opciones["margen_busqueda"],
+                            detector=detector, reloj=reloj, monitor=monitor)
+
+    def publicar(seq, ts, result, primitivas, latencia):
+        salida.put(("resultado", seq, result, primitivas))
+
+    processor = FrameProcessor(engine, ring.crear_lector(), monitor,
+                               planificador=PlanificadorAdaptativo() if opciones["planificador"] else None,
+                               al_publicar=publicar)
+    processor.start()
+    proximo_estado = time.monotonic()
+    try:
+        while True:
+            try:
+                comando = comandos.get(timeout=0.05)
+            except queue.Empty:
+                comando = None
+            if comando is not None:
+                tipo = comando[0]
+                if tipo == "salir":
+                    break
+                if tipo == "foco":
+                    monitor.set_focus(comando[2], comando[1])
+                    continue
+                with processor.lock:
+                    frame = ring.auxiliar.copy() # La UI puede reutilizar la ranura auxiliar tras la respuesta
+                    if tipo == "roi":
+                        respuesta = engine.set_roi(frame, comando[2])
+                    elif tipo == "adquirir":
+                        respuesta = engine.adquirir_roi(frame)
+                    elif tipo == "start":
+                        engine.metricas.reiniciar() # Las métricas del reporte cubren solo este examen
+                        respuesta = engine.start(frame, now=comando[2])
+                    else: # "stop"
+                        engine.stop()
+                        respuesta = None
+                    estado = _estado(engine, processor)
+                salida.put(("respuesta", comando[1], respuesta, estado))
+            if time.monotonic() >= proximo_estado:
+                proximo_estado = time.monotonic() + 0.2
+                with processor.lock:
+                    estado = _estado(engine, processor)
+                salida.put(("estado", estado))
+    finally:
+        processor.stop()
+
+
+# Frecuencia de análisis y fracción omitida que informa el proceso de análisis (como FpsMeter y
+# PlanificadorAdaptativo para la UI)
+class _Contadores:
+    def __init__(self):
+        self.fps = 0.0
+        self.fraccion_omitida = 0.0
+
+
+# Reemplazo de frame_processor.FrameProcessor: lanza el proceso de análisis sobre el anillo y recibe sus
+# resultados en un hilo. latest(), fps.fps, camshift_fallos y planificador.fraccion_omitida como en FrameProcessor
+class ProcesadorRemoto:
+    def __init__(self, motor, ring, planificador=True):
+        self.motor = motor
+        self.ring = ring
+        self.usar_planificador = planificador
+        self.fps = _Contadores()
+        self.planificador = self.fps # Solo se lee su fraccion_omitida
+        self.camshift_fallos = 0
+        self.running = False
+        self._resultado = None
+        self._respuestas = {} # id de comando -> [Event, respuesta, estado]
+        self._ids = itertools.count(1)
+        self._focos_enviados = 0 # Transiciones del monitor de la UI ya reenviadas
+        self._proceso = self._comandos = self._salida = self._thread = None
+
+    def start(self):
+        motor = self.motor
+        self._comandos = _CTX.Queue()
+        self._salida = _CTX.Queue()
+        opciones = {"escala": motor.escala, "margen_busqueda": motor.margen_busqueda,
+                    "roi_automatica": motor.detector is not None, "planificador": self.usar_planificador,
+                    "reloj": motor.reloj}
+        self._proceso = _CTX.Process(target=_proceso_analisis, daemon=True, name="analisis",
+                                     args=(self.ring.descriptor, self.ring._cond, self._comandos, self._salida,
+                                           opciones))
+        self._proceso.start()
+        self.running = True
+        self._thread = threading.Thread(target=self._recibir, daemon=True)
+        self._thread.start()
+
+    # Reenvía al proceso de análisis las transiciones de foco nuevas del monitor de la UI
+    def _enviar_focos(self):
+        monitor = self.motor.monitor
+        if monitor is None:
+            return
+        nuevas = monitor.transiciones(self._focos_enviados)
+        for ts, enfocada in nuevas:
+            self._comandos.put(("foco", ts, enfocada))
+        self._focos_enviados += len(nuevas)
+
+    # Hilo receptor: resultados por frame, estado periódico y respuestas a comandos
+    def _recibir(self):
+        while self.running:
+            self._enviar_focos()
+            try:
+                mensaje = self._salida.get(timeout=0.1)
+            except queue.Empty:
+                if not self._proceso.is_alive():
+                    break
+                continue
+            except (EOFError, OSError):
+                break
+            tipo = mensaje[0]
+            if tipo == "resultado":
+                _, seq, result, primitivas = mensaje
+                self._resultado = (seq, result, primitivas)
+                continue
+            estado = mensaje[-1]
+            self.fps.fps = estado["fps"]
+            self.fps.fraccion_omitida = estado["omitidos"]
+            self.camshift_fallos = estado["camshift_fallos"]
+            self.motor._recibir_estado(estado)
+            if tipo == "respuesta":
+                espera = self._respuestas.get(mensaje[1])
+                if espera is not None:
+                    espera[1], espera[2] = mensaje[2], estado
+                    espera[0].set()
+        self.running = False
+        for espera in list(self._respuestas.values()): # No dejar a la UI esperando un proceso que ya no está
+            espera[0].set()
+
+    # Envía un comando (con su frame en la ranura auxiliar) y espera la respuesta del proceso de análisis.
+    # Devuelve (respuesta, estado del motor justo después del comando)
+    def llamar(self, tipo, frame=None, *args, timeout=10.0):
+        if not self.running:
+            raise RuntimeError("El proceso de análisis no está en ejecución")
+        if frame is not None:
+            np.copyto(self.ring.auxiliar, frame)
+        self._enviar_focos() # Las transiciones anteriores al comando deben llegar antes que él
+        id_comando = next(self._ids)
+        espera = self._respuestas[id_comando] = [threading.Event(), None, None]
+        try:
+            self._comandos.put((tipo, id_comando) + args)
+            if not espera[0].wait(timeout) or not self.running:
+                raise RuntimeError("El proceso de análisis no respondió")
+            return espera[1], espera[2]
+        finally:
+            del self._respuestas[id_comando]
+
+    # Último resultado recibido: (seq, FrameResult, primitivas) o None
+    def latest(self):
+        return self._resultado
+
+    def stop(self, timeout=2.0):
+        if self._proceso is None:
+            return
+        if self.running:
+            self._comandos.put(("salir",))
+        self._proceso.join(timeout)
+        if self._proceso.is_alive():
+            self._proceso.terminate()
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._proceso = self._thread = None
+        if self.motor.procesador is self:
+            self.motor.procesador = None
+
+
+# Reemplazo de AnalysisEngine en el proceso de la UI: mismos métodos y atributos que usa Pantalla_UI
+# (set_roi, adquirir_roi, start, stop, roi, detector, escala, margen_busqueda, readquisiciones, analyzer).
+# El análisis corre en el proceso de ProcesadorRemoto; analyzer es una réplica que se actualiza con el
+# estado que éste envía (la línea de tiempo ya combinada con el foco), al leerla desde el hilo que la usa
+class MotorRemoto:
+    def __init__(self, metricas=None, reloj=None, monitor=None, planificador=True):
+        self.reloj = reloj or RELOJ
+        self.metricas = metricas or Metricas() # Recibe las métricas del análisis al terminar cada examen
+        self.monitor = monitor # WindowMonitor de la UI: sus transiciones se reenvían al proceso de análisis
+        self.planificador = planificador
+        self.detector = None # Con un detector (cualquier valor no None) el proceso de análisis crea el suyo
+        self.escala = 1.0 # Configurar antes de procesador(), como en AnalysisEngine
+        self.margen_busqueda = None
+        self.tracker = None # El tracker vive en el proceso de análisis
+        self.roi = None
+        self.exam_active = False
+        self.readquisiciones = 0
+        self.procesador = None
+        self._analyzer = AttentionAnalyzer(self.reloj)
+        self._estado = None # Último estado recibido del proceso de análisis
+        self._aplicado = None # Estado ya aplicado a la réplica
+
+    # Crea el ProcesadorRemoto (sin iniciarlo) que analiza los frames del anillo compartido
+    def crear_procesador(self, ring):
+        self.procesador = ProcesadorRemoto(self, ring, self.planificador)
+        return self.procesador
+
+    # Llamado por el hilo receptor: los atributos simples se actualizan ya; la réplica, al leerla
+    def _recibir_estado(self, estado):
+        self.roi = estado["roi"]
+        self.exam_active = estado["exam_active"]
+        self.readquisiciones = estado["readquisiciones"]
+        self._estado = estado
+
+    @property
+    def analyzer(self):
+        estado = self._estado
+        if estado is not self._aplicado:
+            self._aplicado = estado
+            timeline = AttentionTimeline()
+            timeline.registrar_lote(*estado["intervalos"])
+            analyzer = self._analyzer
+            analyzer.timeline = timeline
+            analyzer.start_time = estado["start_time"]
+            analyzer.last_movement_time = estado["last_movement_time"]
+        return self._analyzer
+
+    def _procesador(self):
+        if self.procesador is None:
+            raise RuntimeError("El análisis no está conectado a una cámara")
+        return self.procesador
+
+    def set_roi(self, frame_bgr, roi):
+        return self._procesador().llamar("roi", frame_bgr, tuple(int(v) for v in roi))[0]
+
+    def adquirir_roi(self, frame_bgr):
+        return self._procesador().llamar("adquirir", frame_bgr)[0]
+
+    def start(self, frame_bgr, now=None):
+        return bool(self._procesador().llamar("start", frame_bgr, self.reloj.ahora() if now is None else now)[0])
+
+    # Detiene el examen y suma a self.metricas las del proceso de análisis durante el examen
+    def stop(self):
+        if self.procesador is None or not self.procesador.running:
+            self.exam_active = False
+            self.roi = None
+            return
+        _, estado = self.procesador.llamar("stop")
+        self.metricas.agregar(estado["metricas"])
+
+
+# Percentiles (ms) de la latencia de extremo a extremo registrada en 'metricas'
+def _latencias(metricas):
+    r = metricas.resumen().get("extremo_a_extremo", {})
+    return {k: r.get(k, 0.0) for k in ("n", "p50_ms", "p95_ms", "p99_ms", "max_ms")}
+
+
+# Simula el hilo de Tk ocupado: trabajo en Python puro durante 'carga' de cada período de 'periodo' segundos,
+# leyendo el último frame como lo haría la pantalla. Devuelve al pasar 'segundos'
+def _ui_ocupada(lector, segundos, carga, periodo=0.033):
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        lector.siguiente(timeout=0)
+        x = 0
+        while time.perf_counter() - inicio < carga * periodo:
+            for i in range(200):
+                x += i * i
+        restante = periodo - (time.perf_counter() - inicio)
+        if restante > 0:
+            time.sleep(restante)
+
+
+# Mide la latencia de captura a resultado en modo "hilos" (todo en este proceso, como la UI por defecto)
+# o "procesos" (captura y análisis en procesos propios), con el hilo principal ocupado como una UI cargada
+def medir(modo, fuente="sintetico", resolucion=(640, 480), fps=30.0, segundos=20.0, carga_ui=0.8):
+    from synthetic_video import SyntheticExam
+    roi = SyntheticExam(resolucion[0], resolucion[1], fps).roi if fuente == "sintetico" else None
+    if modo == "hilos":
+        from analysis_engine import AnalysisEngine
+        from frame_capture import CameraCapture
+        from frame_processor import FrameProcessor
+        from window_monitor import WindowMonitor
+        cap = abrir_fuente(fuente, resolucion, fps)
+        capture = CameraCapture(cap, capacidad=4)
+        if not capture.start():
+            raise IOError(f"La fuente {fuente} no entregó frames")
+        engine = AnalysisEngine()
+        lector_ui = capture.ring.crear_lector()
+        processor = FrameProcessor(engine, capture.ring.crear_lector(), WindowMonitor())
+    else:
+        capture = CapturaEnProceso(fuente, capacidad=4, resolucion=resolucion, fps=fps)
+        if not capture.start():
+            raise IOError(capture.error)
+        engine = MotorRemoto(planificador=False)
+        lector_ui = capture.ring.crear_lector()
+        processor = engine.crear_procesador(capture.ring)
+    processor_lock = getattr(processor, "lock", threading.Lock())
+    try:
+        ref = lector_ui.siguiente(timeout=5.0)
+        alto, ancho = ref.frame.shape[:2]
+        roi = roi or (ancho // 3, alto // 4, ancho // 3, alto // 2)
+        processor.start()
+        with processor_lock:
+            engine.set_roi(ref.frame, roi)
+            if not engine.start(ref.frame, now=ref.timestamp):
+                raise ValueError("No se detectaron puntos en la ROI")
+        if modo == "hilos":
+            engine.metricas.reiniciar()
+        _ui_ocupada(lector_ui, segundos, carga_ui)
+        with processor_lock:
+            engine.stop()
+    finally:
+        processor.stop()
+        capture.stop()
+        if modo == "hilos":
+            cap.release()
+    return _latencias(engine.metricas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latencia de extremo a extremo: pipeline en hilos o en procesos")
+    parser.add_argument("--fuente", default="sintetico", help="'sintetico', ruta de un video o índice de cámara")
+    parser.add_argument("--resolucion", default="640x480", help="Resolución del video sintético")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--segundos", type=float, default=20.0, help="Duración de cada medición")
+    parser.add_argument("--carga-ui", type=float, default=0.8,
+                        help="Fracción del tiempo en que el hilo de la UI está ocupado en Python")
+    parser.add_argument("--modo", choices=("ambos", "hilos", "procesos"), default="ambos")
+    parser.add_argument("--json", default=None, help="Guardar los resultados en un JSON")
+    args = parser.parse_args(argv)
+
+    fuente = int(args.fuente) if args.fuente.isdigit() else args.fuente
+    resolucion = tuple(int(v) for v in args.resolucion.lower().split("x"))
+    modos = ("hilos", "procesos") if args.modo == "ambos" else (args.modo,)
+    resultados = {}
+    print(f"{'modo':<10}{'n':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'máx ms':>9}")
+    for modo in modos:
+        r = resultados[modo] = medir(modo, fuente, resolucion, args.fps, args.segundos, args.carga_ui)
+        print(f"{modo:<10}{r['n']:>7}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"fuente": args.fuente, "carga_ui": args.carga_ui, "resultados": resultados}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
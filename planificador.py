@@ -0,0 +1,92 @@
+# Planificador adaptativo de la frecuencia de análisis.
+# Decide, frame a frame, si vale la pena ejecutar las etapas costosas (CamShift, flujo óptico,
+# reposición de puntos) o basta con integrar el tiempo con el último estado conocido.
+# Señales (todas baratas):
+#   - energía de diferencia entre frames, sobre una submuestra del canal verde (sin conversiones de color),
+#     comparada con el nivel de ruido de la cámara estimado en los frames quietos
+#   - magnitud de dx/dy de los últimos frames analizados
+#   - latencia medida del análisis frente al intervalo entre frames de la cámara
+# Con movimiento se analiza cada frame; con el candidato quieto el periodo entre análisis crece
+# gradualmente hasta periodo_max. Si el análisis tarda más de lo que permite el presupuesto de CPU
+# (utilizacion), el periodo mínimo sube para que el equipo no se atrase cada vez más.
+
+import numpy as np
+
+
+class PlanificadorAdaptativo:
+    def __init__(self, periodo_max=0.2, umbral_energia=1.0, factor_ruido=2.5, umbral_movimiento=1.0,
+                 utilizacion=0.7, paso=8):
+        self.periodo_max = periodo_max # Máximo tiempo (s) sin analizar con el candidato quieto
+        self.umbral_energia = umbral_energia # Diferencia media por píxel (0..255) mínima que se considera movimiento
+        self.factor_ruido = factor_ruido # ... y cuántas veces debe superar al ruido de la cámara
+        self.umbral_movimiento = umbral_movimiento # |dx| o |dy| (px/frame) que se considera movimiento
+        self.utilizacion = utilizacion # Fracción del tiempo que puede ocupar el análisis
+        self.paso = paso # Submuestreo (en píxeles) para la energía de diferencia
+        self.periodo_movimiento = 0.0 # Periodo entre análisis según el movimiento
+        self.latencia = 0.0 # Promedio exponencial de la latencia de análisis (s)
+        self.intervalo_frames = 0.0 # Promedio exponencial del intervalo entre frames (s)
+        self.energia = 0.0 # Energía de diferencia del último frame
+        self.ruido = 0.0 # Promedio exponencial de la energía en frames sin movimiento
+        self.analizados = 0
+        self.omitidos = 0
+        self._ultimo_analisis = None # Timestamp del último frame analizado
+        self._ultimo_ts = None
+        self._miniatura = None # Submuestra del frame anterior (int16, reutilizada)
+        self._diferencia = None
+
+    # Periodo mínimo entre análisis que impone la carga medida
+    @property
+    def periodo_carga(self):
+        return self.latencia / self.utilizacion
+
+    # Periodo efectivo entre análisis
+    @property
+    def periodo(self):
+        return max(self.periodo_movimiento, self.periodo_carga)
+
+    # Fracción de frames omitidos
+    @property
+    def fraccion_omitida(self):
+        total = self.analizados + self.omitidos
+        return self.omitidos / total if total else 0.0
+
+    # Diferencia media absoluta entre la submuestra de este frame y la del anterior
+    def _energia(self, frame):
+        sub = frame[::self.paso, ::self.paso, 1] if frame.ndim == 3 else frame[::self.paso, ::self.paso]
+        if self._miniatura is None or self._miniatura.shape != sub.shape:
+            self._miniatura = sub.astype(np.int16)
+            self._diferencia = np.empty_like(self._miniatura)
+            return 0.0
+        np.subtract(sub, self._miniatura, out=self._diferencia, dtype=np.int16)
+        np.abs(self._diferencia, out=self._diferencia)
+        self._miniatura[...] = sub
+        return float(self._diferencia.mean())
+
+    # Decide si el frame (con timestamp now) debe analizarse
+    def debe_analizar(self, frame, now):
+        if self._ultimo_ts is not None and now > self._ultimo_ts:
+            dt = now - self._ultimo_ts
+            self.intervalo_frames = dt if self.intervalo_frames == 0.0 else 0.9 * self.intervalo_frames + 0.1 * dt
+        self._ultimo_ts = now
+        self.energia = self._energia(frame)
+        if self.energia > max(self.umbral_energia, self.factor_ruido * self.ruido):
+            self.periodo_movimiento = 0.0 # Cambio brusco en la imagen: volver a analizar cada frame
+        else:
+            self.ruido = 0.95 * self.ruido + 0.05 * self.energia
+        # Medio intervalo de tolerancia para no perder un frame por el jitter de los timestamps
+        if self._ultimo_analisis is None or now - self._ultimo_analisis >= self.periodo - 0.5 * self.intervalo_frames:
+            self._ultimo_analisis = now
+            self.analizados += 1
+            return True
+        self.omitidos += 1
+        return False
+
+    # Registra el resultado de un frame analizado y su latencia (s) para ajustar el periodo
+    def registrar(self, result, latencia):
+        self.latencia = latencia if self.latencia == 0.0 else 0.8 * self.latencia + 0.2 * latencia
+        movimiento = max(abs(result.dx or 0.0), abs(result.dy or 0.0))
+        if movimiento > self.umbral_movimiento or result.tracking_perdido:
+            self.periodo_movimiento = 0.0
+        else:
+            # Quieto: alargar el periodo de forma gradual (un frame más cada vez, hasta periodo_max)
+            self.periodo_movimiento = min(self.periodo_max, self.periodo_movimiento + self.intervalo_frames)
@@ -0,0 +1,67 @@
+# Protocolo de la ingesta por red (cliente_ingesta.py -> servidor_ingesta.py) sobre TCP.
+# Cada mensaje es una cabecera JSON precedida de su longitud (4 bytes, big-endian) y, si la cabecera
+# trae "n", n bytes de carga a continuación (el JPEG de un frame o el texto de un reporte).
+#
+# Cliente -> servidor, en este orden:
+#   {"tipo": "hola", "sesion": id, "sala": str, "duracion": s|null, "roi": [x, y, w, h]|null,
+#    "escala": reducción aplicada a los frames (1.0 = resolución de la cámara), "reloj": time.time(),
+#    "creditos": frames enviados sin confirmar como máximo|null}
+#   {"tipo": "frame", "seq": n, "ts": timestamp del frame, "captura": reloj al capturar,
+#    "enviado": reloj al enviar, "n": bytes} + JPEG                               (muchos)
+#   {"tipo": "foco", "ts": t, "enfocada": bool}                                  (al cambiar el foco)
+#   {"tipo": "fin", "ts": t}
+# Servidor -> cliente:
+#   {"tipo": "listo"} tras "hola"; {"tipo": "reporte", "n": bytes} + texto tras "fin";
+#   {"tipo": "error", "mensaje": str} si la sesión no se puede analizar;
+#   {"tipo": "ack", "seq": n} al terminar de procesar cada frame, si "hola" trajo "creditos".
+# Con créditos el cliente no envía un frame mientras tenga "creditos" sin confirmar: la latencia queda
+# acotada por el tiempo de análisis de esos frames, sin importar cuántos bytes quepan en los buffers
+# de TCP (drain() solo frena al cliente cuando esos buffers, de varios MB en localhost, se llenan).
+# Los timestamps son del reloj del cliente: el análisis usa "ts" (el tiempo de captura de la cámara
+# o el del video), no los de llegada. "captura" y "enviado" (time.time() del cliente) solo sirven
+# para medir latencias.
+
+import json
+import struct
+
+_LONGITUD = struct.Struct(">I")
+MAX_CABECERA = 64 * 1024 # Límite de la cabecera JSON (protege al servidor de mensajes corruptos)
+MAX_CARGA = 16 * 1024 * 1024 # Límite de la carga de un mensaje
+
+
+class ErrorProtocolo(ValueError):
+    pass
+
+
+# Lee un mensaje de un asyncio.StreamReader. Devuelve (cabecera, carga) o None si la conexión se cerró
+async def leer_mensaje(reader):
+    try:
+        (largo,) = _LONGITUD.unpack(await reader.readexactly(_LONGITUD.size))
+        if largo > MAX_CABECERA:
+            raise ErrorProtocolo(f"Cabecera demasiado grande: {largo} bytes")
+        cabecera = json.loads(await reader.readexactly(largo))
+        if not isinstance(cabecera, dict):
+            raise ErrorProtocolo(f"La cabecera no es un objeto JSON: {type(cabecera).__name__}")
+        n = int(cabecera.get("n", 0))
+        if n > MAX_CARGA:
+            raise ErrorProtocolo(f"Carga demasiado grande: {n} bytes")
+        carga = await reader.readexactly(n) if n else b""
+    except (EOFError, ConnectionError):
+        return None
+    except (ValueError, TypeError) as e:
+        if isinstance(e, ErrorProtocolo):
+            raise
+        raise ErrorProtocolo(f"Cabecera inválida: {e}")
+    return cabecera, carga
+
+
+# Escribe un mensaje y espera a que el buffer de envío se vacíe (drain): si el otro extremo no lee,
+# el emisor queda esperando aquí. Es la contrapresión de extremo a extremo del protocolo
+async def escribir_mensaje(writer, cabecera, carga=b""):
+    if carga:
+        cabecera = dict(cabecera, n=len(carga))
+    datos = json.dumps(cabecera).encode("utf-8")
+    writer.write(_LONGITUD.pack(len(datos)) + datos)
+    if carga:
+        writer.write(carga)
+    await writer.drain()
@@ -0,0 +1,227 @@
+# Prueba de resistencia (soak) acelerada: simula un examen de varias horas en minutos, con un
+# RelojSimulado en lugar del reloj de pared. Un examen sintético sin pérdida del rostro se repite en
+# bucle; cada frame avanza el reloj 1/fps (cada instante es inicio + i / fps, sin acumular dt) y se
+# procesa como en vivo: AnalysisEngine sin marca de tiempo explícita (lee el reloj inyectado),
+# el diario de la sesión sincronizado como lo hace el temporizador de la UI y, al final, el reporte.
+# Por tramos (10 minutos simulados por defecto) registra fps, latencias, memoria residente (RSS) y
+# el tiempo sin atención esperado frente al obtenido. El primer tramo es de calentamiento (el tracker
+# y la memoria se estabilizan); respecto de él y del segundo tramo se comprueba que:
+#   - memoria: el RSS no crece más de --tolerancia-rss MB desde el final del primer tramo
+#   - reloj: el tiempo del examen es exactamente frames / fps, los bordes de todos los intervalos de la
+#     línea de tiempo caen (sin error acumulado) en instantes de frame dentro del examen, y el total sin
+#     atención acumulado no se aparta del esperado por el guion en más de --tolerancia-error (fracción)
+#   - deriva: ningún tramo tiene un error de tiempo sin atención mayor que --tolerancia-error veces su
+#     tiempo esperado, ni ninguno posterior un error mayor que el del segundo en más de
+#     --tolerancia-deriva segundos, y el diario reconstruido coincide con el analizador
+#   - rendimiento: el mejor tramo (fps según la latencia p50) del último tercio no es más lento que
+#     el mejor del primer tercio en más de --tolerancia-fps. La carga ajena del equipo solo hace más
+#     lentos algunos tramos; una degradación real los hace más lentos a todos
+# Termina con código 1 si alguna comprobación falla.
+#
+# Uso:
+#   python prueba_resistencia.py [--horas 3] [--resolucion 320x240] [--fps 30] [--tramo 10]
+#                                [--tolerancia-rss 16] [--tolerancia-deriva 0.5] [--tolerancia-error 0.05]
+#                                [--tolerancia-fps 0.2]
+#                                [--json resistencia.json]
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from analysis_engine import AnalysisEngine
+from attention_timeline import CAUSAS
+from diario_sesion import DiarioSesion, reconstruir
+from metricas import Metricas
+from reloj import RelojSimulado
+from reporte import Reporte
+from synthetic_video import FASES_POR_DEFECTO, SyntheticExam
+
+
+# Guion que se repite: el por defecto sin la fase "perdido" (sin detector, un rostro perdido
+# no se re-adquiere y el resto del examen no mediría nada)
+FASES_RESISTENCIA = tuple(f for f in FASES_POR_DEFECTO if f[0] != "perdido")
+
+# Inicio del reloj simulado: un timestamp de época real, así la precisión de los float es la de un examen en vivo
+INICIO_SIMULADO = 1.7e9
+
+
+# Memoria residente actual del proceso en MB (Linux: /proc/self/statm; si no, el pico de getrusage)
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo / 1e6 if sys.platform == "darwin" else maximo / 1e3
+
+
+# Tiempo sin atención por causa de la línea de tiempo dentro de [a, b)
+def _desglose_en(timeline, a, b):
+    inicios, fines, causas = timeline.intervalos()
+    solapes = np.clip(np.minimum(fines, b) - np.maximum(inicios, a), 0.0, None)
+    sumas = np.bincount(causas, weights=solapes, minlength=len(CAUSAS))
+    return {causa: float(sumas[i]) for i, causa in enumerate(CAUSAS)}
+
+
+# Ejecuta el examen simulado. Devuelve un resumen con un registro por tramo y el resultado final
+def ejecutar_resistencia(horas=3.0, width=320, height=240, fps=30.0, tramo_min=10.0, carpeta_diario=None):
+    video = SyntheticExam(width, height, fps, fases=FASES_RESISTENCIA)
+    n_ciclo = len(video)
+    codigos = {causa: i for i, causa in enumerate(CAUSAS)}
+    etiquetas = np.array([codigos.get(e, -1) for e in video.etiquetas], dtype=np.int64)
+    total_frames = int(round(horas * 3600.0 * fps))
+    frames_tramo = max(1, int(round(tramo_min * 60.0 * fps)))
+
+    reloj = RelojSimulado(INICIO_SIMULADO)
+    engine = AnalysisEngine(reloj=reloj)
+    engine.set_roi(video.frame(0), video.roi)
+    if not engine.start(video.frame(0)):
+        raise RuntimeError("No se detectaron puntos en la ROI sintética")
+    analyzer = engine.analyzer
+    diario = DiarioSesion(carpeta_diario or tempfile.mkdtemp(prefix="resistencia-"))
+    diario.iniciar(analyzer.start_time, duracion=horas * 3600.0)
+    cada_sincronizacion = max(1, int(round(0.2 * fps))) # El temporizador de la UI corre cada 200 ms
+
+    tramos = []
+    metricas = Metricas()
+    perf = time.perf_counter
+    inicio_real = perf()
+    for i in range(1, total_frames + 1):
+        j = i % n_ciclo
+        reloj.fijar(INICIO_SIMULADO + i / fps)
+        frame = video.frame(j)
+        t = perf()
+        engine.process_frame(frame, window_focused=video.focos[j])
+        metricas.observar("procesamiento", perf() - t)
+        if i % cada_sincronizacion == 0:
+            diario.sincronizar(analyzer)
+        if i % frames_tramo == 0 or i == total_frames:
+            # Frames del tramo: el intervalo [t(k-1), t(k)) lleva la etiqueta del frame k
+            primero = tramos[-1]["hasta_frame"] + 1 if tramos else 1
+            k = np.arange(primero, i + 1)
+            esperado = float(np.count_nonzero(etiquetas[k % n_ciclo] >= 0)) / fps
+            a, b = INICIO_SIMULADO + (primero - 1) / fps, INICIO_SIMULADO + i / fps
+            obtenido = sum(_desglose_en(analyzer.timeline, a, b).values())
+            resumen = metricas.resumen()["procesamiento"]
+            tramos.append({"hasta_frame": i, "minuto": i / fps / 60.0, "fps": 1000.0 / resumen["media_ms"],
+                           "p50_ms": resumen["p50_ms"], "p95_ms": resumen["p95_ms"], "rss_mb": rss_mb(),
+                           "esperado_s": esperado, "obtenido_s": obtenido, "error_s": abs(obtenido - esperado)})
+            metricas = Metricas()
+
+    elapsed = reloj.ahora() - analyzer.start_time
+    # Bordes de los intervalos sin atención en frames desde el inicio: si el reloj acumulara error
+    # dejarían de caer en inicio + k / fps
+    inicios, fines, _ = analyzer.timeline.intervalos()
+    bordes = np.concatenate((inicios, fines))
+    k = np.rint((bordes - INICIO_SIMULADO) * fps)
+    desvio_reloj = float(np.max(np.abs(bordes - (INICIO_SIMULADO + k / fps)))) if len(bordes) else 0.0
+    fuera_del_examen = bool(len(bordes) and (k.min() < 0 or k.max() > total_frames))
+    engine.stop()
+    reporte = Reporte.construir_reporte(elapsed, analyzer, engine.metricas)
+    diario.finalizar(analyzer, elapsed, reporte)
+    elapsed_diario, analyzer_diario, completo = reconstruir(diario.ruta)
+    return {
+        "horas": horas, "resolucion": f"{width}x{height}", "fps": fps, "frames": total_frames,
+        "segundos_reales": perf() - inicio_real,
+        "elapsed": elapsed, "elapsed_esperado": total_frames / fps,
+        "desvio_reloj": desvio_reloj, "fuera_del_examen": fuera_del_examen,
+        "sin_atencion": analyzer.total_no_atention,
+        "sin_atencion_esperado": sum(t["esperado_s"] for t in tramos),
+        "intervalos": analyzer.timeline.n,
+        "desglose": analyzer.no_attention_breakdown,
+        "desglose_diario": analyzer_diario.no_attention_breakdown if completo else None,
+        "tramos": tramos,
+    }
+
+
+# Comprobaciones sobre el resultado. Devuelve una lista de (descripción, ok)
+def comprobar(resultado, tolerancia_rss=16.0, tolerancia_deriva=0.5, tolerancia_fps=0.2, tolerancia_error=0.05):
+    tramos = resultado["tramos"]
+    estables = tramos[1:] or tramos # Sin el tramo de calentamiento
+    crecimiento = max(t["rss_mb"] for t in tramos) - tramos[0]["rss_mb"]
+    referencia = estables[0]
+    peor = max(estables, key=lambda t: t["error_s"])
+    # Error relativo de cada tramo (incluido el de calentamiento) respecto de su tiempo esperado
+    peor_relativo = max(tramos, key=lambda t: t["error_s"] / max(t["esperado_s"], 1e-9))
+    reloj_error = abs(resultado["elapsed"] - resultado["elapsed_esperado"])
+    total_error = abs(resultado["sin_atencion"] - resultado["sin_atencion_esperado"])
+    diario = resultado["desglose_diario"]
+    diario_error = (max(abs(diario[c] - resultado["desglose"][c]) for c in CAUSAS)
+                    if diario is not None else float("inf"))
+    # Mejor tramo de cada tercio: una racha de carga ajena no alcanza para marcar una degradación
+    tercio = max(1, len(estables) // 3)
+    fps_inicio = max(1000.0 / t["p50_ms"] for t in estables[:tercio])
+    fps_final = max(1000.0 / t["p50_ms"] for t in estables[-tercio:])
+    caida = 1.0 - fps_final / fps_inicio if fps_inicio > 0 else 0.0
+    return [
+        (f"memoria: RSS +{crecimiento:.1f} MB desde el primer tramo (máx. {tolerancia_rss:.1f})",
+         crecimiento <= tolerancia_rss),
+        (f"reloj: tiempo del examen {resultado['elapsed']:.6f} s, esperado {resultado['elapsed_esperado']:.6f} s",
+         reloj_error < 1e-6 * max(1.0, resultado["elapsed_esperado"])),
+        (f"reloj: bordes de la línea de tiempo a {resultado['desvio_reloj']:.2e} s de un instante de frame"
+         + (" (algunos fuera del examen)" if resultado["fuera_del_examen"] else ""),
+         resultado["desvio_reloj"] < 1e-6 and not resultado["fuera_del_examen"]),
+        (f"reloj: {resultado['sin_atencion']:.2f} s sin atención acumulados, "
+         f"esperado {resultado['sin_atencion_esperado']:.2f} s (error máx. {tolerancia_error * 100:.0f}%)",
+         total_error <= tolerancia_error * resultado["sin_atencion_esperado"]),
+        (f"deriva: peor tramo (minuto {peor_relativo['minuto']:.0f}) con error {peor_relativo['error_s']:.3f} s "
+         f"de {peor_relativo['esperado_s']:.2f} s esperados (máx. {tolerancia_error * 100:.0f}%)",
+         all(t["error_s"] <= tolerancia_error * t["esperado_s"] for t in tramos)),
+        (f"deriva: peor tramo (minuto {peor['minuto']:.0f}) con error {peor['error_s']:.3f} s, "
+         f"referencia (minuto {referencia['minuto']:.0f}) {referencia['error_s']:.3f} s "
+         f"(margen {tolerancia_deriva:.2f})",
+         peor["error_s"] <= referencia["error_s"] + tolerancia_deriva),
+        (f"diario: diferencia máxima con el analizador {diario_error:.6f} s", diario_error < 1e-6),
+        (f"rendimiento: {fps_final:.1f} fps al final, {fps_inicio:.1f} al principio "
+         f"(caída máx. {tolerancia_fps * 100:.0f}%)", caida <= tolerancia_fps),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de resistencia acelerada de un examen largo")
+    parser.add_argument("--horas", type=float, default=3.0, help="Duración simulada del examen")
+    parser.add_argument("--resolucion", default="320x240", help="Resolución del video sintético")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--tramo", type=float, default=10.0, help="Minutos simulados por tramo de medición")
+    parser.add_argument("--tolerancia-rss", type=float, default=16.0, help="Crecimiento máximo del RSS (MB)")
+    parser.add_argument("--tolerancia-deriva", type=float, default=0.5,
+                        help="Error máximo de un tramo por encima del primero (s)")
+    parser.add_argument("--tolerancia-error", type=float, default=0.05,
+                        help="Error máximo del tiempo sin atención de un tramo (fracción del esperado)")
+    parser.add_argument("--tolerancia-fps", type=float, default=0.2, help="Caída máxima de fps (fracción)")
+    parser.add_argument("--diario", default=None, help="Carpeta del diario de la sesión (por defecto, temporal)")
+    parser.add_argument("--json", default=None, help="Guardar el resultado en un JSON")
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.resolucion.lower().split("x"))
+    resultado = ejecutar_resistencia(args.horas, width, height, args.fps, args.tramo, args.diario)
+
+    print(f"{resultado['horas']:.1f} h simuladas ({resultado['frames']} frames {resultado['resolucion']}) "
+          f"en {resultado['segundos_reales'] / 60.0:.1f} min, {resultado['intervalos']} intervalos sin atención\n")
+    print(f"{'minuto':>7} {'fps':>8} {'p50 ms':>7} {'p95 ms':>7} {'RSS MB':>8} {'esperado s':>11} "
+          f"{'obtenido s':>11} {'error s':>8}")
+    for k, t in enumerate(resultado["tramos"]):
+        print(f"{t['minuto']:7.0f} {t['fps']:8.1f} {t['p50_ms']:7.2f} {t['p95_ms']:7.2f} {t['rss_mb']:8.1f} "
+              f"{t['esperado_s']:11.2f} {t['obtenido_s']:11.2f} {t['error_s']:8.3f}"
+              + ("  (calentamiento)" if k == 0 else ""))
+    print()
+    comprobaciones = comprobar(resultado, args.tolerancia_rss, args.tolerancia_deriva, args.tolerancia_fps,
+                               args.tolerancia_error)
+    for descripcion, ok in comprobaciones:
+        print(("OK    " if ok else "FALLA ") + descripcion)
+
+    if args.json:
+        resultado["comprobaciones"] = [{"descripcion": d, "ok": ok} for d, ok in comprobaciones]
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+    return 0 if all(ok for _, ok in comprobaciones) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,13 +12,17 @@ class RegionSelector:
         self.ix = self.iy = 0
         self.fx = self.fy = 0
         self.roi_ready = False # Bandera que indica si la ROI ha sido seleccionada
+        self.cambio = True # Hay que redibujar la selección (la pone el callback del mouse)
     
     # Reinicia el estado de selección de ROI
     def reset(self):
         self.roi_ready = False # Marca que la ROI no está lista para ser usada
+        self.cambio = True
 
     # Manejador de eventos del mouse para seleccionar la ROI
     def select_roi(self, event, x, y, flags, param):
+        if event in (cv2.EVENT_LBUTTONDOWN, cv2.EVENT_LBUTTONUP) or (event == cv2.EVENT_MOUSEMOVE and self.dragging):
+            self.cambio = True # El rectángulo cambió: el bucle de selección debe redibujar
         if event == cv2.EVENT_LBUTTONDOWN: # Si el usuario presiona el botón izquierdo del mouse
             self.dragging = True # Inicia el arrastre
             self.ix, self.iy = x, y # Guarda las coordenadas iniciales
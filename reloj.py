@@ -0,0 +1,40 @@
+# Reloj del examen, inyectable en todos los componentes que necesitan "ahora" (captura, analizador,
+# AnalysisEngine, UI). Así las pruebas de larga duración pueden simular horas de examen en minutos
+# con un RelojSimulado, sin esperar en tiempo real.
+# - RelojSistema: monotónico (time.monotonic, no salta si el sistema ajusta la hora durante el examen)
+#   pero anclado a la época al crearse, así sus valores se pueden mezclar con los timestamps ya
+#   grabados (grabaciones, diario, almacén) y leer como fechas. Al pasarlo a otro proceso (pickle)
+#   conserva su ancla: sin ella cada proceso se anclaría a la época por su cuenta, y un ajuste de la
+#   hora entre un lanzamiento y otro desfasaría sus timestamps.
+# - RelojSimulado: solo avanza cuando se le indica.
+
+import time
+
+
+class RelojSistema:
+    def __init__(self):
+        self._base = time.time() - time.monotonic() # Desfase entre la época y el reloj monotónico
+
+    # Segundos (escala de time.time()), nunca decrecientes
+    def ahora(self):
+        return self._base + time.monotonic()
+
+
+class RelojSimulado:
+    def __init__(self, inicio=0.0):
+        self.t = float(inicio)
+
+    def ahora(self):
+        return self.t
+
+    # Fija el instante actual. Calcular cada instante como inicio + i / fps y fijarlo evita el error
+    # que acumulan miles de sumas de dt en punto flotante
+    def fijar(self, t):
+        self.t = float(t)
+
+    def avanzar(self, dt):
+        self.t += dt
+
+
+# Reloj por defecto de todos los componentes
+RELOJ = RelojSistema()
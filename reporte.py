@@ -1,15 +1,33 @@
+import socket
+import time
+
+# Porcentaje de tiempo sin atención a partir del cual el comportamiento se considera sospechoso
+UMBRAL_SOSPECHOSO = 40.0
+
+# Nombre legible de cada causa de falta de atención
+_NOMBRES_CAUSA = {
+    "left": "giro a la izquierda",
+    "right": "giro a la derecha",
+    "up": "giro hacia arriba",
+    "down": "giro hacia abajo",
+    "lost_roi": "pérdida del rostro",
+    "focus_change": "cambio de ventana",
+}
+
+
 # Clase utilizada para generar reportes del examen de atención
 class Reporte:
 
     @staticmethod
     #  Genera un reporte detallado del examen de atención.
-    def construir_reporte(elapsed, analyzer):
+    #  Si se pasan métricas (metricas.Metricas), se agrega al final el resumen de rendimiento por etapa
+    def construir_reporte(elapsed, analyzer, metricas=None):
         total_no = analyzer.total_no_atention # # Tiempo total sin atención acumulado por el analizador
         porcentaje_no = (total_no / elapsed) * 100.0 if elapsed > 0 else 0.0 # Porcentaje de tiempo sin atención respecto al tiempo total del examen
         # Desglose por causa (diccionario con claves: left, right, up, down, lost_roi, focus_change)
         b = analyzer.no_attention_breakdown
         # Evaluación básica: comportamiento sospechoso si más del 40% del tiempo sin atención
-        sospechoso = "Sospechoso (mas del 40'%'sin atención)" if porcentaje_no > 40.0 else "Normal"
+        sospechoso = "Sospechoso (mas del 40'%'sin atención)" if porcentaje_no > UMBRAL_SOSPECHOSO else "Normal"
         # Construcción de reporte en formato legible
         reporte = (
             f"--- Reporte de Atención ---\n\n"
@@ -22,7 +40,42 @@ class Reporte:
             f" - Giro hacia abajo: {b['down']:.2f} s\n"
             f" - Pérdida del rostro: {b['lost_roi']:.2f} s\n"
             f" - Cambio de ventana: {b['focus_change']:.2f} s\n\n"
-            f"Comportamiento: {sospechoso}\n"
         )
+        # Episodios (intervalos continuos sin atención) a partir de la línea de tiempo del analizador
+        timeline = getattr(analyzer, "timeline", None)
+        if timeline is not None and len(timeline):
+            episodios = timeline.episodios()
+            duracion, inicio, causa = timeline.episodio_mas_largo()
+            por_minuto = timeline.histograma_por_minuto(analyzer.start_time, analyzer.last_movement_time)
+            peor = int(por_minuto.argmax())
+            reporte += (
+                f"Episodios sin atención: {sum(episodios.values())}\n"
+                f" - Más largo: {duracion:.2f} s ({_NOMBRES_CAUSA[causa]}, a los {inicio - analyzer.start_time:.1f} s)\n"
+                f" - Minuto con más falta de atención: {peor + 1} ({por_minuto[peor]:.1f} s)\n\n"
+            )
+        reporte += f"Comportamiento: {sospechoso}\n"
+        if metricas is not None:
+            reporte += "\n--- Rendimiento por etapa ---\n\n" + metricas.texto_resumen()
+
+        return reporte
 
-        return reporte
\ No newline at end of file
+    @staticmethod
+    #  Registro estructurado de la sesión para el almacén columnar (almacen_sesiones.AlmacenSesiones):
+    #  metadatos, desglose por causa y veredicto, con los mismos valores que el reporte de texto
+    def construir_registro(elapsed, analyzer, sesion_id, sala="", duracion=None, inicio=None):
+        total_no = analyzer.total_no_atention
+        porcentaje_no = (total_no / elapsed) * 100.0 if elapsed > 0 else 0.0
+        registro = {
+            "sesion_id": str(sesion_id),
+            "sala": sala or "",
+            "equipo": socket.gethostname(),
+            "inicio": time.time() - elapsed if inicio is None else inicio,
+            "duracion": float("nan") if duracion is None else float(duracion),
+            "elapsed": elapsed,
+            "total_no": total_no,
+            "porcentaje_no": porcentaje_no,
+            "episodios": len(analyzer.timeline),
+            "sospechoso": porcentaje_no > UMBRAL_SOSPECHOSO,
+        }
+        registro.update(analyzer.no_attention_breakdown)
+        return registro
@@ -0,0 +1,305 @@
+# Servidor de ingesta: recibe por red los frames (JPEG) y eventos de foco de muchos clientes livianos
+# (cliente_ingesta.py) y ejecuta el análisis de cada sesión en una máquina compartida.
+# - asyncio atiende todas las conexiones en un solo hilo; la decodificación JPEG y el AnalysisEngine
+#   de cada sesión corren en un pool de hilos (OpenCV libera el GIL en decodificación, conversión y LK).
+# - Contrapresión: cada sesión tiene una cola acotada. Con la cola llena el servidor deja de leer el
+#   socket de ese cliente, TCP llena su ventana y el drain() del cliente espera. Como los buffers de TCP
+#   guardan muchos frames, si el cliente pide créditos ("creditos" en "hola") además se confirma cada
+#   frame procesado ("ack") y el cliente no envía más que esa cantidad sin confirmar: la latencia queda
+#   acotada por el análisis de unos pocos frames. Un cliente con cámara sigue capturando y envía solo el
+#   frame más reciente, así que nadie acumula retraso sin límite.
+# - Los mensajes de una sesión se procesan en orden (un consumidor por sesión), con el reloj de captura
+#   del cliente, igual que el análisis offline: el resultado no depende de la red.
+# - Estadísticas por cliente (metricas.Metricas): red, cola, decodificación, etapas del análisis y
+#   latencia de extremo a extremo. Se imprimen periódicamente y se agregan al reporte de cada sesión.
+# Al terminar cada sesión se guarda su reporte (<reportes>/<sesión>.txt) y su registro en el almacén.
+#
+# Uso:
+#   python servidor_ingesta.py [--host 0.0.0.0] [--puerto 8765] [--hilos 8] [--cola 4]
+#                              [--reportes reportes/] [--almacen almacen/] [--estadisticas 10] [--planificador]
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from almacen_sesiones import AlmacenSesiones
+from analysis_engine import AnalysisEngine
+from detector_rostro import DetectorRostro
+from frame_processor import FpsMeter
+from metricas import Metricas
+from planificador import PlanificadorAdaptativo
+from protocolo_ingesta import ErrorProtocolo, escribir_mensaje, leer_mensaje
+from reporte import Reporte
+from window_monitor import WindowMonitor
+
+
+# Estado de análisis de una sesión remota. procesar_frame() se ejecuta en el pool, siempre de a un mensaje
+class SesionRemota:
+    def __init__(self, hola, cola_max=4, adaptativo=False):
+        self.id = str(hola["sesion"])
+        self.sala = hola.get("sala", "")
+        self.duracion = hola.get("duracion")
+        self.roi = tuple(hola["roi"]) if hola.get("roi") else None
+        self.escala_cliente = float(hola.get("escala", 1.0)) # Reducción aplicada por el cliente antes de enviar
+        # Diferencia entre el reloj del servidor y el del cliente (incluye la latencia de un mensaje)
+        self.desfase_reloj = time.time() - float(hola.get("reloj", time.time()))
+        self.creditos = int(hola.get("creditos") or 0) # > 0: confirmar cada frame procesado
+        self.metricas = Metricas() # Latencias de este cliente
+        self.cola = asyncio.Queue(cola_max) # Mensajes recibidos pendientes de procesar (acotada)
+        self.engine = None # Se crea con el primer frame (la escala depende de la resolución)
+        self.planificador = PlanificadorAdaptativo() if adaptativo else None
+        self.monitor = WindowMonitor() # Transiciones de foco recibidas (con el timestamp del cliente)
+        self.inicio = None # Timestamp (reloj del cliente) del frame que inició el examen
+        self.ultimo_ts = None
+        self.recibidos = 0 # Frames recibidos
+        self.errores = 0 # Frames que no se pudieron decodificar
+        self.bytes = 0
+        self.fps = FpsMeter() # Frames procesados por segundo
+        self.error = None # Motivo por el que la sesión no se puede analizar
+
+    # Crea el motor y arranca el examen sobre el primer frame utilizable
+    def _iniciar(self, frame, ts):
+        if self.engine is None:
+            detector = None
+            if self.roi is None:
+                try:
+                    detector = DetectorRostro() # Uno por sesión: el clasificador no es seguro entre hilos
+                except IOError as e:
+                    self.error = f"La sesión no envió ROI y no hay detección automática: {e}"
+                    return
+            self.engine = AnalysisEngine(escala=min(1.0, 640.0 / frame.shape[1]), margen_busqueda=1.0,
+                                         metricas=self.metricas, detector=detector, monitor=self.monitor)
+            # El umbral de movimiento está en píxeles de la cámara: se lleva a la resolución recibida
+            self.engine.analyzer.attention_threshold *= self.escala_cliente
+        engine = self.engine
+        if self.roi is not None:
+            engine.set_roi(frame, self.roi)
+        elif engine.adquirir_roi(frame) is None:
+            return # Sin rostro todavía: se reintenta con el siguiente frame
+        if engine.start(frame, now=ts):
+            self.inicio = self.ultimo_ts = ts
+
+    # Decodifica y analiza un frame (en un hilo del pool)
+    def procesar_frame(self, cabecera, jpeg, recibido):
+        metricas = self.metricas
+        t = time.perf_counter()
+        metricas.observar("cola", time.time() - recibido)
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        metricas.observar("decodificacion", time.perf_counter() - t)
+        if frame is None:
+            self.errores += 1
+            return
+        ts = float(cabecera["ts"])
+        if self.inicio is None:
+            if self.error is None:
+                self._iniciar(frame, ts)
+            return
+        engine = self.engine
+        planificador = self.planificador
+        if planificador is not None and not planificador.debe_analizar(frame, ts):
+            engine.skip_frame(now=ts)
+        else:
+            t = time.perf_counter()
+            result = engine.process_frame(frame, now=ts)
+            if planificador is not None:
+                planificador.registrar(result, time.perf_counter() - t)
+        self.ultimo_ts = ts
+        self.fps.tick()
+        # Desde la captura en el cliente hasta el fin del análisis, en el reloj del servidor
+        metricas.observar("extremo_a_extremo", time.time() - (float(cabecera["captura"]) + self.desfase_reloj))
+
+    # Tiempo analizado (reloj del cliente)
+    @property
+    def elapsed(self):
+        return self.ultimo_ts - self.inicio if self.inicio is not None else 0.0
+
+    # Línea de estado para el registro periódico del servidor
+    def estado(self):
+        resumen = self.metricas.resumen()
+        e2e = resumen.get("extremo_a_extremo", {})
+        red = resumen.get("red", {})
+        return (f"[{self.id}] {self.fps.fps:5.1f} fps, {self.recibidos} frames, cola {self.cola.qsize()}/"
+                f"{self.cola.maxsize}, red p95 {red.get('p95_ms', 0.0):.1f} ms, "
+                f"extremo a extremo p50/p95 {e2e.get('p50_ms', 0.0):.1f}/{e2e.get('p95_ms', 0.0):.1f} ms")
+
+
+class ServidorIngesta:
+    def __init__(self, host="0.0.0.0", puerto=8765, hilos=None, cola=4, carpeta_reportes="reportes",
+                 carpeta_almacen="almacen", intervalo_estadisticas=10.0, adaptativo=False):
+        self.host = host
+        self.puerto = puerto
+        self.pool = ThreadPoolExecutor(max_workers=hilos or os.cpu_count() or 1)
+        self.cola = cola # Mensajes en espera por sesión antes de dejar de leer su socket
+        self.carpeta_reportes = carpeta_reportes
+        self.carpeta_almacen = carpeta_almacen
+        self.intervalo_estadisticas = intervalo_estadisticas
+        self.adaptativo = adaptativo
+        self.sesiones = {} # id -> SesionRemota activa
+        self.terminadas = [] # (id, reporte) de las sesiones cerradas
+        self._server = None
+        self._lock_almacen = threading.Lock() # Los lotes de sesiones que terminan a la vez se escriben de a uno
+
+    # Abre el socket de escucha. Con puerto=0 el sistema elige uno libre (ver self.puerto)
+    async def iniciar(self):
+        self._server = await asyncio.start_server(self._atender, self.host, self.puerto)
+        self.puerto = self._server.sockets[0].getsockname()[1]
+        if self.intervalo_estadisticas:
+            asyncio.get_running_loop().create_task(self._imprimir_estadisticas())
+
+    async def servir(self):
+        await self.iniciar()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def cerrar(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.pool.shutdown(wait=True)
+
+    async def _imprimir_estadisticas(self):
+        while True:
+            await asyncio.sleep(self.intervalo_estadisticas)
+            for sesion in list(self.sesiones.values()):
+                print(sesion.estado(), flush=True)
+
+    # Conexión de un cliente: lee sus mensajes y los encola (esperando si la cola está llena).
+    # Una vez creada la sesión, termine con "fin", con una desconexión o con un mensaje inválido,
+    # se analiza lo recibido y se guardan su reporte y su registro
+    async def _atender(self, reader, writer):
+        sesion = consumidor = None
+        fin = False
+        try:
+            mensaje = await leer_mensaje(reader)
+            if mensaje is None or mensaje[0].get("tipo") != "hola" or "sesion" not in mensaje[0]:
+                return
+            sesion = SesionRemota(mensaje[0], self.cola, self.adaptativo)
+            if sesion.id in self.sesiones:
+                await escribir_mensaje(writer, {"tipo": "error", "mensaje": f"La sesión {sesion.id} ya está conectada"})
+                return
+            self.sesiones[sesion.id] = sesion
+            await escribir_mensaje(writer, {"tipo": "listo"})
+            consumidor = asyncio.get_running_loop().create_task(self._consumir(sesion, writer))
+            while not fin:
+                mensaje = await leer_mensaje(reader)
+                if mensaje is None: # El cliente se desconectó sin "fin": se reporta lo recibido
+                    break
+                cabecera, carga = mensaje
+                recibido = time.time()
+                if cabecera.get("tipo") == "frame":
+                    sesion.recibidos += 1
+                    sesion.bytes += len(carga)
+                    sesion.metricas.observar("red", max(0.0, recibido - (float(cabecera["enviado"]) + sesion.desfase_reloj)))
+                fin = cabecera.get("tipo") == "fin"
+                await sesion.cola.put((cabecera, carga, recibido)) # Contrapresión: espera si la cola está llena
+        except (ErrorProtocolo, KeyError, TypeError, ValueError) as e:
+            print(f"[{sesion.id if sesion else writer.get_extra_info('peername')}] Mensaje inválido: {e}",
+                  file=sys.stderr)
+        except ConnectionError:
+            pass
+        try:
+            if consumidor is not None:
+                if not consumidor.done(): # El consumidor vacía la cola: put() no queda esperando
+                    await sesion.cola.put(None)
+                try:
+                    await consumidor
+                except Exception as e:
+                    print(f"[{sesion.id}] Error al procesar la sesión: {e!r}", file=sys.stderr)
+                reporte = await self._cerrar_sesion(sesion)
+                if fin and not writer.is_closing():
+                    if sesion.error:
+                        await escribir_mensaje(writer, {"tipo": "error", "mensaje": sesion.error})
+                    else:
+                        await escribir_mensaje(writer, {"tipo": "reporte"}, reporte.encode("utf-8"))
+        except ConnectionError:
+            pass
+        finally:
+            if sesion is not None and self.sesiones.get(sesion.id) is sesion:
+                del self.sesiones[sesion.id]
+            writer.close()
+
+    # Consumidor de una sesión: procesa sus mensajes en orden, los frames en el pool de hilos.
+    # Un mensaje con campos inválidos se descarta (se informa) sin interrumpir la sesión
+    async def _consumir(self, sesion, writer):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await sesion.cola.get()
+            if item is None:
+                return
+            cabecera, carga, recibido = item
+            tipo = cabecera.get("tipo")
+            try:
+                if tipo == "frame":
+                    await loop.run_in_executor(self.pool, sesion.procesar_frame, cabecera, carga, recibido)
+                elif tipo == "foco":
+                    sesion.monitor.set_focus(bool(cabecera["enfocada"]), float(cabecera["ts"]))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"[{sesion.id}] Mensaje {tipo} inválido: {e!r}", file=sys.stderr)
+            # Confirmación del frame (también si se descartó): libera un crédito del cliente
+            if tipo == "frame" and sesion.creditos and not writer.is_closing():
+                try:
+                    await escribir_mensaje(writer, {"tipo": "ack", "seq": cabecera.get("seq")})
+                except ConnectionError:
+                    pass # El cliente se fue: se sigue procesando lo recibido para el reporte
+
+    # Reporte final de una sesión: archivo de texto y registro en el almacén
+    async def _cerrar_sesion(self, sesion):
+        if sesion.engine is None or sesion.inicio is None:
+            sesion.error = sesion.error or "No se pudo iniciar el análisis (sin ROI válida en los frames recibidos)"
+            print(f"[{sesion.id}] {sesion.error}", file=sys.stderr)
+            return ""
+        sesion.engine.stop()
+        analyzer = sesion.engine.analyzer
+        reporte = Reporte.construir_reporte(sesion.elapsed, analyzer, sesion.metricas)
+        registro = Reporte.construir_registro(sesion.elapsed, analyzer, sesion.id, sala=sesion.sala,
+                                              duracion=sesion.duracion, inicio=time.time() - sesion.elapsed)
+
+        def guardar():
+            os.makedirs(self.carpeta_reportes, exist_ok=True)
+            with open(os.path.join(self.carpeta_reportes, f"{sesion.id}.txt"), "w", encoding="utf-8") as f:
+                f.write(reporte)
+            if self.carpeta_almacen:
+                with self._lock_almacen:
+                    almacen = AlmacenSesiones(self.carpeta_almacen)
+                    almacen.agregar(registro)
+                    almacen.guardar_lote()
+
+        await asyncio.get_running_loop().run_in_executor(self.pool, guardar)
+        self.terminadas.append((sesion.id, reporte))
+        print(f"[{sesion.id}] Sesión terminada: {sesion.recibidos} frames, {sesion.elapsed:.1f} s analizados, "
+              f"{sesion.errores} errores de decodificación", flush=True)
+        return reporte
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de ingesta de frames de clientes remotos")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--hilos", type=int, default=None, help="Hilos de decodificación y análisis (por defecto, núcleos)")
+    parser.add_argument("--cola", type=int, default=4, help="Mensajes en espera por sesión antes de frenar al cliente")
+    parser.add_argument("--reportes", default="reportes", help="Carpeta de reportes por sesión")
+    parser.add_argument("--almacen", default="almacen", help="Almacén columnar de sesiones")
+    parser.add_argument("--estadisticas", type=float, default=10.0, help="Segundos entre líneas de estado (0 = nunca)")
+    parser.add_argument("--planificador", action="store_true",
+                        help="Omitir el análisis de frames sin movimiento (menos CPU, reporte aproximado)")
+    args = parser.parse_args(argv)
+
+    servidor = ServidorIngesta(args.host, args.puerto, args.hilos, args.cola, args.reportes, args.almacen,
+                               args.estadisticas, adaptativo=args.planificador)
+    print(f"Escuchando en {args.host}:{args.puerto}", flush=True)
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
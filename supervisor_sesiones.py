@@ -0,0 +1,130 @@
+# Supervisor para monitorear muchas sesiones (candidatos) a la vez en una sola máquina.
+# Cada sesión se ejecuta en un proceso independiente con su propio AnalysisEngine
+# (tracker óptico + analizador de atención), de modo que las sesiones se reparten entre los núcleos
+# y el throughput crece casi linealmente con el número de procesos.
+#
+# Las sesiones se describen en un manifiesto JSON (lista de objetos):
+#   [{"id": "alumno01", "fuente": "grabaciones/a01.mp4", "roi": [200, 120, 180, 220], "duracion": 3600},
+#    {"id": "alumno02", "fuente": 1, "roi": [180, 100, 200, 240], "duracion": 3600}]
+# "fuente" puede ser la ruta de un video o el índice de una cámara (int).
+# Opcionalmente "escala" y "margen" activan el modo de procesamiento reducido del AnalysisEngine,
+# y "sala" identifica el aula del examen en el almacén de sesiones.
+# Con "roi_automatica": true el rostro se detecta solo (entonces "roi" es opcional) y se re-adquiere
+# cuando el seguimiento se pierde, para sesiones sin operador.
+# Una sala con una sola cámara para varios candidatos se describe con "rostros" en lugar de "roi":
+#   {"id": "sala-A101", "fuente": "grabaciones/a101.mp4", "duracion": 3600,
+#    "rostros": [{"id": "alumno01", "roi": [80, 120, 160, 200]}, {"id": "alumno02", "roi": [420, 110, 170, 210]}]}
+# Todos los candidatos de la sala se analizan en el mismo proceso (motor_multirostro.MotorMultiRostro)
+# y cada uno tiene su propio reporte y registro en el almacén.
+# Además de un reporte de texto por sesión, todas las sesiones se guardan como un lote en el
+# almacén columnar (almacen_sesiones.py) para consultas agregadas.
+#
+# Uso:
+#   python supervisor_sesiones.py sesiones.json --procesos 8 --salida reportes/ [--almacen almacen/]
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from analisis_offline import analizar_video, analizar_video_sala
+from almacen_sesiones import AlmacenSesiones
+from analysis_engine import AnalysisEngine
+from detector_rostro import DetectorRostro
+from motor_multirostro import MotorMultiRostro
+from reporte import Reporte
+
+
+# Trabajo ejecutado dentro de cada proceso: analiza una sesión completa y devuelve un resumen serializable.
+# "candidatos" tiene un (id, reporte, registro) por candidato: uno, o uno por rostro en una sala
+def _ejecutar_sesion(sesion):
+    # Un solo hilo de OpenCV por proceso: el paralelismo lo dan los procesos, no los hilos internos
+    cv2.setNumThreads(1)
+    inicio = time.perf_counter()
+    resultado = {"id": sesion["id"], "candidatos": [], "elapsed": 0.0, "frames": 0, "fps": 0.0, "error": None}
+    try:
+        if sesion.get("rostros"):
+            motor = MotorMultiRostro(escala=sesion.get("escala", 1.0), margen_busqueda=sesion.get("margen") or 1.0)
+            rois = [tuple(r["roi"]) for r in sesion["rostros"]]
+            elapsed, engine = analizar_video_sala(sesion["fuente"], rois, sesion.get("duracion"), motor)
+            analizadores = [(r["id"], motor.rostros[k + 1].analyzer) for k, r in enumerate(sesion["rostros"])]
+        else:
+            engine = AnalysisEngine(escala=sesion.get("escala", 1.0), margen_busqueda=sesion.get("margen"))
+            if sesion.get("roi_automatica"):
+                engine.detector = DetectorRostro()
+            roi = tuple(sesion["roi"]) if sesion.get("roi") is not None else None
+            elapsed, engine = analizar_video(sesion["fuente"], roi, sesion.get("duracion"), engine)
+            analizadores = [(sesion["id"], engine.analyzer)]
+        for id_candidato, analyzer in analizadores:
+            resultado["candidatos"].append((
+                id_candidato,
+                Reporte.construir_reporte(elapsed, analyzer),
+                Reporte.construir_registro(elapsed, analyzer, id_candidato, sala=sesion.get("sala", ""),
+                                           duracion=sesion.get("duracion"))))
+        resultado["elapsed"] = elapsed
+        resultado["frames"] = engine.frames_procesados
+    except Exception as e:
+        # El error de una sesión no debe detener al resto
+        resultado["error"] = str(e)
+    segundos = time.perf_counter() - inicio
+    resultado["fps"] = resultado["frames"] / segundos if segundos > 0 else 0.0
+    return resultado
+
+
+# Ejecuta todas las sesiones repartidas en 'procesos' workers (por defecto, un worker por núcleo).
+# Devuelve los resultados en el orden en que terminan
+def ejecutar_sesiones(sesiones, procesos=None):
+    ids = [s["id"] for s in sesiones]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Los ids de sesión deben ser únicos")
+    procesos = procesos or os.cpu_count() or 1
+    resultados = []
+    with ProcessPoolExecutor(max_workers=min(procesos, max(1, len(sesiones)))) as pool:
+        futuros = [pool.submit(_ejecutar_sesion, s) for s in sesiones]
+        for futuro in as_completed(futuros):
+            resultados.append(futuro.result())
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitorea varias sesiones en paralelo, una por proceso")
+    parser.add_argument("manifiesto", help="Archivo JSON con la lista de sesiones")
+    parser.add_argument("--procesos", type=int, default=None, help="Número de procesos (por defecto, núcleos del CPU)")
+    parser.add_argument("--salida", default="reportes", help="Carpeta donde guardar un reporte por sesión")
+    parser.add_argument("--almacen", default="almacen", help="Carpeta del almacén columnar de sesiones")
+    args = parser.parse_args(argv)
+
+    with open(args.manifiesto, encoding="utf-8") as f:
+        sesiones = json.load(f)
+
+    os.makedirs(args.salida, exist_ok=True)
+    inicio = time.perf_counter()
+    resultados = ejecutar_sesiones(sesiones, args.procesos)
+    total = time.perf_counter() - inicio
+
+    errores = 0
+    almacen = AlmacenSesiones(args.almacen)
+    for r in resultados:
+        if r["error"]:
+            errores += 1
+            print(f"[{r['id']}] Error: {r['error']}", file=sys.stderr)
+            continue
+        for id_candidato, reporte, registro in r["candidatos"]:
+            with open(os.path.join(args.salida, f"{id_candidato}.txt"), "w", encoding="utf-8") as f:
+                f.write(reporte)
+            almacen.agregar(registro)
+        print(f"[{r['id']}] {r['frames']} frames, {r['elapsed']:.1f} s de examen, {r['fps']:.1f} fps")
+
+    almacen.guardar_lote() # Un solo lote comprimido para todas las sesiones de esta corrida
+
+    frames = sum(r["frames"] for r in resultados)
+    print(f"{len(resultados)} sesiones en {total:.1f} s ({frames / total if total > 0 else 0.0:.1f} fps agregados)")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+# Generador determinista de video sintético para benchmarks y pruebas sin cámara.
+# Dibuja un parche texturizado con forma de rostro (tono piel constante, textura en brillo para que
+# haya esquinas que seguir) sobre un fondo poco saturado, y lo mueve según un guion de fases:
+#   "frente"     rostro quieto (atento)
+#   "izquierda", "derecha", "arriba", "abajo"
+#                giro: el rostro se desplaza rápido en esa dirección (por encima del umbral del analizador)
+#                y luego regresa lentamente al centro (por debajo del umbral, se considera atento)
+#   "foco"       la ventana del examen pierde el foco (el rostro sigue quieto) y luego lo recupera
+#   "perdido"    el rostro desaparece del cuadro
+# Cada frame lleva su etiqueta esperada (causa de falta de atención o None), así se puede comparar
+# el no_attention_breakdown obtenido con el que dicta el guion.
+
+import cv2
+import numpy as np
+
+
+# Guion por defecto: (fase, segundos). Las fases de giro duran poco porque el rostro se mueve rápido
+FASES_POR_DEFECTO = (
+    ("frente", 1.0),
+    ("izquierda", 0.5),
+    ("frente", 0.5),
+    ("derecha", 0.5),
+    ("frente", 0.5),
+    ("arriba", 0.3),
+    ("frente", 0.5),
+    ("abajo", 0.3),
+    ("frente", 0.5),
+    ("foco", 1.0),
+    ("frente", 0.5),
+    ("perdido", 1.0),
+)
+
+# Dirección (dx, dy) y etiqueta del analizador para cada fase de giro
+_GIROS = {
+    "izquierda": ((-1, 0), "left"),
+    "derecha": ((1, 0), "right"),
+    "arriba": ((0, -1), "up"),
+    "abajo": ((0, 1), "down"),
+}
+
+# Tono (H de OpenCV, 0..180) del rostro y del fondo: separados para que CamShift no confunda el fondo
+_TONO_ROSTRO = 12
+_TONO_FONDO = 110
+
+
+class SyntheticExam:
+    def __init__(self, width=640, height=480, fps=30.0, fases=FASES_POR_DEFECTO, semilla=0):
+        self.width = width
+        self.height = height
+        self.fps = float(fps)
+        self.fases = tuple(fases)
+        rng = np.random.default_rng(semilla)
+
+        # Tamaño del rostro proporcional a la resolución
+        self.face_h = int(height * 0.35)
+        self.face_w = int(self.face_h * 0.8)
+        # Velocidades en píxeles por frame (del frame completo): el giro supera el umbral del
+        # analizador (3 px/frame) con holgura y el regreso queda por debajo
+        self.turn_speed = max(6.0, width * 0.012)
+        self.return_speed = 1.5
+
+        self._fondo = self._make_background(rng)
+        self._rostro, self._mascara = self._make_face(rng)
+        self._buffer = np.empty_like(self._fondo) # Frame de salida reutilizado
+        self._build_script()
+
+    # Fondo azulado con textura suave y saturación baja: la máscara de set_roi (S >= 20) lo deja
+    # fuera del histograma aunque quede dentro del rectángulo de la ROI
+    def _make_background(self, rng):
+        v = rng.integers(60, 160, (self.height // 8 + 1, self.width // 8 + 1), dtype=np.uint8)
+        v = cv2.resize(v, (self.width, self.height), interpolation=cv2.INTER_CUBIC)
+        hsv = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        hsv[..., 0] = _TONO_FONDO
+        hsv[..., 1] = 12
+        hsv[..., 2] = v
+        return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+    # Parche elíptico con tono piel, textura de brillo y "ojos" y "boca" oscuros
+    def _make_face(self, rng):
+        h, w = self.face_h, self.face_w
+        v = rng.integers(90, 255, (h // 4 + 1, w // 4 + 1), dtype=np.uint8)
+        v = cv2.resize(v, (w, h), interpolation=cv2.INTER_LINEAR)
+        v = cv2.GaussianBlur(v, (3, 3), 0)
+        for (fx, fy, r) in ((0.32, 0.38, 0.08), (0.68, 0.38, 0.08), (0.5, 0.72, 0.1)):
+            cv2.circle(v, (int(w * fx), int(h * fy)), max(2, int(w * r)), 50, -1)
+        hsv = np.empty((h, w, 3), dtype=np.uint8)
+        hsv[..., 0] = _TONO_ROSTRO
+        hsv[..., 1] = 150
+        hsv[..., 2] = v
+        rostro = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+        mascara = np.zeros((h, w), dtype=np.uint8)
+        cv2.ellipse(mascara, (w // 2, h // 2), (w // 2 - 1, h // 2 - 1), 0, 0, 360, 255, -1)
+        return rostro, mascara.astype(bool)
+
+    # Precalcula por frame: centro del rostro (o None), foco de la ventana y etiqueta esperada
+    def _build_script(self):
+        cx0, cy0 = self.width / 2.0, self.height / 2.0
+        centros, focos, etiquetas = [], [], []
+        cx, cy = cx0, cy0
+        for fase, segundos in self.fases:
+            n = max(1, int(round(segundos * self.fps)))
+            if fase in _GIROS:
+                (ux, uy), etiqueta = _GIROS[fase]
+                for _ in range(n):
+                    cx += ux * self.turn_speed
+                    cy += uy * self.turn_speed
+                    centros.append((cx, cy)); focos.append(True); etiquetas.append(etiqueta)
+                # Regreso lento al centro (atento)
+                while abs(cx - cx0) > self.return_speed or abs(cy - cy0) > self.return_speed:
+                    cx -= ux * self.return_speed
+                    cy -= uy * self.return_speed
+                    centros.append((cx, cy)); focos.append(True); etiquetas.append(None)
+                cx, cy = cx0, cy0
+            elif fase == "foco":
+                centros += [(cx, cy)] * n; focos += [False] * n; etiquetas += ["focus_change"] * n
+            elif fase == "perdido":
+                centros += [None] * n; focos += [True] * n; etiquetas += ["lost_roi"] * n
+            elif fase == "frente":
+                centros += [(cx, cy)] * n; focos += [True] * n; etiquetas += [None] * n
+            else:
+                raise ValueError(f"Fase desconocida: {fase}")
+        self.centros = centros
+        self.focos = focos
+        self.etiquetas = etiquetas
+
+    # Número total de frames del guion
+    def __len__(self):
+        return len(self.centros)
+
+    # Duración del guion en segundos
+    @property
+    def duracion(self):
+        return len(self) / self.fps
+
+    # ROI inicial (x, y, w, h) del rostro en el primer frame
+    @property
+    def roi(self):
+        cx, cy = self.centros[0]
+        return (int(cx - self.face_w / 2), int(cy - self.face_h / 2), self.face_w, self.face_h)
+
+    # Dibuja el frame i. El array devuelto se reutiliza en la siguiente llamada (copiar si se necesita conservar)
+    def frame(self, i):
+        out = self._buffer
+        np.copyto(out, self._fondo)
+        centro = self.centros[i]
+        if centro is not None:
+            x0 = int(round(centro[0] - self.face_w / 2))
+            y0 = int(round(centro[1] - self.face_h / 2))
+            # Recorte del parche a los bordes del frame
+            fx0, fy0 = max(0, -x0), max(0, -y0)
+            fx1 = min(self.face_w, self.width - x0)
+            fy1 = min(self.face_h, self.height - y0)
+            if fx1 > fx0 and fy1 > fy0:
+                region = out[y0 + fy0:y0 + fy1, x0 + fx0:x0 + fx1]
+                m = self._mascara[fy0:fy1, fx0:fx1]
+                region[m] = self._rostro[fy0:fy1, fx0:fx1][m]
+        return out
+
+    # Itera (frame_bgr, timestamp, ventana_enfocada, etiqueta) para todos los frames del guion
+    def frames(self):
+        for i in range(len(self)):
+            yield self.frame(i), i / self.fps, self.focos[i], self.etiquetas[i]
+
+    # Desglose esperado (segundos por causa) según el guion. El primer frame inicia el examen
+    # y cada frame posterior aporta 1/fps a la causa de su etiqueta
+    def expected_breakdown(self):
+        esperado = {"left": 0.0, "right": 0.0, "up": 0.0, "down": 0.0, "lost_roi": 0.0, "focus_change": 0.0}
+        for etiqueta in self.etiquetas[1:]:
+            if etiqueta is not None:
+                esperado[etiqueta] += 1.0 / self.fps
+        return esperado
@@ -1,8 +1,72 @@
+# Monitor del foco de la ventana del examen. Además del estado actual registra cada transición con
+# su marca de tiempo (del mismo reloj que los frames), así el analizador calcula el tiempo fuera de
+# foco a partir de los eventos y no muestreando el estado en cada frame analizado: la cuenta es
+# exacta aunque el análisis se atrase u omita frames.
+
+import threading
+
+import numpy as np
+
+from reloj import RELOJ
+
+
 # Clase para monitorear el estado de la ventana (si está enfocada o no)
 class WindowMonitor:
-    def __init__(self):
+    def __init__(self, reloj=None):
+        self.reloj = reloj or RELOJ # Reloj de las transiciones sin marca de tiempo explícita
         # Estado inicial: se asume que la ventana está enfocada
         self.focused = True
+        self._lock = threading.Lock() # set_focus llega desde el hilo de Tk; las lecturas, del de análisis
+        self._transiciones = [] # (ts, enfocada) de cada cambio de estado, en orden
+        self.version = 0 # Aumenta con cada transición (permite a los lectores cachear sus cálculos)
+
     # Método para actualizar el estado de enfoque de la ventana
-    def set_focus(self, state):
-        self.focused = state # Actualiza el estado de enfoque
+    # ts: instante del cambio (p. ej. el de un evento grabado o recibido); por defecto, self.reloj
+    def set_focus(self, state, ts=None):
+        state = bool(state)
+        with self._lock:
+            if state == self.focused:
+                return # Sin cambio (Tk repite FocusIn/FocusOut entre widgets de la misma ventana)
+            if ts is None:
+                ts = self.reloj.ahora()
+            if self._transiciones and ts < self._transiciones[-1][0]:
+                ts = self._transiciones[-1][0] # Nunca retroceder: las transiciones quedan ordenadas
+            self._transiciones.append((ts, state))
+            self.focused = state # Actualiza el estado de enfoque
+            self.version += 1
+
+    # Transiciones (ts, enfocada) registradas a partir de la número 'desde' (para reenviarlas a otro proceso)
+    def transiciones(self, desde=0):
+        with self._lock:
+            return self._transiciones[desde:]
+
+    # Estado de foco en el instante ts (el de la última transición anterior o igual)
+    def enfocada_en(self, ts):
+        with self._lock:
+            estado = True
+            for t, enfocada in self._transiciones:
+                if t > ts:
+                    break
+                estado = enfocada
+            return estado
+
+    # Intervalos [inicio, fin) fuera de foco dentro de [desde, hasta), como arrays (inicios, fines)
+    def intervalos_fuera(self, desde, hasta):
+        with self._lock:
+            transiciones = list(self._transiciones)
+        inicios, fines = [], []
+        fuera = None # Inicio del intervalo fuera de foco en curso
+        for t, enfocada in transiciones:
+            if not enfocada and fuera is None:
+                fuera = t
+            elif enfocada and fuera is not None:
+                inicios.append(fuera)
+                fines.append(t)
+                fuera = None
+        if fuera is not None:
+            inicios.append(fuera)
+            fines.append(hasta)
+        inicios = np.clip(np.array(inicios, dtype=np.float64), desde, hasta)
+        fines = np.clip(np.array(fines, dtype=np.float64), desde, hasta)
+        validos = fines > inicios
+        return inicios[validos], fines[validos]